@@ -0,0 +1,266 @@
+# app/benchmark.py
+# End-to-end agent benchmark against the local stub LLM server (core/stub_server.py).
+# The model is replaced by scripted transcripts with a fixed latency, so what is
+# measured is oconsole's own per-step overhead: history handling, payload
+# serialization, rendering and subprocess spawning, reported separately from
+# model time and from the time the commands themselves run.
+#
+#   python benchmark.py --iterations 20 --save baseline.json
+#   python benchmark.py --iterations 20 --baseline baseline.json --max-regression 15
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import config
+from manager import TaskManager
+from core.stub_server import StubLLMServer, DEFAULT_SCENARIOS, load_scenarios
+
+from rich.console import Console
+from rich.table import Table
+
+# Phases in report order. "other" is the agent loop itself: whatever is left of
+# the wall time once every measured phase is accounted for.
+PHASES = [
+    ("model", "LLM request (model + HTTP)"),
+    ("serialization", "Payload serialization"),
+    ("history", "History append / prune / copy"),
+    ("prompt", "Prompt assembly"),
+    ("rendering", "Rendering"),
+    ("spawn", "Subprocess spawn"),
+    ("tool", "Tool dispatch"),
+    ("command", "Command runtime"),
+    ("other", "Agent loop (other)"),
+]
+# Phases that are not oconsole overhead: the model and the commands themselves.
+EXTERNAL_PHASES = {"model", "command"}
+
+
+class _Discard(io.TextIOBase):
+    """Text sink for the benchmark console: output is rendered, then dropped."""
+
+    def write(self, text):
+        return len(text)
+
+
+class PhaseProfiler:
+    """
+    Accumulates wall time per named phase. Phases nest, and time is exclusive:
+    while an inner phase runs, the outer one is paused, so the totals add up to
+    the instrumented time without double counting. Each thread keeps its own stack.
+    """
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _add(self, name, seconds, count=0):
+        with self._lock:
+            self.totals[name] += seconds
+            self.counts[name] += count
+
+    @contextmanager
+    def phase(self, name):
+        stack = self._stack()
+        now = time.perf_counter()
+        if stack:
+            self._add(stack[-1][0], now - stack[-1][1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            _, resumed = stack.pop()
+            self._add(name, end - resumed, count=1)
+            if stack:
+                stack[-1][1] = end
+
+    def wrap(self, obj, method_name, name):
+        """Times every call of obj.method_name as phase `name` (instance-level patch)."""
+        original = getattr(obj, method_name)
+
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return original(*args, **kwargs)
+        setattr(obj, method_name, timed)
+
+    def wrap_generator(self, obj, method_name, name):
+        """Like wrap, for generator methods: only the time spent producing items is counted."""
+        original = getattr(obj, method_name)
+
+        def timed(*args, **kwargs):
+            iterator = original(*args, **kwargs)
+            while True:
+                with self.phase(name):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        setattr(obj, method_name, timed)
+
+    def reset(self):
+        with self._lock:
+            self.totals.clear()
+            self.counts.clear()
+
+
+def instrument(manager, profiler):
+    """Wraps the TaskManager's collaborators so each phase of a step is timed."""
+    client = manager.client
+    history = manager.conversation_history
+    executor = manager.command_executor
+
+    # The request body is built inside the client call, so serialization is timed
+    # nested in the "model" phase and not counted twice.
+    profiler.wrap(client.body_builder, "build", "serialization")
+    profiler.wrap(client, "get_tool_response", "model")
+    profiler.wrap_generator(client, "get_streaming_tool_response", "model")
+
+    for method_name in ("append", "messages", "prune"):
+        profiler.wrap(history, method_name, "history")
+    profiler.wrap(manager, "_begin_step", "prompt")
+
+    profiler.wrap(manager.console, "print", "rendering")
+    profiler.wrap(executor, "print_successful_output", "rendering")
+    profiler.wrap(manager, "display_final_answer", "rendering")
+
+    profiler.wrap(manager, "execute_tool", "tool")
+    profiler.wrap(executor, "run_command", "command")
+    profiler.wrap(executor, "_spawn", "spawn")
+
+
+def run_benchmark(scenarios, iterations, latency, streaming, chunk_delay=0.0, warmup=1):
+    """
+    Runs every scenario `iterations` times (after `warmup` untimed rounds) and
+    returns the average time per agent step of every phase, in milliseconds.
+    """
+    config.AGENT_STREAMING = streaming
+    config.AGENT_ASYNC = False  # The async engine creates its client per task and is not instrumented
+    config.HTTP_SHOW_TIMINGS = False
+    config.RESPONSE_CACHE_SITES = {site: False for site in config.RESPONSE_CACHE_SITES}
+    config.FAST_PATH = False  # Every scenario is scripted for the agent loop
+    config.SESSION_DB = ":memory:"  # Benchmark sessions must not evict the user's stored history
+
+    with StubLLMServer(scenarios, latency=latency, chunk_delay=chunk_delay) as server:
+        config.HOST = server.url
+        config.LLM_ENDPOINTS = [server.url]
+        manager = TaskManager(fast_start=False, console=Console(file=_Discard(), width=120))
+        profiler = PhaseProfiler()
+        instrument(manager, profiler)
+
+        goals = [scenario["goal"] for scenario in scenarios if scenario.get("goal")]
+        for _ in range(warmup):
+            for goal in goals:
+                manager.run_goal(goal)
+        profiler.reset()
+
+        steps = 0
+        runs = []
+        wall_time = 0.0
+        for _ in range(iterations):
+            for goal in goals:
+                start = time.perf_counter()
+                result = manager.run_goal(goal)
+                wall_time += time.perf_counter() - start
+                steps += result["llm_requests"]
+                runs.append(result["status"])
+        manager.close()
+
+    totals = dict(profiler.totals)
+    totals["other"] = max(0.0, wall_time - sum(totals.values()))
+    per_step = {name: totals.get(name, 0.0) * 1000 / max(steps, 1) for name, _ in PHASES}
+    overhead = sum(value for name, value in per_step.items() if name not in EXTERNAL_PHASES)
+    return {
+        "scenarios": len(goals),
+        "iterations": iterations,
+        "steps": steps,
+        "runs": len(runs),
+        "failed_runs": sum(1 for status in runs if status != "answered"),
+        "latency": latency,
+        "streaming": streaming,
+        "wall_time": wall_time,
+        "per_step_ms": per_step,
+        "overhead_per_step_ms": overhead,
+        # What the HTTP round trip costs on top of the scripted model latency.
+        "client_overhead_per_step_ms": max(0.0, per_step["model"] - latency * 1000),
+    }
+
+
+def print_report(console, results, baseline=None):
+    table = Table(title="[cyan]Per-step Timings[/cyan]", border_style="cyan", header_style="bold magenta")
+    table.add_column("Phase")
+    table.add_column("ms / step", justify="right")
+    if baseline:
+        table.add_column("Baseline", justify="right")
+        table.add_column("Change", justify="right")
+
+    def row(label, value, base_value, style=""):
+        cells = [label, f"{value:.3f}"]
+        if baseline:
+            change = ((value - base_value) / base_value * 100) if base_value else 0.0
+            color = "red" if change > 5 else "green" if change < -5 else "dim"
+            cells += [f"{base_value:.3f}", f"[{color}]{change:+.1f}%[/{color}]"]
+        table.add_row(*cells, style=style)
+
+    base_phases = (baseline or {}).get("per_step_ms", {})
+    for name, label in PHASES:
+        row(label, results["per_step_ms"][name], base_phases.get(name, 0.0),
+            style="dim" if name in EXTERNAL_PHASES else "")
+    table.add_section()
+    row("oconsole overhead", results["overhead_per_step_ms"], (baseline or {}).get("overhead_per_step_ms", 0.0), style="bold")
+    row("HTTP client overhead", results["client_overhead_per_step_ms"], (baseline or {}).get("client_overhead_per_step_ms", 0.0))
+    console.print(table)
+    console.print(
+        f"[dim]{results['runs']} runs, {results['steps']} steps, {results['wall_time']:.2f}s wall time | "
+        f"model latency {results['latency'] * 1000:.0f} ms | streaming {'on' if results['streaming'] else 'off'}"
+        f"{' | failed runs: ' + str(results['failed_runs']) if results['failed_runs'] else ''}[/dim]"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure oconsole's per-step overhead against a stub LLM server.")
+    parser.add_argument("--iterations", type=int, default=10, help="Runs of every scenario.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Scripted model latency per request, in seconds.")
+    parser.add_argument("--streaming", action="store_true", help="Use the streaming agent loop.")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks.")
+    parser.add_argument("--transcripts", help="JSON file with scenarios to replay instead of the built-in ones.")
+    parser.add_argument("--save", metavar="FILE", help="Write the results as JSON (e.g. as a baseline).")
+    parser.add_argument("--baseline", metavar="FILE", help="Compare against results saved with --save.")
+    parser.add_argument("--max-regression", type=float, metavar="PCT",
+                        help="Exit with status 1 if the overhead per step grew by more than PCT percent over the baseline.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    console = Console()
+    scenarios = load_scenarios(args.transcripts) if args.transcripts else DEFAULT_SCENARIOS
+    results = run_benchmark(scenarios, args.iterations, args.latency, args.streaming, chunk_delay=args.chunk_delay)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(console, results, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline and args.max_regression is not None:
+        base_overhead = baseline.get("overhead_per_step_ms", 0.0)
+        if base_overhead and (results["overhead_per_step_ms"] - base_overhead) / base_overhead * 100 > args.max_regression:
+            console.print(f"[bold red]Overhead per step regressed by more than {args.max_regression}%.[/bold red]")
+            sys.exit(1)
@@ -9,17 +9,190 @@ HOST = os.getenv('HOST', 'http://localhost:11434/v1')
 API_KEY = os.getenv('API_KEY')
 MODEL = os.getenv('MODEL', 'llama3.1')
 
+# --- HTTP Settings ---
+# A single keep-alive session is shared by the whole TaskManager lifetime.
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 4))  # Number of hosts to keep pools for
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 8))          # Max connections kept alive per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 60))
+HTTP_SHOW_TIMINGS = True  # Print connect / time-to-first-byte / total after each LLM request
+
+# --- LLM Endpoints ---
+# Comma-separated base URLs of servers that all serve MODEL (e.g. several Ollama hosts); defaults to HOST.
+# Requests go to the endpoint with the fewest in flight ("least_outstanding") or the lowest
+# expected wait ("latency"), and fail over to the next one on connection errors and 408/429/5xx.
+LLM_ENDPOINTS = [url.strip() for url in os.getenv('LLM_ENDPOINTS', HOST).split(',') if url.strip()]
+LLM_ROUTING = os.getenv('LLM_ROUTING', 'least_outstanding')
+LLM_MAX_ATTEMPTS = int(os.getenv('LLM_MAX_ATTEMPTS', 3))  # Per request, across all endpoints
+LLM_BACKOFF_BASE = 0.5            # Seconds; doubled per retry, with full jitter, once every endpoint has failed
+LLM_BACKOFF_MAX = 8.0
+LLM_BREAKER_THRESHOLD = 3         # Consecutive failures that take an endpoint out of rotation
+LLM_BREAKER_COOLDOWN = 30.0       # Seconds before a single trial request may bring it back
+LLM_HEALTH_CHECK_INTERVAL = float(os.getenv('LLM_HEALTH_CHECK_INTERVAL', 0))  # GET /models on every endpoint; 0 disables
+
+# --- Response Cache ---
+# Content-addressed cache of LLM responses, keyed on model + messages + tools.
+RESPONSE_CACHE_MEMORY_ENTRIES = 256
+RESPONSE_CACHE_TTL = 24 * 3600            # Seconds; 0 keeps entries until evicted
+RESPONSE_CACHE_DIR = os.getenv('RESPONSE_CACHE_DIR', '')  # Set to enable the on-disk tier
+RESPONSE_CACHE_DISK_MAX_MB = 50
+# Which call sites may answer from the cache
+RESPONSE_CACHE_SITES = {
+    "explain": True,
+    "planning": False,
+    "executing": False,
+}
+
 # --- Agent Settings ---
 AGENT_MAX_STEPS = 7
 AGENT_MEMORY_MAX_TOKENS = 16000
-SAFE_COMMANDS = [
-    "ls", "cat", "echo", "pwd", "df", "du", "wc", "grep",
-    "find", "whoami", "uname", "date", "uptime", "journalctl",
-    "ps", "netstat", "apt", "dpkg", "mkdir", "touch", "free"
+# History compaction: tool results from earlier turns that are larger than this many
+# tokens are cut down to their first and last lines; over the token limit, every older
+# result is compacted before whole turns (assistant message + its tool results) are dropped.
+HISTORY_COMPACT_TOOL_TOKENS = 500
+HISTORY_COMPACT_KEEP_LINES = 20
+# Stable-prefix mode, for servers with prefix (KV) caching (llama.cpp, vLLM, Ollama):
+# the system prompt and tools never change, the state instructions are sent as the
+# last message, and the history is only edited in coarse chunks (eager compaction is
+# off; once over the limit it is pruned down to HISTORY_STABLE_PRUNE_TARGET of it).
+AGENT_STABLE_PREFIX = False
+HISTORY_STABLE_PRUNE_TARGET = 0.6
+AGENT_ASYNC = False  # Run the agent loop on the asyncio engine (requires httpx); Ctrl-C cancels only the current step
+AGENT_STREAMING = False  # Stream agent replies, rendering text live and running tool calls as soon as they are complete
+# Plan-batch mode: PLANNING also returns the plan as tool calls, which are validated and
+# run as a dependency graph (independent steps in parallel) without a model round-trip per
+# step; the model is asked again only to review the results (REVIEWING) and answer.
+AGENT_PLAN_BATCH = False
+AGENT_PLAN_MAX_STEPS = 20
+
+# --- Model Tiers ---
+# The model used by each call site; unset ones use MODEL. Point the cheap sites
+# (e.g. /explain) at a small, fast model served by the same endpoints.
+MODEL_TIERS = {
+    "plan": os.getenv('MODEL_PLAN') or MODEL,          # PLANNING steps
+    "execute": os.getenv('MODEL_EXECUTE') or MODEL,    # EXECUTING steps
+    "explain": os.getenv('MODEL_EXPLAIN') or MODEL,    # /explain summaries of command output
+    "propose": os.getenv('MODEL_PROPOSE') or os.getenv('MODEL_EXPLAIN') or MODEL,  # Speculative proposals
+}
+STATE_PURPOSES = {"PLANNING": "plan", "EXECUTING": "execute", "REVIEWING": "execute"}
+# Speculative mode: in EXECUTING, the "propose" model is asked first. Its reply is used
+# when it only calls run_safe_command with arguments that pass the schema and allowlist
+# checks; anything else (text, other tools, rejected commands) goes to the "execute" model.
+AGENT_SPECULATIVE = False
+SAFE_COMMANDS_USE_SHELL = False  # False: parse args into argv and exec binaries directly (pipes between safe commands only)
+COMMAND_TIMEOUT = 60  # Default wall-clock limit (seconds) for executed commands; 0 disables it
+# Allowlisted commands. Each entry may override the defaults with:
+#   "timeout"     - wall-clock limit in seconds; the command's process group is killed when it expires
+#   "cpu_seconds" - CPU-time rlimit
+#   "memory_mb"   - address-space rlimit
+#   "cache_ttl"   - seconds a successful result may be reused (see COMMAND_CACHE); a pipeline is
+#                   cached only when every stage has one, for the shortest of them. Commands
+#                   that can write files (e.g. `sort -o`, `uniq IN OUT`) must not have one.
+SAFE_COMMANDS = {
+    "ls": {"cache_ttl": 10}, "cat": {"cache_ttl": 300}, "echo": {}, "pwd": {}, "df": {"cache_ttl": 15},
+    "du": {"timeout": 120, "cache_ttl": 120}, "wc": {"cache_ttl": 300}, "grep": {"timeout": 120, "cache_ttl": 30},
+    "find": {"timeout": 120, "cpu_seconds": 60, "cache_ttl": 60}, "whoami": {"cache_ttl": 300},
+    "uname": {"cache_ttl": 300}, "date": {}, "uptime": {},
+    "journalctl": {"timeout": 30, "memory_mb": 1024},
+    "ps": {}, "netstat": {}, "apt": {"timeout": 300}, "dpkg": {}, "mkdir": {}, "touch": {}, "free": {},
+    # Read-only filters, mostly useful as pipeline stages (sort -o and uniq's OUTPUT operand are rejected)
+    "head": {"cache_ttl": 300}, "tail": {"cache_ttl": 300}, "sort": {}, "uniq": {}
+}
+# Reuse the results of read-only commands run again with the same argv and working directory.
+# An entry is dropped when its TTL expires, when the mtime/size of a path it names (or of the
+# working directory) changes, when create_file writes at or under such a path, and when a
+# state-changing command (SEQUENTIAL_COMMANDS) touches it.
+COMMAND_CACHE = True
+COMMAND_CACHE_MAX_ENTRIES = 256
+# Tool calls returned in one model turn: consecutive read-only calls run concurrently
+AGENT_TOOL_WORKERS = 4
+PARALLEL_TOOLS = ["run_safe_command", "get_full_system_report"]
+SEQUENTIAL_COMMANDS = ["mkdir", "touch", "apt", "dpkg"]  # Safe commands that may change state always run in order
+# Modules that add tools to the agent, see core/tool_registry.py (e.g. ["plugins.docker_tools"])
+TOOL_PLUGINS = [m for m in os.getenv('TOOL_PLUGINS', '').split(',') if m]
+
+# --- Command Output Capture ---
+# Stream command output instead of buffering it all: only a head/tail window is kept
+# in memory and sent to the LLM, with a marker saying how much was omitted.
+COMMAND_STREAM_OUTPUT = True
+COMMAND_OUTPUT_HEAD_LINES = 100
+COMMAND_OUTPUT_TAIL_LINES = 100
+COMMAND_OUTPUT_MAX_LINE_CHARS = 2000
+COMMAND_OUTPUT_SPILL = True  # Save the full output of truncated commands to a temp file
+COMMAND_LIVE_LINES = 15      # Lines shown in the live view while a command runs
+# Displayed output: tables and text longer than OUTPUT_VIEW_MAX_ROWS rows are shown as
+# their first and last rows with a count of the hidden ones, instead of rendering everything.
+OUTPUT_VIEW_MAX_ROWS = 60
+OUTPUT_VIEW_HEAD_ROWS = 25
+OUTPUT_VIEW_TAIL_ROWS = 10
+# How tool results are written into the conversation: "compact" (plain-text envelope with
+# known command outputs as '|'-separated columns, see core/result_encoding.py) or "json".
+TOOL_RESULT_FORMAT = os.getenv("TOOL_RESULT_FORMAT", "compact")
+
+# --- Fast Path ---
+# Short, common goals are mapped straight to a tool call (see core/intent_router.py),
+# skipping the PLANNING and EXECUTING requests; the model is asked once to answer from
+# the output, or not at all with "summarize": False. A pattern must match the whole goal
+# after punctuation and filler words ("please", "show", "my", ...) are removed.
+FAST_PATH = True
+FAST_PATH_RULES = [
+    {"name": "disk_usage", "pattern": r"(free )?(disk|storage|disk space|free space|space left)( usage| space| free| left)?|df( -h)?",
+     "tool": "run_safe_command", "arguments": {"command_name": "df", "args_string": "-h"}},
+    {"name": "memory", "pattern": r"(free )?(memory|ram|mem)( usage| free| left)?|free( -h)?",
+     "tool": "run_safe_command", "arguments": {"command_name": "free", "args_string": "-h"}},
+    {"name": "uptime", "pattern": r"uptime|up time|long (been )?up|(uptime and )?load averages?|uptime and load",
+     "tool": "run_safe_command", "arguments": {"command_name": "uptime", "args_string": ""}},
+    {"name": "processes", "pattern": r"(top |running )?process(es| list)?|ps( aux)?",
+     "tool": "run_safe_command", "arguments": {"command_name": "ps", "args_string": "aux --sort=-%cpu | head -n 20"}},
+    {"name": "ports", "pattern": r"(open |listening )?ports|(network )?connections|netstat",
+     "tool": "run_safe_command", "arguments": {"command_name": "netstat", "args_string": "-tuln"}},
+    {"name": "kernel", "pattern": r"(kernel|os|linux)( version| release)?|uname( -a)?",
+     "tool": "run_safe_command", "arguments": {"command_name": "uname", "args_string": "-a"}, "summarize": False},
+    {"name": "whoami", "pattern": r"who am|whoami|user am|(logged in )?user ?name|logged in as",
+     "tool": "run_safe_command", "arguments": {"command_name": "whoami", "args_string": ""}, "summarize": False},
+    {"name": "date", "pattern": r"date|date( and)? time|time( and)? date|time now|day( today)?|today|date today",
+     "tool": "run_safe_command", "arguments": {"command_name": "date", "args_string": ""}, "summarize": False},
+    {"name": "working_directory", "pattern": r"where am|pwd|(working|current) directory",
+     "tool": "run_safe_command", "arguments": {"command_name": "pwd", "args_string": ""}, "summarize": False},
+    {"name": "system_report", "pattern": r"(full )?(report|status|overview|health|info|information|summary)( report)?",
+     "tool": "get_full_system_report", "arguments": {}},
+]
+FAST_PATH_ANSWER_PROMPT = """
+You are a Linux system assistant. The user's request was answered by running the tool shown above.
+Answer the request directly from that output in a few sentences or a short list, pointing out anything unusual.
+Do not suggest running other commands unless something looks wrong.
+"""
+
+# Sections of get_full_system_report, collected concurrently.
+# 'command' is an argv pipeline (a list of argv stages), exec'd without a shell like safe commands.
+# 'cache_ttl' (seconds) reuses a section's output for slow-changing data.
+SYSTEM_REPORT_SECTIONS = [
+    {"title": "OS and Kernel", "command": [["uname", "-a"]], "cache_ttl": 3600},
+    {"title": "Distribution", "command": [["grep", "PRETTY_NAME", "/etc/os-release"]], "cache_ttl": 3600},
+    {"title": "Disk Usage", "command": [["df", "-h"]]},
+    {"title": "Memory", "command": [["free", "-h"]]},
+    {"title": "System Uptime and Load", "command": [["uptime"]]},
+    {"title": "Top Processes", "command": [["ps", "aux", "--sort=-%cpu"], ["head", "-n", "6"]]},
 ]
 
+# --- Tracing and Metrics ---
+# Spans (task > step > LLM request / tool call) and pruning events are always kept
+# for /stats; set these to also export them.
+TRACE_FILE = os.getenv('TRACE_FILE', '')      # JSONL file, one finished span per line
+METRICS_FILE = os.getenv('METRICS_FILE', '')  # Prometheus text file, rewritten after each task
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))  # Serve /metrics on 127.0.0.1:PORT; 0 disables it
+
+# --- Session Store ---
+# SQLite file with every session's messages, tasks and tool calls (see core/session_store.py).
+# Used for /resume, /runs and /search; ':memory:' keeps nothing after exit.
+SESSION_DB = os.getenv('SESSION_DB', 'oconsole.db')
+SESSION_MAX_SESSIONS = 200        # Older sessions are deleted at startup; 0 keeps all
+SESSION_MAX_AGE_DAYS = 90         # 0 keeps sessions regardless of age
+SESSION_OUTPUT_MAX_BYTES = 64 * 1024  # Per tool call; longer outputs are stored truncated
+
 # --- App Settings ---
 HISTORY_FILE = '.python_history'
+FAST_START = False  # Show the prompt first; load the tokenizer and HTTP stack in the background (also: --fast)
 
 # --- STATE MACHINE PROMPTS ---
 # This replaces the single AGENT_SYSTEM_PROMPT with a strict, state-based system.
@@ -39,8 +212,33 @@ Your valid actions are:
 2. If all steps are complete, call `answer_question` to finish the task.
 
 Do not call `explain_plan` again. Stick to the original plan.
+""",
+    "REVIEWING": """
+You are in the REVIEWING state.
+The steps of your plan were run for you; their results are in the history above.
+Your valid actions are:
+1. If every step succeeded, call `answer_question` with the final answer for the user.
+2. If a step failed or was skipped, call `run_safe_command` or `create_file` to recover, then `answer_question`.
+
+Do not call `explain_plan` again.
 """
 }
+# Added to the PLANNING instructions in plan-batch mode (AGENT_PLAN_BATCH).
+PLAN_BATCH_PROMPT = """
+Also pass `steps`: your plan as tool calls that will be run for you, without asking you again, e.g.
+[{"id": "disk", "tool": "run_safe_command", "arguments": {"command_name": "df", "args_string": "-h"}},
+ {"id": "logs", "tool": "run_safe_command", "arguments": {"command_name": "du", "args_string": "-sh /var/log"}, "depends_on": ["disk"]}]
+Steps may use `run_safe_command`, `create_file` and `get_full_system_report`. Steps without `depends_on` run in parallel.
+Leave out steps whose arguments depend on the output of earlier steps; you can run those after seeing the results.
+"""
+
+# Fixed system prompt of the stable-prefix mode (AGENT_STABLE_PREFIX); the state
+# prompt above is then appended as the last message of each request.
+AGENT_SYSTEM_PROMPT = """
+You are oconsole, an assistant that accomplishes Linux system tasks using the provided tools.
+You work in one of the states PLANNING, EXECUTING or REVIEWING. The current state and the actions
+allowed in it are given in the last message of every request; follow them exactly.
+"""
 
 # The explainer prompt remains for the /explain command
 EXPLAINER_SYSTEM_PROMPT = """You are an expert system assistant. Your role is to interpret the output of a Linux command and provide a brief, one or two-sentence, natural-language explanation for the user. Focus on the most important information in the output. Be concise.
@@ -0,0 +1,132 @@
+# app/core/async_client.py
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+import config
+import httpx
+from core.endpoints import EndpointPool, LLMConnectionError, LLMRequestError, LLMResponseError, RETRYABLE_STATUSES
+from core.request_body import RequestBodyBuilder
+
+
+# asyncio counterpart of GenericClient, built on httpx.
+# It sends the same payloads, routes over the same EndpointPool and returns the
+# same message dicts (or raises the same errors), so the async agent loop can
+# treat both clients alike. Use it as an async context manager so its
+# connection pool is closed on the event loop that opened it.
+class AsyncGenericClient:
+    def __init__(self, response_cache=None, pool=None):
+        self.pool = pool or EndpointPool.from_config()
+        self.api_key = config.API_KEY
+        self.model = config.MODEL
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        self.last_timing = None
+        self.last_usage = None
+        self.last_model = None
+        self.body_builder = RequestBodyBuilder(self.model)
+        self.response_cache = response_cache
+        self.last_cache_hit = False
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(config.HTTP_READ_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=config.HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=config.HTTP_POOL_MAXSIZE
+            )
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Closes all pooled connections."""
+        await self.client.aclose()
+
+    async def _endpoints(self, errors):
+        """See GenericClient._endpoints."""
+        tried = set()
+        for attempt in range(config.LLM_MAX_ATTEMPTS):
+            if attempt and len(tried) >= len(self.pool):
+                await asyncio.sleep(self.pool.backoff(attempt - 1))
+            endpoint = self.pool.acquire(exclude=tried)
+            tried.add(endpoint)
+            yield endpoint, endpoint.probing
+        raise LLMConnectionError(f"LLM request failed after {config.LLM_MAX_ATTEMPTS} attempt(s): {errors[-1] if errors else 'no response'}")
+
+    @asynccontextmanager
+    async def _attempt(self, endpoint, errors, probe=False):
+        """See GenericClient._attempt."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        except (httpx.HTTPError, LLMResponseError) as e:
+            self.pool.release(endpoint, False, probe=probe)
+            errors.append(f"{endpoint.url}: {e}")
+            return
+        except LLMRequestError:
+            self.pool.release(endpoint, True, probe=probe)
+            raise
+        except (asyncio.CancelledError, KeyboardInterrupt):
+            self.pool.release(endpoint, None, probe=probe)
+            raise
+        except BaseException:
+            self.pool.release(endpoint, False, probe=probe)
+            raise
+        self.pool.release(endpoint, True, time.perf_counter() - start_time, probe=probe)
+
+    async def get_tool_response(self, messages, tools, use_cache=False, model=None):
+        model = model or self.model
+        self.last_timing = None
+        self.last_usage = None
+        self.last_model = model
+        self.last_cache_hit = False
+        cache_key = None
+        if use_cache and self.response_cache:
+            cache_key = self.response_cache.make_key(model, messages, tools)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self.last_cache_hit = True
+                return cached
+
+        body = self.body_builder.build(messages, tools, model=model)
+
+        errors = []
+        async for endpoint, probe in self._endpoints(errors):
+            async with self._attempt(endpoint, errors, probe):
+                start_time = time.perf_counter()
+                async with self.client.stream("POST", f"{endpoint.url}/chat/completions", content=body) as response:
+                    ttfb = time.perf_counter() - start_time
+                    content = await response.aread()
+                if response.status_code >= 400:
+                    detail = f"HTTP {response.status_code} from {endpoint.url}: {content[:300].decode('utf-8', 'replace')}"
+                    if response.status_code in RETRYABLE_STATUSES:
+                        raise httpx.HTTPStatusError(detail, request=response.request, response=response)
+                    raise LLMRequestError(detail, status=response.status_code)
+                # httpx does not expose connect time; it is reported as unknown.
+                self.last_timing = {
+                    "connect": None,
+                    "ttfb": ttfb,
+                    "total": time.perf_counter() - start_time,
+                    "reused_connection": None,
+                    "endpoint": endpoint.url
+                }
+
+                try:
+                    response_json = json.loads(content)
+                except json.JSONDecodeError:
+                    raise LLMResponseError(f"Invalid JSON response from {endpoint.url}")
+
+                if not response_json or 'choices' not in response_json or not response_json['choices']:
+                    raise LLMResponseError(f"Empty or malformed response from {endpoint.url}")
+
+                self.last_usage = response_json.get('usage')
+                message = response_json['choices'][0]['message']
+                if cache_key:
+                    self.response_cache.put(cache_key, message)
+                return message
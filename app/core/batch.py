@@ -0,0 +1,118 @@
+# core/batch.py
+import json
+import queue
+import sys
+import threading
+import time
+
+
+def read_goals(source):
+    """
+    Reads goals from a file path, or from stdin when `source` is '-'.
+    Each line is either a plain-text goal or a JSON object with a "goal" (or
+    "prompt") and an optional "id". Blank lines and lines starting with '#' are skipped.
+    """
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    goals = []
+    try:
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            goal_id = None
+            if line.startswith("{"):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{source}:{line_number}: invalid JSON: {e}") from e
+                goal_id = entry.get("id")
+                line = entry.get("goal") or entry.get("prompt")
+                if not line:
+                    raise ValueError(f"{source}:{line_number}: JSON entry has no \"goal\"")
+            goals.append({"index": len(goals), "id": goal_id, "goal": line})
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return goals
+
+
+class BatchRunner:
+    """
+    Runs many goals without the REPL. Each worker thread owns its own TaskManager
+    (built by `manager_factory`), so conversation histories never mix. One JSON
+    result line is written per goal, in completion order, as soon as it finishes.
+    """
+
+    def __init__(self, manager_factory, workers=1, output=None):
+        self.manager_factory = manager_factory
+        self.workers = max(1, workers)
+        self.output = output or sys.stdout
+        self._write_lock = threading.Lock()
+        self._managers = []
+        self._managers_lock = threading.Lock()
+
+    def _write(self, result):
+        line = json.dumps(result, default=str)
+        with self._write_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def _worker(self, pending, results):
+        manager = self.manager_factory()
+        with self._managers_lock:
+            self._managers.append(manager)
+        try:
+            while True:
+                try:
+                    item = pending.get_nowait()
+                except queue.Empty:
+                    return
+                result = {"index": item["index"], "id": item["id"]}
+                result.update(manager.run_goal(item["goal"]))
+                self._write(result)
+                results.append(result)
+        finally:
+            manager.close()
+
+    def cancel(self):
+        """Kills the commands every worker is running."""
+        with self._managers_lock:
+            for manager in self._managers:
+                manager.command_executor.cancel_all()
+
+    def run(self, goals):
+        """Runs all goals and returns a summary of the batch."""
+        start_time = time.time()
+        pending = queue.Queue()
+        for item in goals:
+            pending.put(item)
+        results = []
+        threads = [
+            threading.Thread(target=self._worker, args=(pending, results), daemon=True)
+            for _ in range(min(self.workers, len(goals)))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.2)  # Short joins keep the main thread responsive to Ctrl-C
+        except KeyboardInterrupt:
+            # Drain the queue so workers stop after their current goal.
+            while not pending.empty():
+                try:
+                    pending.get_nowait()
+                except queue.Empty:
+                    break
+            self.cancel()
+            raise
+
+        statuses = {}
+        for result in results:
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+        return {
+            "goals": len(goals),
+            "completed": len(results),
+            "statuses": statuses,
+            "elapsed_time": time.time() - start_time
+        }
@@ -0,0 +1,119 @@
+# core/command_cache.py
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def _stat(path):
+    """The (mtime, size) fingerprint of a path, or None when it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _overlaps(path, other):
+    """True when one path is the other or lies inside it."""
+    return path == other or path.startswith(other.rstrip(os.sep) + os.sep) or other.startswith(path.rstrip(os.sep) + os.sep)
+
+
+class CommandCache:
+    """
+    Result cache for read-only safe commands, keyed on the parsed argv of every
+    pipeline stage and the working directory. Each entry remembers the mtime and
+    size of the paths the command was given (the working directory when it was
+    given none) and is dropped when any of them changes, when its TTL expires,
+    or when a file is written at or under one of them. A directory's mtime only
+    changes with its direct entries, so the TTL bounds staleness for deeper
+    changes (e.g. `du` over a tree).
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, stored_at, fingerprints, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.time_saved = 0.0
+
+    @staticmethod
+    def make_key(stages, cwd):
+        return (tuple(tuple(stage) for stage in stages), cwd)
+
+    @staticmethod
+    def watched_paths(stages, cwd):
+        """The existing paths named in the argv stages, absolute; [cwd] when there are none."""
+        paths = []
+        for stage in stages:
+            for word in stage[1:]:
+                if word.startswith("-"):
+                    continue
+                path = os.path.normpath(os.path.join(cwd, os.path.expanduser(word)))
+                if path not in paths and os.path.exists(path):
+                    paths.append(path)
+        return paths or [cwd]
+
+    def fingerprint(self, paths):
+        """Taken before the command runs, so a change made while it runs invalidates the entry."""
+        return {path: _stat(path) for path in paths}
+
+    def get(self, key):
+        """Returns a copy of the cached result for `key` (marked 'cached'), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, stored_at, fingerprints, result = entry
+        if time.monotonic() >= expires_at or any(_stat(path) != stat for path, stat in fingerprints.items()):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                    self.invalidations += 1
+                self.misses += 1
+            return None
+        with self._lock:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.time_saved += result.get("elapsed_time") or 0
+        result = copy.deepcopy(result)
+        result["cached"] = f"identical run {time.monotonic() - stored_at:.0f}s ago"
+        result["elapsed_time"] = 0
+        return result
+
+    def put(self, key, result, ttl, fingerprints):
+        """Stores a successful, complete result for `ttl` seconds."""
+        if not ttl or not result.get("success") or result.get("timed_out") or result.get("killed"):
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + ttl, now, fingerprints, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_path(self, path):
+        """Drops the entries watching `path`, a directory above it or a path below it. Returns the number dropped."""
+        path = os.path.normpath(os.path.abspath(os.path.expanduser(path)))
+        with self._lock:
+            doomed = [key for key, entry in self._entries.items() if any(_overlaps(path, watched) for watched in entry[2])]
+            for key in doomed:
+                del self._entries[key]
+            self.invalidations += len(doomed)
+        return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self.invalidations += dropped
+        return dropped
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                    "entries": len(self._entries), "time_saved": self.time_saved}
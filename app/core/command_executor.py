@@ -1,76 +1,453 @@
+import asyncio
+import os
+import shlex
+import signal
 import subprocess
+import sys
+import tempfile
+import threading
 import time
+from contextlib import contextmanager
 from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.text import Text
+import config
+from core.output_capture import OutputCapture
+from core.tabular import parse_table
+
+try:
+    import resource  # POSIX only; resource limits are skipped elsewhere
+except ImportError:
+    resource = None
+
+STREAM_BUFFER_LIMIT = 2 ** 16  # asyncio stream buffer; output is read in chunks, never whole lines
 
 class CommandExecutor:
-    def __init__(self):
-        self.console = Console()
+    def __init__(self, console=None):
+        self.console = console or Console()
+        # Live output is only shown for commands run from a thread that asked for it,
+        # so commands running concurrently on worker threads never fight over the terminal.
+        self._thread_state = threading.local()
+        self._active = set()
+        self._active_lock = threading.Lock()
+
+    @contextmanager
+    def live_output(self):
+        """Shows the output of commands run by the current thread live while they run."""
+        self._thread_state.live = True
+        try:
+            yield
+        finally:
+            self._thread_state.live = False
+
+    def _new_captures(self):
+        if not config.COMMAND_STREAM_OUTPUT:
+            # Unbounded window: the whole output is kept, as with communicate().
+            unbounded = float('inf')
+            return (OutputCapture(unbounded, 0, unbounded, recent_lines=config.COMMAND_LIVE_LINES),
+                    OutputCapture(unbounded, 0, unbounded))
+
+        spill_file = None
+        if config.COMMAND_OUTPUT_SPILL:
+            spill_file = tempfile.NamedTemporaryFile(prefix='oconsole-', suffix='.log', delete=False)
+        stdout_capture = OutputCapture(
+            config.COMMAND_OUTPUT_HEAD_LINES, config.COMMAND_OUTPUT_TAIL_LINES,
+            config.COMMAND_OUTPUT_MAX_LINE_CHARS, spill_file, recent_lines=config.COMMAND_LIVE_LINES
+        )
+        stderr_capture = OutputCapture(
+            config.COMMAND_OUTPUT_HEAD_LINES, config.COMMAND_OUTPUT_TAIL_LINES,
+            config.COMMAND_OUTPUT_MAX_LINE_CHARS
+        )
+        return stdout_capture, stderr_capture
+
+    @staticmethod
+    def _exit_status(returncodes, shell=False):
+        """
+        Returns (returncode, signal_number, stage) for the pipeline stage that decides
+        the outcome: the first one that failed, otherwise the last one. Popen reports a
+        signal as a negative code; only a shell reports it as 128 + signal, so for argv
+        commands a code such as 255 is a plain exit code. An earlier stage killed by
+        SIGPIPE only means a later one stopped reading (e.g. `| head`), not a failure.
+        """
+        last = len(returncodes) - 1
+        for stage, returncode in enumerate(returncodes):
+            signal_number = None
+            if returncode is not None and returncode < 0:
+                signal_number = -returncode
+            elif shell and returncode is not None and returncode > 128:
+                signal_number = returncode - 128
+            if stage == last or (returncode != 0 and signal_number != signal.SIGPIPE):
+                return returncode, signal_number, stage
+        return None, None, last
+
+    def _build_result(self, returncodes, output, error, elapsed_time, timeout=None, timed_out=False, cancelled=False,
+                      stats=None, shell=False):
+        """
+        Builds the result dict from the return codes of every pipeline stage, reporting
+        timeouts and kills so the agent can adapt.
+        """
+        returncode, signal_number, stage = self._exit_status(returncodes, shell)
+        killed = timed_out or cancelled or signal_number is not None
+        if timed_out or cancelled:
+            reason = f"Command timed out after {timeout}s" if timed_out else "Command was cancelled by the user (Ctrl-C)"
+            result = {'success': False, 'error': f"{reason} and was killed.", 'output': output}
+            if error:
+                result['error'] += f"\n{error}"
+        elif returncode != 0:
+            result = {'success': False, 'error': error}
+            if killed:
+                # e.g. SIGXCPU / SIGKILL after hitting a configured resource limit
+                result['error'] = f"{error}\nCommand was killed by signal {signal_number}.".strip()
+            if stage < len(returncodes) - 1:
+                result['error'] = (f"{result['error'] or ''}\nPipeline stage {stage + 1} of {len(returncodes)} "
+                                   f"failed with exit code {returncode}.").strip()
+        else:
+            result = {'success': True, 'output': output}
+        result.update({'elapsed_time': elapsed_time, 'timed_out': timed_out, 'killed': killed})
+        if stats:
+            result.update(stats)
+        return result
+
+    def _popen_options(self, limits, process_group=0):
+        """
+        Every command runs in its own process group (0 starts a new one), so a timeout or
+        Ctrl-C can kill everything it spawned without the terminal's SIGINT reaching it
+        directly. Later stages of a pipeline join the group of the first stage.
+        """
+        options = {}
+        apply_limits = limits and resource
+        if sys.version_info >= (3, 11):
+            options['process_group'] = process_group
+        elif not apply_limits:
+            options['preexec_fn'] = lambda: os.setpgid(0, process_group)
+
+        if apply_limits:
+            def prepare_child():
+                os.setpgid(0, process_group)
+                if limits.get('cpu_seconds'):
+                    resource.setrlimit(resource.RLIMIT_CPU, (limits['cpu_seconds'], limits['cpu_seconds']))
+                if limits.get('memory_mb'):
+                    memory_bytes = limits['memory_mb'] * 1024 * 1024
+                    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+            options['preexec_fn'] = prepare_child
+        return options
+
+    def _track(self, process):
+        with self._active_lock:
+            self._active.add(process)
+
+    def _untrack(self, process):
+        with self._active_lock:
+            self._active.discard(process)
+
+    @staticmethod
+    def _kill_process_group(process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _kill_unfinished(self, processes):
+        """Kills the pipeline's process group unless every stage is known to have exited."""
+        if processes and any(process.returncode is None for process in processes):
+            self._kill_process_group(processes[0])
+
+    def cancel_all(self):
+        """Kills every command that is still running, e.g. on worker threads after Ctrl-C."""
+        with self._active_lock:
+            processes = list(self._active)
+        for process in processes:
+            if process.returncode is None:
+                self._kill_process_group(process)
+
+    @staticmethod
+    def describe(command):
+        """Returns a printable form of a shell string or argv pipeline."""
+        if isinstance(command, str):
+            return command
+        return " | ".join(shlex.join(argv) for argv in command)
+
+    def _live_view(self, command, capture):
+        from rich.panel import Panel
+        from rich.text import Text
+        return Panel(
+            Text("\n".join(list(capture.recent)), style="bright_cyan"),
+            title=f"[green]$ {self.describe(command)}[/green]",
+            subtitle=f"[dim]{capture.total_lines} lines, {capture.total_bytes} bytes[/dim]",
+            border_style="dim",
+            title_align="left"
+        )
+
+    def _spawn(self, command, limits):
+        """
+        Starts `command`: a shell string, or a pipeline given as a list of argv lists
+        whose stages are exec'd directly and connected in-process (no /bin/sh).
+        All processes share one process group and one stderr pipe.
+        Returns (processes, stdout, stderr) with binary stream objects.
+        """
+        stderr_read, stderr_write = os.pipe()
+        processes = []
+        try:
+            if isinstance(command, str):
+                processes.append(subprocess.Popen(
+                    command, stdout=subprocess.PIPE, stderr=stderr_write, shell=True,
+                    **self._popen_options(limits)
+                ))
+            else:
+                stdin = None
+                for argv in command:
+                    process_group = processes[0].pid if processes else 0
+                    process = subprocess.Popen(
+                        argv, stdin=stdin, stdout=subprocess.PIPE, stderr=stderr_write,
+                        **self._popen_options(limits, process_group)
+                    )
+                    if stdin is not None:
+                        stdin.close()  # The next stage owns the read end now
+                    stdin = process.stdout
+                    processes.append(process)
+        except Exception:
+            if processes:
+                self._kill_process_group(processes[0])
+            os.close(stderr_read)
+            raise
+        finally:
+            os.close(stderr_write)
+        return processes, processes[-1].stdout, os.fdopen(stderr_read, 'rb')
 
-    def run_command(self, command):
+    def run_command(self, command, timeout=None, limits=None):
+        """
+        Runs a command and returns a result dict. `command` is a shell string or an argv
+        pipeline (see _spawn). Output is streamed into a bounded capture (see OutputCapture)
+        and, when requested, the latest lines are shown live while the command runs.
+        `timeout` is a wall-clock limit in seconds (defaults to config.COMMAND_TIMEOUT);
+        `limits` may set 'cpu_seconds' and 'memory_mb' rlimits for the command.
+        """
+        from rich.live import Live
+        if timeout is None:
+            timeout = config.COMMAND_TIMEOUT
         start_time = time.time()
+        stdout_capture, stderr_capture = self._new_captures()
+        processes = []
+        timer = None
+        timed_out = threading.Event()
+        cancelled = False
+        finished = False
         try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True,
-                text=True,
-                encoding='utf-8'
-            )
-            output, error = process.communicate()
-            elapsed_time = time.time() - start_time
+            processes, stdout, stderr = self._spawn(command, limits)
+            leader = processes[0]
+            self._track(leader)
+            if timeout:
+                def expire():
+                    timed_out.set()
+                    self._kill_process_group(leader)
+                timer = threading.Timer(timeout, expire)
+                timer.daemon = True
+                timer.start()
+
+            stderr_reader = threading.Thread(target=stderr_capture.consume, args=(stderr,), daemon=True)
+            stderr_reader.start()
 
-            if process.returncode != 0:
-                return {'success': False, 'error': error.strip(), 'elapsed_time': elapsed_time}
+            try:
+                if getattr(self._thread_state, 'live', False):
+                    with Live(console=self.console, get_renderable=lambda: self._live_view(command, stdout_capture),
+                              refresh_per_second=8, transient=True):
+                        stdout_capture.consume(stdout)
+                else:
+                    stdout_capture.consume(stdout)
+                stderr_reader.join()
+                for process in processes:
+                    process.wait()
+            except KeyboardInterrupt:
+                # Ctrl-C cancels this command only; the agent gets a result it can react to.
+                cancelled = True
+                self._kill_process_group(leader)
+                stderr_reader.join()
+                for process in processes:
+                    process.wait()
+            stdout.close()
+            stderr.close()
+            finished = True
+        except Exception as e:
+            # e.g. a capture error: the command must not outlive its result.
+            self._kill_unfinished(processes)
+            stdout_capture.close_spill()
+            return {'success': False, 'error': str(e), 'elapsed_time': time.time() - start_time, 'timed_out': False, 'killed': False}
+        finally:
+            if not finished:
+                # Interrupted anywhere between spawn and wait (e.g. a second Ctrl-C): never orphan the command.
+                self._kill_unfinished(processes)
+            if timer:
+                timer.cancel()
+            if processes:
+                self._untrack(processes[0])
+
+        stdout_capture.close_spill()
+        return self._build_result(
+            [process.returncode for process in processes], stdout_capture.text(), stderr_capture.text(), time.time() - start_time,
+            timeout=timeout, timed_out=timed_out.is_set(), cancelled=cancelled, stats=stdout_capture.stats(),
+            shell=isinstance(command, str)
+        )
+
+    async def _spawn_async(self, command, limits):
+        """asyncio counterpart of _spawn. Returns (processes, stdout, stderr, stderr_transport)."""
+        stderr_read, stderr_write = os.pipe()
+        processes = []
+        try:
+            if isinstance(command, str):
+                processes.append(await asyncio.create_subprocess_shell(
+                    command, stdout=asyncio.subprocess.PIPE, stderr=stderr_write,
+                    limit=STREAM_BUFFER_LIMIT, **self._popen_options(limits)
+                ))
             else:
-                return {'success': True, 'output': output.strip(), 'elapsed_time': elapsed_time}
+                stdin = None
+                for index, argv in enumerate(command):
+                    last = index == len(command) - 1
+                    pipe_read, pipe_write = (None, None) if last else os.pipe()
+                    process_group = processes[0].pid if processes else 0
+                    process = await asyncio.create_subprocess_exec(
+                        *argv, stdin=stdin, stdout=asyncio.subprocess.PIPE if last else pipe_write,
+                        stderr=stderr_write, limit=STREAM_BUFFER_LIMIT,
+                        **self._popen_options(limits, process_group)
+                    )
+                    if stdin is not None:
+                        os.close(stdin)
+                    if not last:
+                        os.close(pipe_write)
+                        stdin = pipe_read
+                    processes.append(process)
+        except Exception:
+            if processes:
+                self._kill_process_group(processes[0])
+            os.close(stderr_read)
+            raise
+        finally:
+            os.close(stderr_write)
+
+        stderr = asyncio.StreamReader(limit=STREAM_BUFFER_LIMIT)
+        transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(stderr), os.fdopen(stderr_read, 'rb')
+        )
+        return processes, processes[-1].stdout, stderr, transport
+
+    async def run_command_async(self, command, timeout=None, limits=None):
+        """
+        asyncio counterpart of run_command. If the awaiting task is cancelled
+        (e.g. Ctrl-C), the command's whole process group is killed.
+        """
+        if timeout is None:
+            timeout = config.COMMAND_TIMEOUT
+        start_time = time.time()
+        processes = []
+        stderr_transport = None
+        stdout_capture, stderr_capture = self._new_captures()
+        try:
+            processes, stdout, stderr, stderr_transport = await self._spawn_async(command, limits)
+
+            async def collect():
+                await asyncio.gather(stdout_capture.consume_async(stdout), stderr_capture.consume_async(stderr))
+                for process in processes:
+                    await process.wait()
+
+            timed_out = False
+            try:
+                await asyncio.wait_for(collect(), timeout=timeout or None)
+            except asyncio.TimeoutError:
+                timed_out = True
+                self._kill_process_group(processes[0])
+                for process in processes:
+                    await process.wait()
+
+            stdout_capture.close_spill()
+            return self._build_result(
+                [process.returncode for process in processes], stdout_capture.text(), stderr_capture.text(),
+                time.time() - start_time, timeout=timeout, timed_out=timed_out, stats=stdout_capture.stats(),
+                shell=isinstance(command, str)
+            )
+        except asyncio.CancelledError:
+            self._kill_unfinished(processes)
+            stdout_capture.close_spill()
+            raise
         except Exception as e:
-            return {'success': False, 'error': str(e), 'elapsed_time': time.time() - start_time}
+            self._kill_unfinished(processes)
+            stdout_capture.close_spill()
+            return {'success': False, 'error': str(e), 'elapsed_time': time.time() - start_time, 'timed_out': False, 'killed': False}
+        finally:
+            if stderr_transport:
+                stderr_transport.close()
+
+    @staticmethod
+    def _view_indexes(count):
+        """Returns the row indexes to display: all of them, or a head and a tail above the threshold."""
+        if count <= config.OUTPUT_VIEW_MAX_ROWS:
+            return list(range(count)), 0
+        head, tail = config.OUTPUT_VIEW_HEAD_ROWS, config.OUTPUT_VIEW_TAIL_ROWS
+        return list(range(head)) + list(range(count - tail, count)), count - head - tail
+
+    def _render_table(self, table_data):
+        from rich.table import Table
+        table = Table(
+            show_header=True,
+            header_style="bold cyan",
+            border_style="dim",
+            title_justify="left",
+            caption_justify="left"
+        )
+        for header in table_data.headers:
+            table.add_column(header, no_wrap=True)
+
+        notes = dict(table_data.notes)
+        indexes, hidden = self._view_indexes(len(table_data.rows))
+        blank = [""] * (len(table_data.headers) - 1)
+        previous = -1
+        for index in indexes:
+            if index != previous + 1:
+                table.add_row(f"[dim]… {hidden} more rows …[/dim]", *blank)
+            for note_index in range(previous + 1, index + 1):
+                if note_index in notes:
+                    table.add_row(f"[dim]{notes[note_index]}[/dim]", *blank)
+            table.add_row(*table_data.rows[index])
+            previous = index
+        for note_index in sorted(notes):
+            if note_index > previous:
+                table.add_row(f"[dim]{notes[note_index]}[/dim]", *blank)
+        if hidden:
+            table.caption = f"[dim]Showing the first {config.OUTPUT_VIEW_HEAD_ROWS} and last {config.OUTPUT_VIEW_TAIL_ROWS} of {len(table_data.rows)} rows[/dim]"
+        return table
+
+    def _render_text(self, output):
+        from rich.text import Text
+        lines = output.splitlines()
+        indexes, hidden = self._view_indexes(len(lines))
+        if not hidden:
+            return Text(output, style="bright_cyan")
+        head = indexes[:config.OUTPUT_VIEW_HEAD_ROWS]
+        text = Text("\n".join(lines[i] for i in head), style="bright_cyan")
+        text.append(f"\n… {hidden} more lines (of {len(lines)}) …\n", style="dim")
+        text.append("\n".join(lines[i] for i in indexes[len(head):]), style="bright_cyan")
+        return text
 
     def print_successful_output(self, output, elapsed_time):
         """
         Prints the successful output in a styled Panel. If the output looks
-        like a table, it's rendered as a rich Table.
+        like a table, it's rendered as a rich Table. The table is detected from
+        a sample of the lines and every row is split once (see core/tabular.py);
+        long outputs show only a head and a tail with a count of what is hidden.
         """
+        from rich.panel import Panel
         title = f"✔ Success ({elapsed_time:.2f}s)"
 
         if not output.strip():
             self.console.print(Panel("[dim]No output.[/dim]", title=f"[green]{title}[/green]", border_style="green", title_align="left"))
             return
 
-        lines = output.strip().splitlines()
-        
-        # Try to render as a table
-        try:
-            headers = lines[0].split()
-            if len(lines) > 1 and len(headers) > 1 and all(len(line.split(maxsplit=len(headers)-1)) == len(headers) for line in lines[1:]):
-                table = Table(
-                    show_header=True, 
-                    header_style="bold cyan", 
-                    border_style="dim",
-                    title_align="left"
-                    )
-                for header in headers:
-                    table.add_column(header, no_wrap=True)
-
-                for line in lines[1:]:
-                    table.add_row(*line.split(maxsplit=len(headers)-1))
-                
-                panel_content = table
-
-            else:
-                raise ValueError("Not tabular data")
-
-        except Exception:
+        table_data = parse_table(output)
+        if table_data is not None:
+            panel_content = self._render_table(table_data)
+        else:
             # Fallback for non-tabular data
-            panel_content = Text(output, style="bright_cyan")
+            panel_content = self._render_text(output.strip())
 
         self.console.print(Panel(
             panel_content, 
             title=f"[green]{title}[/green]", 
             border_style="green", 
             title_align="left"
-        ))
\ No newline at end of file
+        ))
@@ -0,0 +1,184 @@
+# core/endpoints.py
+import random
+import threading
+import time
+
+import config
+
+
+# --- Typed LLM errors ---
+# Raised by the clients instead of returning an error text as if it were an assistant message.
+
+class LLMError(Exception):
+    """Base class for failed LLM requests."""
+
+
+class LLMConnectionError(LLMError):
+    """No endpoint answered: connection errors, timeouts or server errors on every attempt."""
+
+
+class LLMUnavailableError(LLMConnectionError):
+    """Every endpoint's circuit breaker is open; `retry_after` is the seconds until one may be tried again."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMRequestError(LLMError):
+    """The server rejected the request (a 4xx status other than 408/429). Retrying would not help."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class LLMResponseError(LLMError):
+    """The server answered with something that is not a chat completion."""
+
+
+# HTTP statuses worth retrying on another endpoint (or later on the same one).
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class Endpoint:
+    """One OpenAI-compatible server and its live routing state."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.outstanding = 0         # Requests in flight
+        self.latency = None          # Moving average of the request time, seconds
+        self.failures = 0            # Consecutive failures
+        self.total_requests = 0
+        self.total_failures = 0
+        self.opened_at = None        # When the circuit breaker opened; None while closed
+        self.probing = False         # A half-open trial request is in flight
+
+    @property
+    def state(self):
+        return "closed" if self.opened_at is None else ("half-open" if self.probing else "open")
+
+    def snapshot(self):
+        return {"url": self.url, "state": self.state, "outstanding": self.outstanding, "latency": self.latency,
+                "requests": self.total_requests, "failures": self.total_failures}
+
+
+class EndpointPool:
+    """
+    Routes LLM requests over several servers of the same model. A request goes
+    to the available endpoint with the fewest requests in flight (ties broken by
+    the moving-average latency), or with `strategy="latency"` to the lowest
+    expected wait (latency x (in flight + 1)). An endpoint that fails
+    `breaker_threshold` times in a row is taken out of rotation (circuit open)
+    for `breaker_cooldown` seconds, after which a single trial request decides
+    whether it comes back. Thread-safe; shared by the sync and async clients.
+    """
+
+    def __init__(self, urls, strategy="least_outstanding", breaker_threshold=3, breaker_cooldown=30.0,
+                 backoff_base=0.5, backoff_max=8.0):
+        if not urls:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = strategy
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        return cls(
+            config.LLM_ENDPOINTS,
+            strategy=config.LLM_ROUTING,
+            breaker_threshold=config.LLM_BREAKER_THRESHOLD,
+            breaker_cooldown=config.LLM_BREAKER_COOLDOWN,
+            backoff_base=config.LLM_BACKOFF_BASE,
+            backoff_max=config.LLM_BACKOFF_MAX
+        )
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def _available(self, endpoint, now):
+        if endpoint.opened_at is None:
+            return True
+        # Open: one trial request once the cooldown has passed (half-open).
+        return not endpoint.probing and now - endpoint.opened_at >= self.breaker_cooldown
+
+    def _cost(self, endpoint):
+        latency = endpoint.latency or 0.0
+        if self.strategy == "latency":
+            return (latency * (endpoint.outstanding + 1), endpoint.outstanding)
+        return (endpoint.outstanding, latency)
+
+    def acquire(self, exclude=()):
+        """
+        Picks the endpoint for the next request and counts it as in flight. Endpoints
+        in `exclude` (already tried for this request) are only used when nothing else
+        is available. Raises LLMUnavailableError when every circuit is open. When the
+        request is the half-open trial, `endpoint.probing` is set; pass it to release().
+        """
+        now = time.monotonic()
+        with self._lock:
+            available = [endpoint for endpoint in self.endpoints if self._available(endpoint, now)]
+            if not available:
+                retry_after = min(self.breaker_cooldown - (now - endpoint.opened_at)
+                                  for endpoint in self.endpoints if endpoint.opened_at is not None)
+                raise LLMUnavailableError(
+                    f"All {len(self.endpoints)} LLM endpoint(s) are failing; next retry in {max(0.0, retry_after):.0f}s",
+                    retry_after=max(0.0, retry_after))
+            candidates = [endpoint for endpoint in available if endpoint not in exclude] or available
+            endpoint = min(candidates, key=self._cost)
+            if endpoint.opened_at is not None:
+                endpoint.probing = True
+            endpoint.outstanding += 1
+            endpoint.total_requests += 1
+            return endpoint
+
+    def release(self, endpoint, success, elapsed=None, probe=False):
+        """
+        Records the outcome of a request started with acquire(). `success=None` means
+        the request was abandoned (e.g. cancelled) and says nothing about the endpoint.
+        `probe` says whether the request was the half-open trial, so a request that
+        was already in flight when the circuit opened cannot end the trial.
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if probe:
+                endpoint.probing = False
+            if success is None:
+                return
+            if success:
+                endpoint.failures = 0
+                endpoint.opened_at = None
+                if elapsed is not None:
+                    endpoint.latency = elapsed if endpoint.latency is None else 0.8 * endpoint.latency + 0.2 * elapsed
+                return
+            endpoint.failures += 1
+            endpoint.total_failures += 1
+            if endpoint.opened_at is not None or endpoint.failures >= self.breaker_threshold:
+                # A failed trial request re-opens the circuit for another cooldown.
+                endpoint.opened_at = time.monotonic()
+
+    def record_health(self, endpoint, healthy):
+        """
+        Applies the result of an out-of-band health check. A failed check counts
+        towards `breaker_threshold` like a failed request.
+        """
+        with self._lock:
+            if healthy:
+                endpoint.failures = 0
+                endpoint.opened_at = None
+                return
+            endpoint.failures += 1
+            if endpoint.opened_at is None and endpoint.failures >= self.breaker_threshold:
+                endpoint.opened_at = time.monotonic()
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter for retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def status(self):
+        with self._lock:
+            return [endpoint.snapshot() for endpoint in self.endpoints]
@@ -3,83 +3,412 @@ import requests
 import json
 import config
 import time
+import threading
+from contextlib import contextmanager
+from core.endpoints import EndpointPool, LLMConnectionError, LLMRequestError, LLMResponseError, RETRYABLE_STATUSES
+from core.request_body import RequestBodyBuilder
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+
+# Connect times are recorded per thread so concurrent requests don't mix them up.
+_connect_timing = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    Keep-alive connection pool that records how long it took to open a new
+    connection (TCP + TLS). A connect time of 0 means a pooled connection was reused.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        _connect_timing.seconds = 0.0
+        response = super().send(request, **kwargs)
+        response.connect_time = _connect_timing.seconds
+        return response
+
+
+class ToolCallAssembler:
+    """
+    Reassembles streamed `tool_calls` deltas (name and argument JSON fragments)
+    into complete tool calls. A call is reported as complete as soon as its
+    arguments parse as a JSON object, or when a later call / the end of the
+    stream shows that no more fragments can arrive for it.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._by_index = {}
+        self._completed = set()
+
+    def add(self, deltas):
+        """Merges a list of tool call deltas and returns the calls they completed."""
+        completed = []
+        for position, delta in enumerate(deltas):
+            index = delta.get('index', position)
+            call = self._by_index.get(index)
+            if call is None:
+                # A new call starting means every earlier one has received all its fragments.
+                completed.extend(self._complete_all())
+                call = {
+                    "id": delta.get('id') or f"call_{index}",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                }
+                self._by_index[index] = call
+                self.calls.append(call)
+            elif delta.get('id'):
+                call["id"] = delta['id']
+
+            function = delta.get('function') or {}
+            if function.get('name'):
+                call["function"]["name"] += function['name']
+            arguments = function.get('arguments')
+            if arguments:
+                call["function"]["arguments"] += arguments if isinstance(arguments, str) else json.dumps(arguments)
+
+            if id(call) not in self._completed and self._arguments_complete(call):
+                self._completed.add(id(call))
+                completed.append(call)
+        return completed
+
+    def finish(self):
+        """Returns the calls that were still open when the stream ended."""
+        return self._complete_all()
+
+    def _complete_all(self):
+        completed = [call for call in self.calls if id(call) not in self._completed]
+        self._completed.update(id(call) for call in completed)
+        return completed
+
+    @staticmethod
+    def _arguments_complete(call):
+        arguments = call["function"]["arguments"].rstrip()
+        if not call["function"]["name"] or not arguments.endswith('}'):
+            return False
+        try:
+            return isinstance(json.loads(arguments), dict)
+        except json.JSONDecodeError:
+            return False
+
 
 # This client is now STATELESS. It does not hold its own history.
 # The history is managed by the TaskManager and passed in for each call.
+# It does own a pooled keep-alive HTTP session, so create one per TaskManager and reuse it.
+# Requests are routed over an EndpointPool (one or more servers); failures raise
+# the typed errors from core/endpoints.py.
 class GenericClient:
-    def __init__(self):
-        self.base_url = config.HOST
+    def __init__(self, response_cache=None, pool=None):
+        self.pool = pool or EndpointPool.from_config()
         self.api_key = config.API_KEY
         self.model = config.MODEL
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
+        self.timeout = (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+        self.body_builder = RequestBodyBuilder(self.model)
+        self.last_timing = None
+        self.last_usage = None
+        self.last_model = None
+        self.response_cache = response_cache
+        self.last_cache_hit = False
 
-    def get_tool_response(self, messages, tools):
-        endpoint = f"{self.base_url}/chat/completions"
-        payload = {
-            "model": self.model,
-            "messages": messages, # Use passed-in messages
-        }
-        if tools:
-            payload["tools"] = tools
-            payload["tool_choice"] = "auto"
-        
-        last_error = None
-        for attempt in range(3):
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = TimedHTTPAdapter(
+            pool_connections=max(config.HTTP_POOL_CONNECTIONS, len(self.pool)),
+            pool_maxsize=config.HTTP_POOL_MAXSIZE
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._health_stop = threading.Event()
+        if config.LLM_HEALTH_CHECK_INTERVAL and len(self.pool) > 1:
+            threading.Thread(target=self._health_loop, name="llm-health", daemon=True).start()
+
+    def close(self):
+        """Stops the health checks and closes all pooled connections."""
+        self._health_stop.set()
+        self.session.close()
+
+    # --- Endpoint routing ---
+
+    def check_health(self):
+        """Probes every endpoint with GET /models and updates its circuit breaker."""
+        for endpoint in self.pool.endpoints:
             try:
-                response = requests.post(endpoint, headers=self.headers, json=payload, timeout=60)
-                response.raise_for_status()
+                response = self.session.get(f"{endpoint.url}/models", timeout=(config.HTTP_CONNECT_TIMEOUT, 5))
+                response.close()
+                healthy = response.status_code < 500
+            except requests.exceptions.RequestException:
+                healthy = False
+            self.pool.record_health(endpoint, healthy)
+
+    def _health_loop(self):
+        while not self._health_stop.wait(config.LLM_HEALTH_CHECK_INTERVAL):
+            self.check_health()
+
+    def _endpoints(self, errors):
+        """
+        Yields the endpoint for each attempt of one request: the pool's pick, failing
+        over to endpoints not tried yet, with exponential backoff and jitter once all
+        of them have failed. Raises LLMConnectionError when the attempts run out.
+        """
+        tried = set()
+        for attempt in range(config.LLM_MAX_ATTEMPTS):
+            if attempt and len(tried) >= len(self.pool):
+                time.sleep(self.pool.backoff(attempt - 1))
+            endpoint = self.pool.acquire(exclude=tried)
+            tried.add(endpoint)
+            yield endpoint, endpoint.probing
+        raise LLMConnectionError(f"LLM request failed after {config.LLM_MAX_ATTEMPTS} attempt(s): {errors[-1] if errors else 'no response'}")
+
+    @contextmanager
+    def _attempt(self, endpoint, errors, probe=False):
+        """
+        Runs one attempt against `endpoint` and reports its outcome to the pool.
+        Connection errors, retryable statuses and malformed responses are recorded
+        in `errors` and suppressed, so the caller's loop moves on to the next
+        attempt. `probe` marks the attempt that is the endpoint's half-open trial.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        except (requests.exceptions.RequestException, LLMResponseError) as e:
+            self.pool.release(endpoint, False, probe=probe)
+            errors.append(f"{endpoint.url}: {e}")
+            return
+        except LLMRequestError:
+            self.pool.release(endpoint, True, probe=probe)  # The server is up; the request was wrong
+            raise
+        except (GeneratorExit, KeyboardInterrupt):
+            self.pool.release(endpoint, None, probe=probe)  # Abandoned by the caller: no verdict on the endpoint
+            raise
+        except BaseException:
+            self.pool.release(endpoint, False, probe=probe)
+            raise
+        self.pool.release(endpoint, True, time.perf_counter() - start_time, probe=probe)
+
+    def _post(self, endpoint, body, stream=False):
+        """
+        POSTs a request body to one endpoint. Retryable error statuses raise a
+        requests HTTPError; other error statuses raise LLMRequestError.
+        """
+        response = self.session.post(f"{endpoint.url}/chat/completions", data=body, stream=stream, timeout=self.timeout)
+        if response.status_code >= 400:
+            detail = f"HTTP {response.status_code} from {endpoint.url}: {response.text[:300]}"
+            response.close()
+            if response.status_code in RETRYABLE_STATUSES:
+                raise requests.exceptions.HTTPError(detail, response=response)
+            raise LLMRequestError(detail, status=response.status_code)
+        return response
+
+    def _record_timing(self, response, start_time, endpoint=None):
+        """Stores the connect / time-to-first-byte / total breakdown of the last request."""
+        connect_time = getattr(response, 'connect_time', 0.0)
+        self.last_timing = {
+            "connect": connect_time,
+            "ttfb": response.elapsed.total_seconds(),
+            "total": time.perf_counter() - start_time,
+            "reused_connection": connect_time == 0.0,
+            "endpoint": endpoint.url if endpoint else None
+        }
+
+    def _cache_key(self, messages, tools, use_cache, model):
+        """Returns the response cache key for this call, or None when caching is off."""
+        if not use_cache or not self.response_cache:
+            return None
+        return self.response_cache.make_key(model, messages, tools)
+
+    def get_tool_response(self, messages, tools, use_cache=False, model=None):
+        """
+        Returns the assistant message. With `use_cache`, identical requests (same model,
+        messages and tools) are answered from the response cache. `model` overrides
+        the configured model for this call. Raises an LLMError when no endpoint
+        returns a valid completion.
+        """
+        model = model or self.model
+        self.last_timing = None
+        self.last_usage = None
+        self.last_model = model
+        self.last_cache_hit = False
+        cache_key = self._cache_key(messages, tools, use_cache, model)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self.last_cache_hit = True
+                return cached
+
+        body = self.body_builder.build(messages, tools, model=model)
+
+        errors = []
+        for endpoint, probe in self._endpoints(errors):
+            with self._attempt(endpoint, errors, probe):
+                start_time = time.perf_counter()
+                response = self._post(endpoint, body)
 
                 try:
                     response_json = response.json()
                 except json.JSONDecodeError:
-                    return {"role": "assistant", "content": "API Error: Received an invalid response from the server."}
-                
+                    raise LLMResponseError(f"Invalid JSON response from {endpoint.url}")
+                finally:
+                    self._record_timing(response, start_time, endpoint)
+
                 if not response_json or 'choices' not in response_json or not response_json['choices']:
-                    return {"role": "assistant", "content": "API Error: Received an empty or malformed response from the server."}
-
-                return response_json['choices'][0]['message']
-            except requests.exceptions.RequestException as e:
-                last_error = e
-                time.sleep(2)
-        
-        return {"role": "assistant", "content": f"API Connection Error: {last_error}"}
-
-    def get_streaming_response(self, messages):
-        endpoint = f"{self.base_url}/chat/completions"
-        payload = {
-            "model": self.model,
-            "messages": messages, # Use passed-in messages
-            "stream": True
-        }
-        full_response = ""
-        last_error = None
-        
-        for attempt in range(3):
-            try:
-                response = requests.post(endpoint, headers=self.headers, json=payload, stream=True, timeout=60)
-                response.raise_for_status()
-                for line in response.iter_lines():
-                    if line:
-                        decoded_line = line.decode('utf-8')
-                        if decoded_line.startswith('data: '):
-                            json_str = decoded_line[len('data: '):]
-                            if json_str.strip() == '[DONE]':
-                                break
-                            try:
-                                chunk = json.loads(json_str)
-                                content = chunk['choices'][0]['delta'].get('content', '')
-                                if content:
-                                    full_response += content
-                                    yield content
-                            except (json.JSONDecodeError, KeyError):
-                                continue
+                    raise LLMResponseError(f"Empty or malformed response from {endpoint.url}")
+
+                self.last_usage = response_json.get('usage')
+                message = response_json['choices'][0]['message']
+                if cache_key:
+                    self.response_cache.put(cache_key, message)
+                return message
+
+    def get_streaming_response(self, messages, model=None):
+        model = model or self.model
+        body = self.body_builder.build(messages, stream=True, model=model)
+        self.last_timing = None
+        self.last_model = model
+
+        errors = []
+        for endpoint, probe in self._endpoints(errors):
+            started = False
+            with self._attempt(endpoint, errors, probe):
+                start_time = time.perf_counter()
+                response = self._post(endpoint, body, stream=True)
+                try:
+                    for line in response.iter_lines():
+                        if line:
+                            decoded_line = line.decode('utf-8')
+                            if decoded_line.startswith('data: '):
+                                json_str = decoded_line[len('data: '):]
+                                if json_str.strip() == '[DONE]':
+                                    break
+                                try:
+                                    chunk = json.loads(json_str)
+                                    content = chunk['choices'][0]['delta'].get('content', '')
+                                    if content:
+                                        started = True
+                                        yield content
+                                except (json.JSONDecodeError, KeyError):
+                                    continue
+                except requests.exceptions.RequestException as e:
+                    if started:
+                        # Text was already handed out; retrying would repeat it.
+                        raise LLMConnectionError(f"Stream from {endpoint.url} broke off: {e}") from e
+                    raise
+                finally:
+                    # Release the connection back to the pool even if the consumer stops early.
+                    response.close()
+                    self._record_timing(response, start_time, endpoint)
+                return
+
+    def get_streaming_tool_response(self, messages, tools, use_cache=False, model=None):
+        """
+        Streams a tool-enabled completion as a sequence of (event, data) tuples:
+          ("content", text)    - a fragment of assistant text, as soon as it arrives
+          ("tool_call", call)  - a tool call whose arguments are complete
+          ("message", message) - the fully assembled assistant message, always last
+        A response cache hit is replayed as the same events. Raises an LLMError when
+        no endpoint completes the stream.
+        """
+        model = model or self.model
+        self.last_timing = None
+        self.last_usage = None
+        self.last_model = model
+        self.last_cache_hit = False
+        cache_key = self._cache_key(messages, tools, use_cache, model)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self.last_cache_hit = True
+                if cached.get('content'):
+                    yield ("content", cached['content'])
+                for call in cached.get('tool_calls') or []:
+                    yield ("tool_call", call)
+                yield ("message", cached)
                 return
-            except requests.exceptions.RequestException as e:
-                last_error = e
-                time.sleep(2)
 
-        error_message = f"API Connection Error: {last_error}"
-        yield error_message
\ No newline at end of file
+        body = self.body_builder.build(messages, tools, stream=True, model=model)
+
+        errors = []
+        for endpoint, probe in self._endpoints(errors):
+            content = ""
+            assembler = ToolCallAssembler()
+            started = False
+            with self._attempt(endpoint, errors, probe):
+                start_time = time.perf_counter()
+                response = self._post(endpoint, body, stream=True)
+                try:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        decoded_line = line.decode('utf-8')
+                        if not decoded_line.startswith('data: '):
+                            continue
+                        json_str = decoded_line[len('data: '):]
+                        if json_str.strip() == '[DONE]':
+                            break
+                        try:
+                            chunk = json.loads(json_str)
+                            if chunk.get('usage'):
+                                self.last_usage = chunk['usage']  # Sent by servers that report streaming usage
+                            delta = chunk['choices'][0]['delta']
+                        except (json.JSONDecodeError, KeyError, IndexError, AttributeError):
+                            continue
+
+                        if delta.get('content'):
+                            started = True
+                            content += delta['content']
+                            yield ("content", delta['content'])
+                        for call in assembler.add(delta.get('tool_calls') or []):
+                            started = True
+                            yield ("tool_call", call)
+                except requests.exceptions.RequestException as e:
+                    if started:
+                        # Fragments were already handed out; retrying would replay them.
+                        raise LLMConnectionError(f"Stream from {endpoint.url} broke off: {e}") from e
+                    raise
+                finally:
+                    response.close()
+                    self._record_timing(response, start_time, endpoint)
+
+                for call in assembler.finish():
+                    yield ("tool_call", call)
+
+                message = {"role": "assistant", "content": content}
+                if assembler.calls:
+                    message["tool_calls"] = assembler.calls
+                if cache_key:
+                    self.response_cache.put(cache_key, message)
+                yield ("message", message)
+                return
@@ -0,0 +1,240 @@
+# core/history.py
+import json
+
+# Approximate framing overhead the chat format adds around every message
+# (role marker, separators), as described in OpenAI's token counting notes.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class ConversationHistory:
+    """
+    Ordered store for the agent's conversation messages.
+    Each message is tokenized exactly once when it is appended; the
+    per-message counts and a running total are kept alongside the messages so
+    pruning and the step banner never have to re-encode the history.
+    Pruning compacts old tool results before it drops whole turns (see prune);
+    the history is only scanned when it is over the token limit.
+    """
+
+    def __init__(self, tokenizer=None, max_tokens=None, on_prune=None,
+                 compact_tool_tokens=None, compact_keep_lines=10, prune_target=1.0):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.on_prune = on_prune  # Called with (messages dropped, tokens freed, tool results compacted)
+        self.compact_tool_tokens = compact_tool_tokens  # Older tool results above this size are compacted
+        self.compact_keep_lines = compact_keep_lines
+        # Once over the limit, prune down to this fraction of it. Below 1.0, pruning
+        # happens in fewer, larger chunks, which keeps the prompt prefix stable longer.
+        self.prune_target = prune_target
+        self._messages = []
+        self._token_counts = []
+        self._compacted = []  # Whether each message already holds its compacted form
+        self.token_count = 0
+        # The turn the newest message belongs to, tracked as messages are appended.
+        self._turn_start = 0
+        self._turn_call_ids = set()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    def messages(self):
+        """Returns a shallow copy of the messages, ready to be sent to the API."""
+        return list(self._messages)
+
+    def count_tokens(self, message):
+        """Counts the tokens of a single message, including any tool call payloads."""
+        if not self.tokenizer:
+            return 0
+
+        parts = []
+        content = message.get("content")
+        if content:
+            parts.append(content if isinstance(content, str) else json.dumps(content))
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function", {})
+            parts.append(function.get("name") or "")
+            arguments = function.get("arguments") or ""
+            parts.append(arguments if isinstance(arguments, str) else json.dumps(arguments))
+        if message.get("tool_call_id"):
+            parts.append(message["tool_call_id"])
+
+        return MESSAGE_OVERHEAD_TOKENS + sum(len(self.tokenizer.encode(part)) for part in parts if part)
+
+    def append(self, message):
+        """Appends a message, caches its token count and prunes if necessary. Returns the token count."""
+        count = self.count_tokens(message)
+        closed_turn = None
+        if not (message.get("role") == "tool" and message.get("tool_call_id") in self._turn_call_ids):
+            # The message starts a new turn, which closes the previous one.
+            closed_turn = (self._turn_start, len(self._messages))
+            self._turn_start = len(self._messages)
+            self._turn_call_ids = {call.get("id") for call in message.get("tool_calls") or []} \
+                if message.get("role") == "assistant" else set()
+        self._messages.append(message)
+        self._token_counts.append(count)
+        self._compacted.append(False)
+        self.token_count += count
+        self.prune(closed_turn)
+        return count
+
+    def pop(self, index=-1):
+        message = self._messages.pop(index)
+        self._compacted.pop(index)
+        self.token_count -= self._token_counts.pop(index)
+        return message
+
+    # --- Compaction ---
+
+    def _turns(self):
+        """
+        Splits the history into (start, end) index ranges that must be kept or
+        dropped as a unit: an assistant message together with the tool results
+        answering its calls, or a single user message.
+        """
+        turns = []
+        index = 0
+        while index < len(self._messages):
+            end = index + 1
+            message = self._messages[index]
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                call_ids = {call.get("id") for call in message["tool_calls"]}
+                while end < len(self._messages) and self._messages[end].get("role") == "tool" \
+                        and self._messages[end].get("tool_call_id") in call_ids:
+                    end += 1
+            turns.append((index, end))
+            index = end
+        return turns
+
+    def _pinned_turns(self, turns):
+        """The turns that are never dropped: the latest goal, the latest plan and the current turn."""
+        pinned = {turns[-1]} if turns else set()
+        goal = next((turn for turn in reversed(turns) if self._messages[turn[0]].get("role") == "user"), None)
+        plan = next((turn for turn in reversed(turns) if any(
+            call.get("function", {}).get("name") == "explain_plan"
+            for call in self._messages[turn[0]].get("tool_calls") or []
+        )), None)
+        pinned.update(turn for turn in (goal, plan) if turn)
+        return pinned
+
+    def _compact_content(self, content):
+        """
+        Returns a shortened tool result: the status fields are kept and the output
+        is cut down to its first and last lines, with a note of what was removed.
+        Handles both JSON results and the compact plain-text envelope
+        (core/result_encoding.py), whose header lines are kept as they are.
+        """
+        try:
+            result = json.loads(content)
+        except (TypeError, json.JSONDecodeError):
+            result = None
+        keep = max(2, self.compact_keep_lines)
+
+        def shorten(text):
+            lines = text.splitlines()
+            if len(lines) <= keep:
+                return text if len(text) <= keep * 200 else text[:keep * 200] + " [... compacted]"
+            head, tail = lines[:keep // 2], lines[-(keep - keep // 2):]
+            return "\n".join(head + [f"[... compacted: {len(lines) - keep} of {len(lines)} lines omitted ...]"] + tail)
+
+        if not isinstance(result, dict):
+            lines = (content or "").splitlines()
+            if lines and lines[0].startswith("status: "):
+                body_start = next((index + 1 for index, line in enumerate(lines)
+                                   if line.startswith("output") and line.endswith(":")), len(lines))
+                body = "\n".join(lines[body_start:])
+                return "\n".join(lines[:body_start] + ([shorten(body), "[compacted]"] if body else ["[compacted]"]))
+            return shorten(content or "")
+        compacted = {key: result[key] for key in ("success", "returncode", "timed_out", "killed", "truncated", "full_output_file") if key in result}
+        for key in ("output", "error"):
+            if isinstance(result.get(key), str):
+                compacted[key] = shorten(result[key])
+        compacted["compacted"] = True
+        return json.dumps(compacted)
+
+    def _compact(self, index):
+        """Replaces a tool message with its compacted form. Returns the tokens saved."""
+        message = self._messages[index]
+        compacted = dict(message, content=self._compact_content(message.get("content")))
+        count = self.count_tokens(compacted)
+        saved = self._token_counts[index] - count
+        self._compacted[index] = True
+        if saved <= 0:
+            return 0
+        # Stored in place: it is computed once and every later request sends the same text.
+        self._messages[index] = compacted
+        self._token_counts[index] = count
+        self.token_count -= saved
+        return saved
+
+    def _compact_tool_results(self, before, min_tokens=0, start=0):
+        """Compacts the tool results in [start, before) that are larger than `min_tokens`."""
+        compacted = 0
+        for index in range(start, before):
+            if self._messages[index].get("role") == "tool" and not self._compacted[index] \
+                    and self._token_counts[index] > min_tokens:
+                if self._compact(index) > 0:
+                    compacted += 1
+        return compacted
+
+    def prune(self, closed_turn=None):
+        """
+        Keeps the history within the token limit, cheapest loss first:
+          1. large tool results of `closed_turn`, the (start, end) range of the turn
+             that was just completed, are compacted (always, once);
+          2. when over the limit, every earlier tool result is compacted;
+          3. then the oldest turns are dropped, down to `prune_target` of the limit,
+             an assistant message together with its tool results so no orphan tool
+             message is left behind; the latest goal, the latest plan and the
+             current turn are pinned;
+          4. as a last resort, the remaining tool results are compacted too.
+        """
+        if not self.tokenizer:
+            return
+
+        tokens_before = self.token_count
+        compacted = 0
+        if self.compact_tool_tokens and closed_turn:
+            compacted += self._compact_tool_results(closed_turn[1], self.compact_tool_tokens, start=closed_turn[0])
+
+        removed_messages = 0
+        if self.max_tokens and self.token_count > self.max_tokens:
+            turns = self._turns()
+            current_turn_start = turns[-1][0] if turns else 0
+            compacted += self._compact_tool_results(current_turn_start)
+            target = self.max_tokens * self.prune_target
+            if self.token_count > target:
+                pinned = self._pinned_turns(turns)
+                drop = []
+                freed = 0
+                for turn in turns:
+                    if self.token_count - freed <= target:
+                        break
+                    if turn not in pinned:
+                        drop.append(turn)
+                        freed += sum(self._token_counts[turn[0]:turn[1]])
+                # Delete from the back so earlier indexes stay valid.
+                for start, end in reversed(drop):
+                    for index in range(end - 1, start - 1, -1):
+                        self.pop(index)
+                    removed_messages += end - start
+                # The current turn is pinned, so it is still the last one.
+                self._turn_start -= removed_messages
+            if self.token_count > self.max_tokens:
+                compacted += self._compact_tool_results(len(self._messages))
+
+        if (removed_messages or compacted) and self.on_prune:
+            self.on_prune(removed_messages, tokens_before - self.token_count, compacted)
+
+    def clear(self):
+        self._messages = []
+        self._token_counts = []
+        self._compacted = []
+        self.token_count = 0
+        self._turn_start = 0
+        self._turn_call_ids = set()
@@ -0,0 +1,53 @@
+# core/intent_router.py
+import re
+
+# Words that do not change what a short request asks for ("please show me my disk usage"
+# and "disk usage" are the same goal). They are dropped before the rules are matched.
+# Articles are kept: "what is a load average" asks for an explanation, not for `uptime`.
+FILLER_WORDS = frozenset("""
+    and are about been can check could current currently display do does for get give has have
+    host how i in is it list machine me much my now of on please print quick right see server show system
+    tell the there this view what whats you
+""".split())
+
+
+def normalize_goal(goal):
+    """Lowercases a goal, drops punctuation and filler words: 'What's my uptime?' -> 'uptime'."""
+    words = re.sub(r"[^a-z0-9%/._-]+", " ", goal.lower().replace("'", "")).split()
+    # '.' is kept inside words (paths, file names) but not as the end of a sentence.
+    words = [word.rstrip(".") for word in words]
+    return " ".join(word for word in words if word and word not in FILLER_WORDS)
+
+
+class Route:
+    """A goal matched by a fast-path rule: the tool call to make instead of planning."""
+
+    def __init__(self, rule, tool, arguments, summarize):
+        self.rule = rule
+        self.tool = tool
+        self.arguments = arguments
+        self.summarize = summarize
+
+
+class IntentRouter:
+    """
+    Maps short, common goals straight to a tool call so they skip the PLANNING and
+    EXECUTING round-trips. A rule matches only when its pattern covers the whole
+    normalized goal, so anything beyond the plain request ("disk usage of /var and
+    delete old logs") goes to the agent as usual. Rules are dicts with 'name',
+    'pattern' (a regex), 'tool', 'arguments' and optionally 'summarize' (False shows
+    the output as the answer, without an LLM call).
+    """
+
+    def __init__(self, rules):
+        self.rules = [(rule, re.compile(rule["pattern"])) for rule in rules]
+
+    def match(self, goal):
+        """Returns the Route for `goal`, or None when no rule covers it."""
+        normalized = normalize_goal(goal)
+        if not normalized:
+            return None
+        for rule, pattern in self.rules:
+            if pattern.fullmatch(normalized):
+                return Route(rule["name"], rule["tool"], dict(rule.get("arguments") or {}), rule.get("summarize", True))
+        return None
@@ -0,0 +1,138 @@
+# core/output_capture.py
+import os
+from collections import deque
+
+# Bytes read from a stream at a time; lines are split out of these chunks by the capture.
+READ_CHUNK_BYTES = 65536
+# Bytes kept per line for every character of max_line_chars (UTF-8 needs at most 4).
+_BYTES_PER_CHAR = 4
+
+
+class OutputCapture:
+    """
+    Bounded-memory capture of a command's output stream.
+    Only the first `head_lines` and the last `tail_lines` lines are kept in
+    memory, along with the total byte and line counts. The stream is read in
+    fixed-size chunks and an over-long line is cut while it arrives, so a single
+    huge line is never held in memory either. The full stream can be spilled to
+    a file so nothing is lost when the window is truncated.
+    """
+
+    def __init__(self, head_lines, tail_lines, max_line_chars, spill_file=None, recent_lines=0):
+        self.head_lines = head_lines
+        self.max_line_chars = max_line_chars
+        self.head = []
+        self.tail = deque(maxlen=tail_lines)
+        self.recent = deque(maxlen=recent_lines)  # Rolling view for live display
+        self.total_lines = 0
+        self.total_bytes = 0
+        self.cut_lines = 0  # Lines longer than max_line_chars
+        self.spill_file = spill_file
+        self._partial = bytearray()  # Start of the line still being read
+        self._partial_bytes = 0      # Its full length, including the bytes not kept
+        self._max_line_bytes = max_line_chars * _BYTES_PER_CHAR
+
+    def feed(self, chunk):
+        """Records a chunk of raw output; complete lines are added as they appear."""
+        self.total_bytes += len(chunk)
+        if self.spill_file:
+            self.spill_file.write(chunk)
+        start = 0
+        while True:
+            end = chunk.find(b'\n', start)
+            if end < 0:
+                self._keep(chunk[start:])
+                return
+            self._keep(chunk[start:end + 1])
+            self._add_line()
+            start = end + 1
+
+    def _keep(self, data):
+        self._partial_bytes += len(data)
+        room = self._max_line_bytes - len(self._partial)
+        if room >= len(data):
+            self._partial += data
+        elif room > 0:
+            self._partial += data[:int(room)]
+
+    def finish(self):
+        """Adds the last line if the stream did not end with a newline."""
+        if self._partial_bytes:
+            self._add_line()
+
+    def _add_line(self):
+        line_bytes = self._partial_bytes
+        line = bytes(self._partial).decode('utf-8', errors='replace').rstrip('\r\n')
+        self._partial = bytearray()
+        self._partial_bytes = 0
+        self.total_lines += 1
+        if len(line) > self.max_line_chars or line_bytes > self._max_line_bytes:
+            self.cut_lines += 1
+            line = line[:self.max_line_chars] + f" [... line truncated, {line_bytes} bytes in total]"
+
+        if len(self.head) < self.head_lines:
+            self.head.append(line)
+        else:
+            self.tail.append(line)
+        if self.recent.maxlen:
+            self.recent.append(line)
+
+    def consume(self, stream):
+        """Reads a binary stream in chunks until EOF."""
+        read = getattr(stream, 'read1', stream.read)  # read1 returns whatever is available
+        for chunk in iter(lambda: read(READ_CHUNK_BYTES), b''):
+            self.feed(chunk)
+        self.finish()
+
+    async def consume_async(self, stream):
+        """asyncio counterpart of consume, for asyncio.StreamReader."""
+        while True:
+            chunk = await stream.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            self.feed(chunk)
+        self.finish()
+
+    @property
+    def omitted_lines(self):
+        return self.total_lines - len(self.head) - len(self.tail)
+
+    @property
+    def truncated(self):
+        return self.omitted_lines > 0 or self.cut_lines > 0
+
+    def close_spill(self):
+        """
+        Closes the spill file. It is kept only if the in-memory window was truncated.
+        Returns its path, or None.
+        """
+        if not self.spill_file:
+            return None
+        self.spill_file.close()
+        if self.truncated:
+            return self.spill_file.name
+        os.unlink(self.spill_file.name)
+        self.spill_file = None
+        return None
+
+    def text(self):
+        """Returns the captured window, with a marker describing what was omitted."""
+        if not self.omitted_lines:
+            return "\n".join(self.head + list(self.tail)).strip()
+
+        marker = f"[... {self.omitted_lines} lines omitted; {self.total_lines} lines, {self.total_bytes} bytes in total"
+        if self.spill_file:
+            marker += f"; full output saved to {self.spill_file.name}"
+        marker += " ...]"
+        return "\n".join(self.head + [marker] + list(self.tail)).strip()
+
+    def stats(self):
+        """Returns the counters that are added to a command result."""
+        stats = {
+            'output_lines': self.total_lines,
+            'output_bytes': self.total_bytes,
+            'truncated': self.truncated
+        }
+        if self.truncated and self.spill_file:
+            stats['full_output_file'] = self.spill_file.name
+        return stats
@@ -0,0 +1,99 @@
+# core/plan_batch.py
+import json
+
+# Tools a batched plan may not contain: they are handled by the agent loop itself.
+LOOP_TOOLS = {"explain_plan", "answer_question", "generate_linux_command"}
+
+
+class PlanError(ValueError):
+    """The plan's steps are not a valid, runnable list of tool calls."""
+
+
+class PlanStep:
+    """
+    One tool invocation of a batched plan. `depends_on` are the steps the model said
+    it needs (it is skipped when one of them fails); `after` are the steps it is only
+    ordered behind because a state-changing step is involved.
+    """
+
+    def __init__(self, step_id, tool, arguments, depends_on):
+        self.id = step_id
+        self.tool = tool
+        self.arguments = arguments
+        self.depends_on = depends_on
+        self.after = []
+        self.tool_call = {"id": f"plan_{step_id}", "type": "function",
+                          "function": {"name": tool, "arguments": json.dumps(arguments)}}
+
+
+def _parse_step(index, raw, check_call):
+    if not isinstance(raw, dict):
+        raise PlanError(f"step {index + 1} is not an object")
+    step_id = str(raw.get("id") or f"step{index + 1}")
+    tool = raw.get("tool")
+    if not isinstance(tool, str) or tool in LOOP_TOOLS:
+        raise PlanError(f"step '{step_id}' has no usable tool ({tool!r})")
+    arguments = raw.get("arguments") or {}
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments)
+        except json.JSONDecodeError:
+            raise PlanError(f"step '{step_id}' arguments are not valid JSON")
+    error = check_call(tool, arguments)
+    if error:
+        raise PlanError(f"step '{step_id}': {error}")
+    depends_on = raw.get("depends_on") or []
+    if isinstance(depends_on, str):
+        depends_on = [depends_on]
+    if not isinstance(depends_on, list):
+        raise PlanError(f"step '{step_id}' depends_on must be a list of step ids")
+    return PlanStep(step_id, tool, arguments, [str(dependency) for dependency in depends_on])
+
+
+def build_plan(raw_steps, check_call, parallel_safe, max_steps=None):
+    """
+    Validates the steps of a plan and orders them into waves: every step of a wave
+    only depends on steps of earlier waves, so a wave's steps can run concurrently.
+    `check_call(tool, arguments)` returns why a call would be rejected (or None);
+    `parallel_safe(tool, arguments)` says whether it may run next to other steps.
+    A step that is not parallel-safe (e.g. create_file, mkdir) is a barrier: it runs
+    alone, after every step listed before it and before every step listed after it.
+    Barrier ordering is kept in `after`, apart from the declared `depends_on`.
+    Raises PlanError for invalid steps, unknown dependencies and cycles.
+    """
+    if not isinstance(raw_steps, list) or not raw_steps:
+        raise PlanError("steps must be a non-empty list")
+    if max_steps and len(raw_steps) > max_steps:
+        raise PlanError(f"the plan has {len(raw_steps)} steps; at most {max_steps} can be batched")
+
+    steps = [_parse_step(index, raw, check_call) for index, raw in enumerate(raw_steps)]
+    by_id = {}
+    for step in steps:
+        if step.id in by_id:
+            raise PlanError(f"duplicate step id '{step.id}'")
+        by_id[step.id] = step
+    for step in steps:
+        for dependency in step.depends_on:
+            if dependency not in by_id or dependency == step.id:
+                raise PlanError(f"step '{step.id}' depends on unknown step '{dependency}'")
+
+    # Barriers keep state-changing steps in the order they were listed.
+    last_barrier = None
+    for index, step in enumerate(steps):
+        if not parallel_safe(step.tool, step.arguments):
+            step.after = [earlier.id for earlier in steps[:index]]
+            last_barrier = step
+        elif last_barrier is not None:
+            step.after = [last_barrier.id]
+
+    waves = []
+    placed = set()
+    remaining = list(steps)
+    while remaining:
+        wave = [step for step in remaining if all(dependency in placed for dependency in step.depends_on + step.after)]
+        if not wave:
+            raise PlanError(f"steps {', '.join(repr(step.id) for step in remaining)} depend on each other in a cycle")
+        waves.append(wave)
+        placed.update(step.id for step in wave)
+        remaining = [step for step in remaining if step.id not in placed]
+    return waves
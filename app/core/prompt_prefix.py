@@ -0,0 +1,61 @@
+# core/prompt_prefix.py
+import hashlib
+import json
+
+
+class PrefixTracker:
+    """
+    Measures how much of each request's prompt is an unchanged prefix of the
+    previous request. Servers with prefix (KV) caching such as llama.cpp, vLLM
+    and Ollama only skip the prefill for that part, so it is a direct indicator
+    of how much prompt processing a request can reuse.
+    Messages are fingerprinted once: an unchanged message object is not re-encoded.
+    """
+
+    def __init__(self):
+        self._previous = []   # [(fingerprint, size)] of the previous request
+        self._cache = {}      # id(message) -> (message, fingerprint, size) for the previous request
+
+    def _fingerprint(self, item, cache):
+        cached = self._cache.get(id(item))
+        if cached is not None and cached[0] is item:
+            entry = cached
+        else:
+            encoded = json.dumps(item, sort_keys=True, separators=(",", ":")).encode("utf-8")
+            entry = (item, hashlib.sha1(encoded).digest(), len(encoded))
+        cache[id(item)] = entry
+        return entry[1], entry[2]
+
+    def observe(self, messages, tools=None):
+        """
+        Records a request and returns its prefix reuse: the number of leading items
+        (the tool schemas count as the first one) and bytes unchanged from the
+        previous request, and the unchanged share of the request.
+        """
+        cache = {}
+        items = ([tools] if tools else []) + list(messages)
+        current = [self._fingerprint(item, cache) for item in items]
+
+        reused_items = 0
+        for previous, now in zip(self._previous, current):
+            if previous[0] != now[0]:
+                break
+            reused_items += 1
+        reused_bytes = sum(size for _, size in current[:reused_items])
+        total_bytes = sum(size for _, size in current)
+
+        first_request = not self._previous
+        self._previous = current
+        self._cache = cache
+        return {
+            "reused_items": reused_items,
+            "total_items": len(current),
+            "reused_bytes": reused_bytes,
+            "total_bytes": total_bytes,
+            "ratio": 0.0 if first_request or not total_bytes else reused_bytes / total_bytes,
+            "first_request": first_request,
+        }
+
+    def reset(self):
+        self._previous = []
+        self._cache = {}
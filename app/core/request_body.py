@@ -0,0 +1,49 @@
+# core/request_body.py
+import json
+
+from core.tool_registry import registry
+
+
+def _encode(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+class RequestBodyBuilder:
+    """
+    Builds /chat/completions request bodies as bytes from cached fragments.
+    The tool schemas come pre-encoded from the tool registry, and each history
+    message is encoded once and reused while it stays in the conversation, so
+    a step only encodes the messages that are new since the previous request.
+    Messages are treated as immutable once they have been sent. `model`
+    overrides the builder's model for one request (model tiers); the cached
+    message fragments are shared across models.
+    """
+
+    def __init__(self, model):
+        self._model = _encode(model)
+        self._messages = {}  # id(message) -> (message, encoded) for the previous request
+
+    def _tools_fragment(self, tools):
+        if tools is registry.schemas():
+            return registry.schemas_json()
+        return _encode(tools)
+
+    def build(self, messages, tools=None, stream=False, model=None):
+        cache = {}
+        fragments = []
+        for message in messages:
+            cached = self._messages.get(id(message))
+            if cached is None or cached[0] is not message:
+                cached = (message, _encode(message))
+            cache[id(message)] = cached
+            fragments.append(cached[1])
+        # Only the messages of this request are kept, so the cache never outgrows the history.
+        self._messages = cache
+
+        body = [b'{"model":', _encode(model) if model else self._model, b',"messages":[', b",".join(fragments), b"]"]
+        if tools:
+            body += [b',"tools":', self._tools_fragment(tools), b',"tool_choice":"auto"']
+        if stream:
+            body.append(b',"stream":true')
+        body.append(b"}")
+        return b"".join(body)
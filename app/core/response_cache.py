@@ -0,0 +1,149 @@
+# core/response_cache.py
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for deterministic LLM calls.
+    Entries are keyed on a hash of the model, messages and tools. Lookups go
+    through an in-memory LRU first, then an optional on-disk tier (one JSON
+    file per entry) with a TTL and size-based eviction of the oldest files.
+    """
+
+    def __init__(self, max_entries=256, ttl=None, disk_dir=None, disk_max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()  # key -> (stored_at, message)
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # Computed lazily from the directory
+        self.hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model, messages, tools):
+        payload = json.dumps({"model": model, "messages": messages, "tools": tools}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, stored_at):
+        return bool(self.ttl) and time.time() - stored_at > self.ttl
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key):
+        """Returns the cached message for `key`, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            if entry:
+                del self._memory[key]
+
+        message = self._disk_get(key)
+        with self._lock:
+            if message is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._memory_put(key, copy.deepcopy(message), time.time())
+        return message
+
+    def put(self, key, message):
+        stored_at = time.time()
+        self._memory_put(key, copy.deepcopy(message), stored_at)
+        self._disk_put(key, message)
+
+    def _memory_put(self, key, message, stored_at):
+        with self._lock:
+            self._memory[key] = (stored_at, message)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if self._expired(os.path.getmtime(path)):
+                self._disk_remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _disk_put(self, key, message):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(message, f)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+        self._evict_disk()
+
+    def _disk_remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+
+    def _evict_disk(self):
+        """Drops expired files, then the oldest ones, until the tier fits its size budget."""
+        if not self.disk_max_bytes:
+            return
+        with self._lock:
+            if self._disk_bytes is not None and self._disk_bytes <= self.disk_max_bytes:
+                return
+
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% of the budget so we don't rescan on every write.
+        target = self.disk_max_bytes * 0.9 if total > self.disk_max_bytes else total
+        for mtime, size, path in entries:
+            if total <= target and not self._expired(mtime):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
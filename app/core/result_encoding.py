@@ -0,0 +1,159 @@
+# core/result_encoding.py
+import json
+import re
+
+import config
+from core.tabular import parse_table
+
+# Result keys that are written into the envelope header (or deliberately left out).
+_ENVELOPE_KEYS = {"success", "output", "error", "elapsed_time", "timed_out", "killed", "returncode",
+                  "output_lines", "output_bytes", "truncated", "full_output_file", "sections"}
+_UPTIME = re.compile(r"up\s+(?P<up>.*?),\s+(?P<users>\d+)\s+users?,\s+load averages?:\s+(?P<load>.*)$")
+_REPORT_SECTION = re.compile(r"^--- (.+) ---$")
+
+
+def dedupe_lines(lines):
+    """Collapses runs of identical lines into one line with a repeat count."""
+    collapsed = []
+    previous, count = None, 0
+    for line in lines:
+        if line == previous:
+            count += 1
+            continue
+        if count > 1:
+            collapsed[-1] += f"  [x{count}]"
+        collapsed.append(line)
+        previous, count = line, 1
+    if count > 1:
+        collapsed[-1] += f"  [x{count}]"
+    return collapsed
+
+
+def _encode_table(compact):
+    """Headers once, then one '|'-separated line per row; repeated rows are collapsed."""
+    lines = ["|".join(compact["columns"])]
+    rows = ["|".join(field.strip() for field in row) for row in compact["rows"]]
+    # Keep the omitted-lines marker where it was.
+    for index, note in sorted(compact.get("notes", []), reverse=True):
+        rows.insert(index, note)
+    return lines + dedupe_lines(rows)
+
+
+def _parse_columns(output):
+    table = parse_table(output)
+    if table is None:
+        return None
+    compact = table.to_compact()
+    return f"{compact.get('kind', 'table')}, {len(compact['rows'])} rows, columns separated by |", _encode_table(compact)
+
+
+def _parse_du(output):
+    rows = []
+    for line in output.strip().splitlines():
+        parts = line.split(None, 1)
+        if len(parts) != 2:
+            return None
+        rows.append(f"{parts[0]}|{parts[1]}")
+    return f"du, {len(rows)} rows, columns separated by |", ["size|path"] + dedupe_lines(rows)
+
+
+def _parse_uptime(output):
+    match = _UPTIME.search(output.strip())
+    if not match:
+        return None
+    up = " ".join(match.group("up").split())
+    load = " ".join(match.group("load").replace(",", " ").split())
+    return "uptime", [f"up {up} | {match.group('users')} users | load {load} (1/5/15 min)"]
+
+
+# Per-command parsers: output -> (description, lines), or None when the output is not in the expected shape.
+PARSERS = {
+    "df": _parse_columns,
+    "ps": _parse_columns,
+    "netstat": _parse_columns,
+    "free": _parse_columns,
+    "du": _parse_du,
+    "uptime": _parse_uptime,
+}
+
+
+def _encode_output(command_name, output):
+    """
+    Returns (description, lines) for an output, using the command's parser when it
+    applies; the description is None for plain text.
+    """
+    parser = PARSERS.get(command_name)
+    parsed = parser(output) if parser else None
+    if parsed:
+        return parsed
+    return None, dedupe_lines(output.strip().splitlines())
+
+
+def _encode_report(output):
+    """Encodes each section of the system report with the parser of the command that produced it."""
+    commands = {section["title"]: section["command"][0][0] for section in config.SYSTEM_REPORT_SECTIONS}
+    lines = []
+    section_title, section_lines = None, []
+
+    def flush():
+        if section_title is None:
+            lines.extend(section_lines)
+            return
+        description, body = _encode_output(commands.get(section_title), "\n".join(section_lines))
+        lines.append(f"## {section_title} ({description})" if description else f"## {section_title}")
+        lines.extend(body)
+
+    for line in output.splitlines():
+        match = _REPORT_SECTION.match(line)
+        if match:
+            flush()
+            section_title, section_lines = match.group(1), []
+        elif line.strip():
+            section_lines.append(line)
+    flush()
+    return None, lines
+
+
+def encode_result(function_name, arguments, result):
+    """
+    Encodes a tool result for the model as a compact plain-text envelope instead
+    of JSON: no escaped newlines or quotes, the elapsed time rounded, known
+    command outputs as '|'-separated columns, and repeated lines collapsed.
+    """
+    if not isinstance(result, dict):
+        return json.dumps(result)
+
+    status = "ok" if result.get("success") else "failed"
+    flags = [flag.replace("_", " ") for flag in ("timed_out", "killed") if result.get(flag)]
+    header = f"status: {status}"
+    if flags:
+        header += f" ({', '.join(flags)})"
+    if result.get("elapsed_time"):
+        header += f" | {result['elapsed_time']:.2f}s"
+    lines = [header]
+
+    if result.get("truncated"):
+        note = f"note: output truncated ({result.get('output_lines')} lines, {result.get('output_bytes')} bytes in total)"
+        if result.get("full_output_file"):
+            note += f"; full output in {result['full_output_file']}"
+        lines.append(note)
+    for key, value in result.items():
+        if key not in _ENVELOPE_KEYS:
+            lines.append(f"{key}: {value if isinstance(value, str) else json.dumps(value)}")
+    if result.get("error"):
+        lines.append("error:")
+        lines.extend(dedupe_lines(str(result["error"]).strip().splitlines()))
+
+    output = result.get("output")
+    if isinstance(output, str) and output.strip():
+        if function_name == "get_full_system_report":
+            description, body = _encode_report(output)
+        elif function_name == "run_safe_command":
+            description, body = _encode_output((arguments or {}).get("command_name"), output)
+        else:
+            description, body = _encode_output(None, output)
+        lines.append(f"output ({description}):" if description else "output:")
+        lines.extend(body)
+    elif output is not None and not isinstance(output, str):
+        lines.append(f"output: {json.dumps(output)}")
+    return "\n".join(lines)
@@ -0,0 +1,238 @@
+# core/session_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    model TEXT
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    goal TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    status TEXT,
+    final_answer TEXT,
+    elapsed_time REAL,
+    llm_requests INTEGER,
+    llm_time REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS tasks_session ON tasks (session_id, id);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    task_id INTEGER,
+    role TEXT NOT NULL,
+    message TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+CREATE TABLE IF NOT EXISTS tool_calls (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    task_id INTEGER,
+    name TEXT NOT NULL,
+    command TEXT,
+    arguments TEXT,
+    success INTEGER,
+    returncode INTEGER,
+    elapsed_time REAL,
+    output TEXT,
+    output_bytes INTEGER,
+    error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tool_calls_command ON tool_calls (command, id);
+CREATE INDEX IF NOT EXISTS tool_calls_session ON tool_calls (session_id, id);
+"""
+
+# Full-text index over goals and final answers, kept in step with `tasks` by hand
+# (external content). Only created when SQLite is built with FTS5.
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS answers_fts USING fts5(goal, final_answer, content='tasks', content_rowid='id')"
+
+
+class SessionStore:
+    """
+    Embedded SQLite store for sessions, tasks, history messages and tool calls.
+    Rows are appended as the agent runs (a task's outcome is filled in once when
+    it finishes) and old sessions are removed by the retention limits, so the
+    file stays bounded. Indexed for the lookups the agent needs: the tail of a
+    session's history to resume it, the latest runs of a command, and full-text
+    search over past answers. `path` may be ':memory:' for a throwaway store.
+    """
+
+    def __init__(self, path, max_sessions=None, max_age_days=None, output_max_bytes=None):
+        self.path = path
+        self.output_max_bytes = output_max_bytes
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        # One connection per store; the lock serializes the manager's threads.
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            # WAL lets batch workers append to the same file concurrently.
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.execute(FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False
+        self._db.commit()
+        self.prune(max_sessions, max_age_days)
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+            return cursor.lastrowid
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params).fetchall()]
+
+    # --- Writes ---
+
+    def start_session(self, model=None):
+        return self._write("INSERT INTO sessions (started_at, model) VALUES (?, ?)", (time.time(), model))
+
+    def start_task(self, session_id, goal):
+        return self._write("INSERT INTO tasks (session_id, goal, started_at) VALUES (?, ?, ?)", (session_id, goal, time.time()))
+
+    def finish_task(self, task_id, status, final_answer=None, elapsed_time=None, llm_requests=None, llm_time=None, usage=None):
+        usage = usage or {}
+        with self._lock:
+            self._db.execute(
+                "UPDATE tasks SET status = ?, final_answer = ?, elapsed_time = ?, llm_requests = ?, llm_time = ?, "
+                "prompt_tokens = ?, completion_tokens = ? WHERE id = ?",
+                (status, final_answer, elapsed_time, llm_requests, llm_time,
+                 usage.get("prompt_tokens"), usage.get("completion_tokens"), task_id))
+            if self.full_text:
+                self._db.execute("INSERT INTO answers_fts (rowid, goal, final_answer) SELECT id, goal, final_answer FROM tasks WHERE id = ?", (task_id,))
+            self._db.commit()
+
+    def append_message(self, session_id, message, tokens=0, task_id=None):
+        return self._write(
+            "INSERT INTO messages (session_id, task_id, role, message, tokens, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (session_id, task_id, message.get("role", ""), json.dumps(message), tokens, time.time()))
+
+    def record_tool_call(self, session_id, task_id, name, arguments, result=None, error=None):
+        """Records one tool call from its arguments and result dict (or the error that prevented it)."""
+        result = result or {}
+        arguments = arguments if isinstance(arguments, dict) else {}
+        output = result.get("output")
+        if output is not None and not isinstance(output, str):
+            output = json.dumps(output)
+        output_bytes = result.get("output_bytes")
+        if output is not None:
+            if output_bytes is None:
+                output_bytes = len(output.encode("utf-8"))
+            if self.output_max_bytes and len(output) > self.output_max_bytes:
+                output = output[:self.output_max_bytes] + "\n[... truncated in the session store ...]"
+        return self._write(
+            "INSERT INTO tool_calls (session_id, task_id, name, command, arguments, success, returncode, elapsed_time, "
+            "output, output_bytes, error, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, task_id, name, arguments.get("command_name"), json.dumps(arguments),
+             None if error else bool(result.get("success")), result.get("returncode"), result.get("elapsed_time"),
+             output, output_bytes, error or result.get("error"), time.time()))
+
+    def prune(self, max_sessions=None, max_age_days=None):
+        """Deletes sessions beyond the newest `max_sessions` or older than `max_age_days`. Returns the number deleted."""
+        conditions, params = [], []
+        if max_sessions:
+            conditions.append("id NOT IN (SELECT id FROM sessions ORDER BY id DESC LIMIT ?)")
+            params.append(max_sessions)
+        if max_age_days:
+            conditions.append("started_at < ?")
+            params.append(time.time() - max_age_days * 86400)
+        if not conditions:
+            return 0
+        with self._lock:
+            doomed = [row[0] for row in self._db.execute(f"SELECT id FROM sessions WHERE {' OR '.join(conditions)}", params)]
+            if not doomed:
+                return 0
+            marks = ",".join("?" * len(doomed))
+            if self.full_text:
+                self._db.execute(
+                    f"INSERT INTO answers_fts (answers_fts, rowid, goal, final_answer) SELECT 'delete', id, goal, final_answer "
+                    f"FROM tasks WHERE session_id IN ({marks}) AND status IS NOT NULL", doomed)
+            for table in ("tool_calls", "messages", "tasks"):
+                self._db.execute(f"DELETE FROM {table} WHERE session_id IN ({marks})", doomed)
+            self._db.execute(f"DELETE FROM sessions WHERE id IN ({marks})", doomed)
+            self._db.commit()
+        return len(doomed)
+
+    # --- Queries ---
+
+    def sessions(self, limit=10):
+        """The latest sessions with their first goal and task count."""
+        return self._query(
+            "SELECT s.id, s.started_at, s.model, COUNT(t.id) AS tasks, "
+            "(SELECT goal FROM tasks WHERE session_id = s.id ORDER BY id LIMIT 1) AS first_goal "
+            "FROM sessions s LEFT JOIN tasks t ON t.session_id = s.id "
+            "GROUP BY s.id ORDER BY s.id DESC LIMIT ?", (limit,))
+
+    def last_session_id(self):
+        rows = self._query("SELECT session_id FROM messages ORDER BY id DESC LIMIT 1")
+        return rows[0]["session_id"] if rows else None
+
+    def session_tasks(self, session_id):
+        return self._query("SELECT * FROM tasks WHERE session_id = ? ORDER BY id", (session_id,))
+
+    def session_tool_calls(self, session_id, limit=50):
+        rows = self._query("SELECT * FROM tool_calls WHERE session_id = ? ORDER BY id DESC LIMIT ?", (session_id, limit))
+        return rows[::-1]
+
+    def recent_runs(self, command, limit=5):
+        """The latest `limit` runs of a safe command (e.g. "df"), newest first."""
+        return self._query("SELECT * FROM tool_calls WHERE command = ? ORDER BY id DESC LIMIT ?", (command, limit))
+
+    def search_answers(self, text, limit=10):
+        """Past tasks whose goal or final answer matches `text`, best matches first."""
+        if self.full_text:
+            # Every word is quoted, so user input is never parsed as FTS5 query syntax.
+            query = " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+            if not query:
+                return []
+            return self._query(
+                "SELECT t.* FROM answers_fts JOIN tasks t ON t.id = answers_fts.rowid "
+                "WHERE answers_fts MATCH ? ORDER BY rank LIMIT ?", (query, limit))
+        pattern = f"%{text}%"
+        return self._query(
+            "SELECT * FROM tasks WHERE status IS NOT NULL AND (goal LIKE ? OR final_answer LIKE ?) ORDER BY id DESC LIMIT ?",
+            (pattern, pattern, limit))
+
+    def load_messages(self, session_id, max_tokens=None):
+        """
+        Returns the end of a session's history, oldest first: the newest messages
+        that fit in `max_tokens`, starting at a user message so no tool result is
+        left without its call. Rows are read newest first and reading stops at the
+        budget, so resuming a long session does not load all of it.
+        """
+        messages = []
+        total = 0
+        with self._lock:
+            cursor = self._db.execute("SELECT message, tokens FROM messages WHERE session_id = ? ORDER BY id DESC", (session_id,))
+            for row in cursor:
+                if max_tokens and messages and total + row["tokens"] > max_tokens:
+                    break
+                messages.append(json.loads(row["message"]))
+                total += row["tokens"]
+        messages.reverse()
+        while messages and messages[0].get("role") != "user":
+            messages.pop(0)
+        return messages
+
+    def close(self):
+        with self._lock:
+            self._db.close()
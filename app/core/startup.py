@@ -0,0 +1,70 @@
+# core/startup.py
+import importlib
+import subprocess
+import sys
+import threading
+import time
+
+
+class StartupTimer:
+    """Records the named phases of the startup sequence, up to the first prompt."""
+
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def phases(self):
+        """Returns (name, duration, elapsed since start) for every phase, in seconds."""
+        phases = []
+        previous = self.start
+        for name, at in self.marks:
+            phases.append((name, at - previous, at - self.start))
+            previous = at
+        return phases
+
+
+def preload_modules(module_names):
+    """Imports modules on a daemon thread so they are usually ready by their first use."""
+    def load():
+        for name in module_names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass  # The real import at first use will report the error
+    thread = threading.Thread(target=load, daemon=True, name="oconsole-preload")
+    thread.start()
+    return thread
+
+
+def import_time_report(module, cwd, limit=15):
+    """
+    Imports `module` in a fresh interpreter under `-X importtime` and returns the
+    slowest imports it makes directly as (name, self_us, cumulative_us), slowest
+    first, after `module` itself for the total.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True
+    )
+    imports = []
+    total = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            # Nested imports are listed before, and indented under, the module that triggered them.
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            if depth == 0 and name.strip() == module:
+                total = (module, int(self_us), int(cumulative_us))
+            elif depth == 1:
+                imports.append((name.strip(), int(self_us), int(cumulative_us)))
+            elif depth == 0:
+                imports = []  # Imported by interpreter startup, not by `module`
+        except ValueError:
+            continue
+    imports.sort(key=lambda item: item[2], reverse=True)
+    return [total] + imports[:limit] if total else imports[:limit]
@@ -0,0 +1,239 @@
+# core/stub_server.py
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Built-in transcripts. A scenario is picked when one of its `match` keywords
+# appears in the latest user message; each agent step then gets the next
+# response in order. Tool call ids are filled in by the server.
+DEFAULT_SCENARIOS = [
+    {
+        "name": "disk",
+        "goal": "How much disk space is free?",
+        "match": ["disk"],
+        "responses": [
+            {"tool_calls": [{"name": "explain_plan", "arguments": {"plan": "1. Run `df -h` to list the mounted filesystems.\n2. Summarize the free space."}}]},
+            {"tool_calls": [{"name": "run_safe_command", "arguments": {"command_name": "df", "args_string": "-h"}}]},
+            {"tool_calls": [{"name": "answer_question", "arguments": {"query": "The root filesystem has enough free space."}}]},
+        ],
+    },
+    {
+        "name": "processes",
+        "goal": "Which processes use the most CPU, and what is the load?",
+        "match": ["processes", "cpu"],
+        "responses": [
+            {"tool_calls": [
+                {"name": "run_safe_command", "arguments": {"command_name": "ps", "args_string": "aux --sort=-%cpu | head -n 6"}},
+                {"name": "run_safe_command", "arguments": {"command_name": "uptime"}},
+            ]},
+            {"tool_calls": [{"name": "answer_question", "arguments": {"query": "No process is using an unusual amount of CPU."}}]},
+        ],
+    },
+    {
+        "name": "report",
+        "goal": "Give me a health report of this system.",
+        "match": ["report", "health"],
+        "responses": [
+            {"tool_calls": [{"name": "get_full_system_report", "arguments": {}}]},
+            {"tool_calls": [{"name": "answer_question", "arguments": {"query": "The system looks healthy."}}]},
+        ],
+    },
+    {
+        "name": "chat",
+        "goal": "What is a load average?",
+        "match": [],
+        "responses": [
+            {"content": "The load average is the average number of runnable (or waiting) processes over 1, 5 and 15 minutes."},
+        ],
+    },
+]
+
+
+def load_scenarios(path):
+    """Loads transcripts from a JSON file: a list of scenarios, or {"scenarios": [...]}."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["scenarios"] if isinstance(data, dict) else data
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), for the usage block."""
+    return max(1, len(text) // 4)
+
+
+class StubLLMServer:
+    """
+    Local stand-in for an OpenAI-compatible /chat/completions endpoint that
+    replays scripted transcripts. `latency` delays the first byte of every
+    response (the "model time"); streamed responses are split into chunks of
+    `chunk_chars` characters with `chunk_delay` seconds between them.
+    Run it in-process with start()/stop() (or as a context manager), or on its
+    own with `python -m core.stub_server`.
+    """
+
+    def __init__(self, scenarios=None, host="127.0.0.1", port=0, latency=0.0, chunk_delay=0.0, chunk_chars=16):
+        self.scenarios = scenarios if scenarios is not None else DEFAULT_SCENARIOS
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="stub-llm-server")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _select(self, messages):
+        """Returns the scripted response for this point of the conversation."""
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+        goal = (messages[last_user].get("content") or "").lower() if last_user >= 0 else ""
+        step = sum(1 for m in messages[last_user + 1:] if m.get("role") == "assistant")
+
+        scenario = next((s for s in self.scenarios if any(k in goal for k in s.get("match", []))), None)
+        if scenario is None:
+            scenario = next((s for s in self.scenarios if not s.get("match")), self.scenarios[-1])
+        responses = scenario["responses"]
+        if step >= len(responses):
+            return {"role": "assistant", "content": "Done."}
+
+        scripted = responses[step]
+        message = {"role": "assistant", "content": scripted.get("content", "")}
+        if scripted.get("tool_calls"):
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{step}_{i}",
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))},
+                }
+                for i, call in enumerate(scripted["tool_calls"])
+            ]
+        return message
+
+    def _usage(self, raw_request, message):
+        prompt_tokens = estimate_tokens(raw_request)
+        completion_tokens = estimate_tokens(json.dumps(message))
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _stream_chunks(self, message):
+        """Splits a message into OpenAI-style streaming deltas."""
+        size = self.chunk_chars
+        content = message.get("content") or ""
+        for start in range(0, len(content), size):
+            yield {"content": content[start:start + size]}
+        for index, call in enumerate(message.get("tool_calls") or []):
+            yield {"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                   "function": {"name": call["function"]["name"], "arguments": ""}}]}
+            arguments = call["function"]["arguments"]
+            for start in range(0, len(arguments), size):
+                yield {"tool_calls": [{"index": index, "function": {"arguments": arguments[start:start + size]}}]}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like a real provider
+            disable_nagle_algorithm = True  # Headers and body are separate writes; don't hold the body for a delayed ACK
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_received += len(raw)
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                try:
+                    payload = json.loads(raw)
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "Invalid JSON"}})
+                    return
+
+                message = server._select(payload.get("messages", []))
+                usage = server._usage(raw, message)
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if not payload.get("stream"):
+                    self._send_json(200, {"object": "chat.completion", "model": payload.get("model"),
+                                          "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                                          "usage": usage})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for delta in server._stream_chunks(message):
+                    self._send_event({"choices": [{"index": 0, "delta": delta}]})
+                    if server.chunk_delay:
+                        time.sleep(server.chunk_delay)
+                self._send_event({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage})
+                self._send_chunk(b"data: [DONE]\n\n")
+                self._send_chunk(b"")
+
+            def _send_event(self, chunk):
+                self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+            def _send_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible server that replays scripted transcripts.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first byte of every response.")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks.")
+    parser.add_argument("--transcripts", help="JSON file with scenarios to replay instead of the built-in ones.")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.transcripts) if args.transcripts else None
+    server = StubLLMServer(scenarios, host=args.host, port=args.port, latency=args.latency, chunk_delay=args.chunk_delay)
+    print(f"Stub LLM server listening on {server.url} (set HOST={server.url})")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# core/system_report.py
+import asyncio
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+
+class SystemReport:
+    """
+    Builds the full system report from the sections listed in
+    config.SYSTEM_REPORT_SECTIONS. All sections are collected concurrently, so
+    adding a section does not add its latency to the report. Sections with a
+    cache TTL (e.g. kernel, OS) are reused until the TTL expires. Section commands
+    are argv pipelines whose binaries are resolved once, as for safe commands.
+    """
+
+    def __init__(self, command_executor, sections=None):
+        self.command_executor = command_executor
+        self.sections = sections if sections is not None else config.SYSTEM_REPORT_SECTIONS
+        self._commands = {section['title']: [[shutil.which(argv[0]) or argv[0]] + list(argv[1:]) for argv in section['command']]
+                          for section in self.sections}
+        self._cache = {}  # title -> (expires_at, result)
+        self._lock = threading.Lock()
+
+    def _cached(self, section):
+        with self._lock:
+            entry = self._cache.get(section['title'])
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def _store(self, section, result):
+        ttl = section.get('cache_ttl', 0)
+        if ttl and result['success']:
+            with self._lock:
+                self._cache[section['title']] = (time.monotonic() + ttl, result)
+
+    def _build(self, results, start_time):
+        """Assembles the report text and the per-section timings."""
+        report_parts = []
+        timings = []
+        for section, (result, cached) in zip(self.sections, results):
+            report_parts.append(f"--- {section['title']} ---")
+            report_parts.append(result['output'] if result['success'] else result['error'])
+            report_parts.append("")
+            timings.append({
+                "section": section['title'],
+                "elapsed_time": 0 if cached else result['elapsed_time'],
+                "cached": cached,
+                "success": result['success']
+            })
+        return {
+            "success": True,
+            "output": "\n".join(report_parts),
+            "elapsed_time": time.time() - start_time,
+            "sections": timings
+        }
+
+    def _collect_section(self, section):
+        result = self._cached(section)
+        if result is not None:
+            return result, True
+        result = self.command_executor.run_command(self._commands[section['title']])
+        self._store(section, result)
+        return result, False
+
+    def collect(self):
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=max(len(self.sections), 1)) as pool:
+            results = list(pool.map(self._collect_section, self.sections))
+        return self._build(results, start_time)
+
+    async def _collect_section_async(self, section):
+        result = self._cached(section)
+        if result is not None:
+            return result, True
+        result = await self.command_executor.run_command_async(self._commands[section['title']])
+        self._store(section, result)
+        return result, False
+
+    async def collect_async(self):
+        start_time = time.time()
+        results = await asyncio.gather(*(self._collect_section_async(section) for section in self.sections))
+        return self._build(results, start_time)
@@ -0,0 +1,134 @@
+# core/tabular.py
+import re
+
+# Lines sampled to decide whether output is a table; the rest are parsed without checks.
+SAMPLE_SIZE = 64
+# Header labels that contain a space in the tools that print them (df, netstat).
+MULTIWORD_HEADERS = {"Mounted on", "Local Address", "Foreign Address", "PID/Program name"}
+# Title lines printed above the header row (netstat).
+PREAMBLE_PREFIXES = ("Active Internet connections", "Active UNIX domain sockets", "Active Bluetooth connections")
+# The marker OutputCapture inserts where it dropped lines.
+OMITTED_MARKER = re.compile(r"^\[\.\.\. \d+ lines omitted")
+
+
+def _split_header(line):
+    tokens = line.split()
+    merged = []
+    i = 0
+    while i < len(tokens):
+        if i + 1 < len(tokens) and f"{tokens[i]} {tokens[i + 1]}" in MULTIWORD_HEADERS:
+            merged.append(f"{tokens[i]} {tokens[i + 1]}")
+            i += 2
+        else:
+            merged.append(tokens[i])
+            i += 1
+    return merged
+
+
+def _sample(lines):
+    if len(lines) <= SAMPLE_SIZE:
+        return lines
+    step = len(lines) / SAMPLE_SIZE
+    return [lines[int(i * step)] for i in range(SAMPLE_SIZE)] + [lines[-1]]
+
+
+def _fill_netstat_state(fields, headers):
+    """UDP and raw sockets have no State; netstat leaves that column blank."""
+    if len(fields) == len(headers) - 1 and "State" in headers:
+        fields.insert(headers.index("State"), "")
+    return fields
+
+
+def _kind(headers):
+    if headers[0] == "Filesystem":
+        return "df"
+    if headers[0] == "Proto":
+        return "netstat"
+    if "PID" in headers and headers[-1] in ("COMMAND", "CMD", "COMMAND_LINE"):
+        return "ps"
+    if headers[:3] == ["", "total", "used"]:
+        return "free"
+    return None
+
+
+class TableData:
+    """
+    Column-aligned command output parsed once into rows. `notes` holds lines
+    that are not rows (e.g. the omitted-lines marker) with the row index they
+    appeared before, so a view can show them in place.
+    """
+
+    def __init__(self, headers, rows, kind=None, notes=None):
+        self.headers = headers
+        self.rows = rows
+        self.kind = kind
+        self.notes = notes or []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def records(self):
+        """The rows as dicts keyed by header, e.g. for the df mount points."""
+        return [dict(zip(self.headers, row)) for row in self.rows]
+
+    def to_compact(self):
+        """
+        Column-oriented form for the LLM (see core/result_encoding.py): the headers
+        once, then plain value lists; notes keep the row index they appeared before.
+        """
+        compact = {"columns": self.headers, "rows": self.rows}
+        if self.kind:
+            compact["kind"] = self.kind
+        if self.notes:
+            compact["notes"] = [[index, text] for index, text in self.notes]
+        return compact
+
+
+def parse_table(text):
+    """
+    Parses whitespace-aligned output with a header row (df, ps, netstat, free,
+    lsblk, ...) into a TableData, or returns None when the output is not a table.
+    The column layout is decided from a sample of the lines, then every line is
+    split exactly once; the last column keeps its spaces (e.g. ps COMMAND).
+    """
+    lines = [line for line in text.strip().splitlines() if line.strip()]
+    while lines and lines[0].startswith(PREAMBLE_PREFIXES):
+        lines = lines[1:]
+    if len(lines) < 2:
+        return None
+
+    headers = _split_header(lines[0])
+    if len(headers) < 2:
+        return None
+
+    body = lines[1:]
+    sample = [line for line in _sample(body) if not OMITTED_MARKER.match(line)]
+    if not sample:
+        return None
+    if all(line.split(maxsplit=1)[0].endswith(":") for line in sample):
+        # Labelled rows under a header without a label column, as in `free`:
+        # "Mem:  15Gi  3.2Gi ...". Such rows may be shorter than the header ("Swap:").
+        headers = [""] + headers
+        if not all(2 <= len(line.split()) <= len(headers) for line in sample):
+            return None
+    else:
+        # netstat rows may lack the State column; any other table must fill every column.
+        min_fields = len(headers) - 1 if headers[0] == "Proto" else len(headers)
+        if not all(len(line.split(maxsplit=len(headers) - 1)) >= min_fields for line in sample):
+            return None
+
+    columns = len(headers)
+    kind = _kind(headers)
+    rows = []
+    notes = []
+    for line in body:
+        if OMITTED_MARKER.match(line):
+            notes.append((len(rows), line))
+            continue
+        fields = line.split(maxsplit=columns - 1)
+        if kind == "netstat":
+            fields = _fill_netstat_state(fields, headers)
+        if len(fields) < columns:
+            fields += [""] * (columns - len(fields))
+        rows.append(fields)
+    return TableData(headers, rows, kind=kind, notes=notes)
@@ -0,0 +1,40 @@
+# core/tokenizer.py
+import threading
+
+
+class LazyTokenizer:
+    """
+    Wraps a tiktoken encoding that is loaded either right away or on a background
+    thread, so the BPE tables (which may have to be downloaded) don't delay the
+    prompt. The first encode() waits for the load to finish. Evaluates to False
+    when the tokenizer could not be loaded, like the plain `None` it replaces.
+    """
+
+    def __init__(self, encoding_name="cl100k_base", background=False):
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = threading.Event()
+        if background:
+            threading.Thread(target=self._load, daemon=True, name="oconsole-tokenizer").start()
+        else:
+            self._load()
+
+    def _load(self):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(self.encoding_name)
+        except Exception:
+            self._encoding = None
+        finally:
+            self._loaded.set()
+
+    def wait(self):
+        """Blocks until the encoding has been loaded (or failed to load)."""
+        self._loaded.wait()
+        return self._encoding
+
+    def __bool__(self):
+        return self.wait() is not None
+
+    def encode(self, text):
+        return self.wait().encode(text)
@@ -0,0 +1,165 @@
+# core/tool_registry.py
+import importlib
+import json
+import threading
+
+# JSON schema types accepted for tool arguments, as Python types.
+_JSON_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "object": (dict,),
+    "array": (list,),
+    "null": (type(None),),
+}
+
+
+def compile_validator(parameters):
+    """
+    Turns a tool's JSON schema into a function that checks an arguments dict and
+    returns an error message, or None when the arguments are valid. The schema is
+    walked once here, not on every call. Covers what tool schemas use: required
+    properties, property types and unknown properties.
+    """
+    properties = parameters.get("properties") or {}
+    required = tuple(parameters.get("required") or ())
+    types = {}
+    for name, schema in properties.items():
+        declared = schema.get("type")
+        if declared:
+            names = declared if isinstance(declared, list) else [declared]
+            types[name] = (tuple(t for n in names for t in _JSON_TYPES.get(n, (object,))), "/".join(names))
+    allowed = frozenset(properties)
+
+    def validate(arguments):
+        if not isinstance(arguments, dict):
+            return "arguments must be a JSON object"
+        missing = [name for name in required if name not in arguments]
+        if missing:
+            return f"missing required argument(s): {', '.join(missing)}"
+        unknown = [name for name in arguments if name not in allowed]
+        if unknown:
+            return f"unknown argument(s): {', '.join(unknown)}"
+        for name, value in arguments.items():
+            expected = types.get(name)
+            # bool is an int subclass; it is only accepted where a boolean is declared.
+            if expected and (not isinstance(value, expected[0]) or (isinstance(value, bool) and bool not in expected[0])):
+                return f"argument '{name}' must be of type {expected[1]}"
+        return None
+    return validate
+
+
+class ToolSpec:
+    """One registered tool: its schema, validator and handler."""
+
+    def __init__(self, name, description, parameters, method=None, handler=None, parallel_safe=False):
+        self.name = name
+        self.parameters = parameters or {"type": "object", "properties": {}}
+        self.schema = {
+            "type": "function",
+            "function": {"name": name, "description": description, "parameters": self.parameters},
+        }
+        self.validate = compile_validator(self.parameters)
+        self.method = method        # Name of a ToolExecutor method
+        self.handler = handler      # Plain callable (plugin tools)
+        self.parallel_safe = parallel_safe
+
+
+class ToolRegistry:
+    """
+    The tools offered to the agent. Built-in tools are ToolExecutor methods
+    registered with the @tool decorator; plugins register plain callables.
+    The schema list and its JSON encoding are built once and reused for every
+    request until the set of tools changes.
+    """
+
+    def __init__(self):
+        self._specs = {}
+        self._lock = threading.Lock()
+        self._schemas = None
+        self._schemas_json = None
+
+    def _add(self, spec):
+        with self._lock:
+            self._specs[spec.name] = spec
+            self._schemas = None
+            self._schemas_json = None
+
+    def tool(self, description, parameters=None, name=None):
+        """Decorator registering a ToolExecutor method as a tool (named after the method by default)."""
+        def decorator(method):
+            self._add(ToolSpec(name or method.__name__, description, parameters, method=method.__name__))
+            return method
+        return decorator
+
+    def declare(self, name, description, parameters=None):
+        """Registers a tool the model may call but that is handled by the agent loop itself."""
+        self._add(ToolSpec(name, description, parameters))
+
+    def register(self, name, description, parameters, handler, parallel_safe=False):
+        """Registers a plugin tool. `handler(**arguments)` must return a result dict."""
+        self._add(ToolSpec(name, description, parameters, handler=handler, parallel_safe=parallel_safe))
+
+    def get(self, name):
+        return self._specs.get(name)
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def names(self):
+        return list(self._specs)
+
+    def schemas(self):
+        """The tool definitions for the API. Shared and cached: do not modify the result."""
+        schemas = self._schemas
+        if schemas is None:
+            with self._lock:
+                schemas = self._schemas = [spec.schema for spec in self._specs.values()]
+        return schemas
+
+    def schemas_json(self):
+        """schemas() encoded once as compact JSON bytes, for building request bodies."""
+        encoded = self._schemas_json
+        if encoded is None:
+            encoded = json.dumps(self.schemas(), separators=(",", ":")).encode("utf-8")
+            self._schemas_json = encoded
+        return encoded
+
+    def bind(self, executor):
+        """
+        Resolves every tool to a callable on `executor` once, so dispatch is a
+        dict lookup. Returns {name: (spec, handler, async_handler)}; the handler
+        is None for tools declared without one.
+        """
+        table = {}
+        for name, spec in list(self._specs.items()):
+            if spec.method:
+                handler = getattr(executor, spec.method)
+                async_handler = getattr(executor, f"{spec.method}_async", None)
+            else:
+                handler, async_handler = spec.handler, None
+            table[name] = (spec, handler, async_handler)
+        return table
+
+
+# The process-wide registry the built-in tools and plugins register into.
+registry = ToolRegistry()
+tool = registry.tool
+
+
+def load_plugins(module_names):
+    """
+    Imports tool plugin modules. A plugin registers its tools at import time
+    with `registry.register(...)`, or defines `register(registry)`.
+    Returns the list of (module name, error) for plugins that failed to load.
+    """
+    failures = []
+    for module_name in module_names:
+        try:
+            module = importlib.import_module(module_name)
+            if callable(getattr(module, "register", None)):
+                module.register(registry)
+        except Exception as e:
+            failures.append((module_name, str(e)))
+    return failures
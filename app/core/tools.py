@@ -1,14 +1,82 @@
 # app/core/tools.py
+import asyncio
+import functools
+import glob
 import shlex
+import shutil
 import config
 import os
 import time
+from core.command_cache import CommandCache
+from core.system_report import SystemReport
+from core.tool_registry import registry, tool
 
 class ToolExecutor:
     def __init__(self, command_executor):
         self.command_executor = command_executor
+        self.system_report = SystemReport(command_executor)
+        # Safe commands are exec'd directly, so their binaries are resolved once up front.
+        self.binaries = {name: shutil.which(name) for name in config.SAFE_COMMANDS}
+        self.command_cache = CommandCache(config.COMMAND_CACHE_MAX_ENTRIES) if config.COMMAND_CACHE else None
+        # Tool name -> (spec, handler, async handler), resolved once for O(1) dispatch.
+        self._dispatch = registry.bind(self)
 
-    def explain_plan(self, plan):
+    def _lookup(self, function_name):
+        entry = self._dispatch.get(function_name)
+        if entry is None and function_name in registry:
+            # Registered after this executor was created (e.g. a late plugin)
+            self._dispatch = registry.bind(self)
+            entry = self._dispatch.get(function_name)
+        return entry
+
+    def _check_call(self, function_name, arguments):
+        """Returns (handler, async_handler, error_result) for a tool call."""
+        entry = self._lookup(function_name)
+        if entry is None or entry[1] is None:
+            return None, None, {"success": False, "error": f"Tool '{function_name}' is not valid."}
+        spec, handler, async_handler = entry
+        error = spec.validate(arguments)
+        if error:
+            return None, None, {"success": False, "error": f"Invalid arguments for '{function_name}': {error}"}
+        return handler, async_handler, None
+
+    def execute(self, function_name, arguments):
+        """Validates the arguments against the tool's schema and runs the tool."""
+        handler, _, rejection = self._check_call(function_name, arguments)
+        if rejection:
+            return rejection
+        return handler(**arguments)
+
+    def check_call(self, function_name, arguments):
+        """
+        Returns why a tool call would be rejected, or None when it would run: the
+        schema checks of execute(), plus the allowlist and pipeline checks for
+        run_safe_command. Nothing is executed.
+        """
+        _, _, rejection = self._check_call(function_name, arguments)
+        if rejection is None and function_name == "run_safe_command":
+            _, _, rejection = self._prepare_safe_command(arguments["command_name"], arguments.get("args_string", ""))
+        return rejection["error"] if rejection else None
+
+    @tool(
+        "Outlines the step-by-step plan for the user before executing any actions. This should be the first tool called for any multi-step task.",
+        {
+            "type": "object",
+            "properties": {
+                "plan": {
+                    "type": "string",
+                    "description": "A clear, user-friendly explanation of the steps the AI will take to achieve the user's goal.",
+                },
+                "steps": {
+                    "type": "array",
+                    "description": "Only when asked for a machine-readable plan: the tool calls to run, as objects with 'id', 'tool', 'arguments' and optional 'depends_on' (a list of step ids).",
+                    "items": {"type": "object"},
+                },
+            },
+            "required": ["plan"],
+        },
+    )
+    def explain_plan(self, plan, steps=None):
         """
         Presents the AI's step-by-step plan to the user before execution.
         """
@@ -16,38 +84,262 @@ class ToolExecutor:
         # Here, we just return the plan as the successful output.
         return {"success": True, "output": plan, "elapsed_time": 0}
 
+    @tool(
+        "Provides a comprehensive overview of the system, including OS, kernel, disk space, memory, uptime and load, and the top processes. Use this for general queries about the system's status.",
+        {"type": "object", "properties": {}},
+    )
     def get_full_system_report(self):
         """
-        Gathers a comprehensive system report by running several commands.
-        """
-        commands = [
-            "echo '--- OS and Kernel ---'",
-            "uname -a",
-            "echo '\n--- Disk Usage ---'",
-            "df -h",
-            "echo '\n--- System Uptime ---'",
-            "uptime"
-        ]
-        full_report = ""
-        for cmd in commands:
-            result = self.command_executor.run_command(cmd)
-            if result['success']:
-                full_report += result['output'] + "\n"
-            else:
-                full_report += result['error'] + "\n"
-        
-        return {"success": True, "output": full_report, "elapsed_time": 0}
+        Gathers a comprehensive system report. The sections are collected concurrently
+        and slow-changing ones (kernel, OS) are cached; see core/system_report.py.
+        """
+        return self.system_report.collect()
 
-    def run_safe_command(self, command_name, args_string=""):
+    async def get_full_system_report_async(self):
+        """asyncio counterpart of get_full_system_report."""
+        return await self.system_report.collect_async()
+
+    def _reject_unsafe_command(self, command_name):
+        """Returns an error result if the command is not allowlisted, otherwise None."""
         if command_name not in config.SAFE_COMMANDS:
             return {
                 "success": False,
                 "error": f"Command '{command_name}' is not in the list of approved safe commands."
             }
-        
-        full_command = f"{command_name} {args_string}"
-        return self.command_executor.run_command(full_command)
+        return None
+
+    def _command_limits(self, command_names):
+        """
+        Returns the timeout and resource limits configured for allowlisted commands.
+        For a pipeline, the longest timeout and the strictest rlimits of its stages apply.
+        """
+        timeouts = []
+        limits = {}
+        for command_name in command_names:
+            options = config.SAFE_COMMANDS.get(command_name) or {}
+            timeouts.append(options.get("timeout") or config.COMMAND_TIMEOUT)
+            for key in ("cpu_seconds", "memory_mb"):
+                if options.get(key):
+                    limits[key] = min(limits.get(key, options[key]), options[key])
+        return {"timeout": max(timeouts) if timeouts else None, "limits": limits or None}
+
+    @staticmethod
+    def _expand_word(token):
+        """Unquotes a token; unquoted ones get the ~, $VAR and glob expansion a shell would do."""
+        if any(quote in token for quote in "'\"\\"):
+            words = shlex.split(token)
+            if "'" not in token:
+                words = [os.path.expandvars(word) for word in words]  # Double quotes still expand $VAR
+            return words
+        word = os.path.expandvars(os.path.expanduser(token))
+        if any(char in word for char in "*?["):
+            matches = sorted(glob.glob(word))
+            if matches:
+                return matches
+        return [word]
+
+    @staticmethod
+    def _reject_write_form(name, args):
+        """
+        Returns an error if the arguments make a read-only filter write a file or run
+        a program: sort's -o / --output and --compress-program, uniq's OUTPUT operand.
+        Option clusters and values are scanned the way getopt does, so `sort -to` is a
+        separator of 'o' and `sort -ro out` is rejected.
+        """
+        if name not in ("sort", "uniq"):
+            return None
+        takes_value = "ktST" if name == "sort" else "fsw"
+        operands = []
+        words = iter(args)
+        for word in words:
+            if word == "--":
+                operands.extend(words)
+                break
+            if word.startswith("--"):
+                option = word[2:].split("=", 1)[0]
+                if name == "sort" and option and ("output".startswith(option) or "compress-program".startswith(option)):
+                    return f"'sort {word}' is not allowed: safe commands may not write files or run programs. The output is returned to you."
+                continue
+            if word.startswith("-") and len(word) > 1:
+                for index, letter in enumerate(word[1:], start=2):
+                    if name == "sort" and letter == "o":
+                        return f"'sort {word}' is not allowed: safe commands may not write files. The output is returned to you."
+                    if letter in takes_value:
+                        if index == len(word):
+                            next(words, None)  # The value is the next word
+                        break
+                continue
+            operands.append(word)
+        if name == "uniq" and len(operands) > 1:
+            return f"'uniq {operands[0]} {operands[1]}' is not allowed: safe commands may not write files. Give uniq one input; the output is returned to you."
+        return None
+
+    def _build_pipeline(self, command_name, args_string):
+        """
+        Parses `command_name args_string` into a validated pipeline: a list of argv
+        stages separated by `|`, where every stage is an allowlisted command resolved
+        to its binary. No other shell syntax is accepted.
+        Returns (stages, command_names, error).
+        """
+        lexer = shlex.shlex(f"{command_name} {args_string or ''}", posix=False, punctuation_chars=True)
+        lexer.whitespace_split = True
+        try:
+            tokens = list(lexer)
+        except ValueError as e:
+            return None, None, f"Could not parse the arguments: {e}"
+
+        stages = [[]]
+        for token in tokens:
+            if token == "|":
+                stages.append([])
+            elif token and all(char in lexer.punctuation_chars for char in token):
+                return None, None, (f"Shell operator '{token}' is not allowed. Only '|' between safe commands "
+                                    "is supported; use separate tool calls for other steps.")
+            else:
+                try:
+                    stages[-1].extend(self._expand_word(token))
+                except ValueError as e:
+                    return None, None, f"Could not parse the arguments: {e}"
+
+        command_names = []
+        for stage in stages:
+            if not stage:
+                return None, None, "Empty pipeline stage."
+            name = stage[0]
+            if name not in config.SAFE_COMMANDS:
+                return None, None, f"Command '{name}' is not in the list of approved safe commands."
+            if not self.binaries.get(name):
+                return None, None, f"Command '{name}' is not installed on this system."
+            error = self._reject_write_form(name, stage[1:])
+            if error:
+                return None, None, error
+            stage[0] = self.binaries[name]
+            command_names.append(name)
+        return stages, command_names, None
+
+    def _prepare_safe_command(self, command_name, args_string):
+        """Returns (command, run_options, error_result) for run_safe_command."""
+        rejection = self._reject_unsafe_command(command_name)
+        if rejection:
+            return None, None, rejection
+
+        if config.SAFE_COMMANDS_USE_SHELL:
+            return f"{command_name} {args_string}", self._command_limits([command_name]), None
+
+        stages, command_names, error = self._build_pipeline(command_name, args_string)
+        if error:
+            return None, None, {"success": False, "error": error}
+        return stages, self._command_limits(command_names), None
+
+    def _cache_lookup(self, command):
+        """
+        Returns (cached_result, pending) for a prepared safe command. `pending` is the
+        (key, ttl, fingerprints) to store the real run's result under, or None when the
+        command is not cacheable: shell mode, or a stage without a cache_ttl.
+        """
+        if not self.command_cache or isinstance(command, str):
+            return None, None
+        ttl = min((config.SAFE_COMMANDS.get(os.path.basename(stage[0])) or {}).get("cache_ttl", 0) for stage in command)
+        if not ttl:
+            return None, None
+        cwd = os.getcwd()
+        key = self.command_cache.make_key(command, cwd)
+        cached = self.command_cache.get(key)
+        if cached is not None:
+            return cached, None
+        return None, (key, ttl, self.command_cache.fingerprint(self.command_cache.watched_paths(command, cwd)))
+
+    def _cache_store(self, command, pending, result):
+        """Caches a read-only result; a state-changing command drops the entries for the paths it names."""
+        if not self.command_cache:
+            return
+        if pending:
+            key, ttl, fingerprints = pending
+            self.command_cache.put(key, result, ttl, fingerprints)
+            return
+        if isinstance(command, str):
+            if command.split()[0] in config.SEQUENTIAL_COMMANDS:
+                self.command_cache.clear()
+            return
+        if any(os.path.basename(stage[0]) in config.SEQUENTIAL_COMMANDS for stage in command):
+            cwd = os.getcwd()
+            paths = self.command_cache.watched_paths(command, cwd)
+            if paths == [cwd]:
+                # Names no path (e.g. apt install): anything may have changed.
+                self.command_cache.clear()
+            else:
+                for path in paths:
+                    self.command_cache.invalidate_path(path)
+
+    @tool(
+        "Executes a specific, pre-approved Linux command for targeted operations. Its output may be piped into other pre-approved commands with '|'; no other shell syntax (';', '&&', redirections, subshells) is supported. Do NOT use this to create files; use the 'create_file' tool instead.",
+        {
+            "type": "object",
+            "properties": {
+                "command_name": {
+                    "type": "string",
+                    "description": "The name of the safe command to execute (e.g., 'ls', 'cat', 'wc').",
+                },
+                "args_string": {
+                    "type": "string",
+                    "description": "A string containing all the arguments for the command, optionally followed by '| <safe command> ...' stages (e.g., '-l /home/user' or 'aux | grep nginx').",
+                },
+            },
+            "required": ["command_name"],
+        },
+    )
+    def run_safe_command(self, command_name, args_string=""):
+        command, options, rejection = self._prepare_safe_command(command_name, args_string)
+        if rejection:
+            return rejection
+        cached, pending = self._cache_lookup(command)
+        if cached is not None:
+            return cached
+        result = self.command_executor.run_command(command, **options)
+        self._cache_store(command, pending, result)
+        return result
 
+    async def run_safe_command_async(self, command_name, args_string=""):
+        command, options, rejection = self._prepare_safe_command(command_name, args_string)
+        if rejection:
+            return rejection
+        cached, pending = self._cache_lookup(command)
+        if cached is not None:
+            return cached
+        result = await self.command_executor.run_command_async(command, **options)
+        self._cache_store(command, pending, result)
+        return result
+
+    async def execute_async(self, function_name, arguments):
+        """
+        Runs a tool from async code. Tools with an `<name>_async` variant are awaited
+        directly; the others run in a worker thread so they don't block the event loop.
+        """
+        handler, async_handler, rejection = self._check_call(function_name, arguments)
+        if rejection:
+            return rejection
+        if async_handler:
+            return await async_handler(**arguments)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(handler, **arguments))
+
+    @tool(
+        "Creates or overwrites a file with specified content. Use this for creating any new file, especially for code, HTML, or multi-line text. This is the only safe and reliable way to create files.",
+        {
+            "type": "object",
+            "properties": {
+                "file_path": {
+                    "type": "string",
+                    "description": "The relative or absolute path for the new file (e.g., 'src/index.js' or '~/Documents/project/main.py').",
+                },
+                "content": {
+                    "type": "string",
+                    "description": "The complete content to be written to the file. This can be multi-line.",
+                },
+            },
+            "required": ["file_path", "content"],
+        },
+    )
     def create_file(self, file_path, content):
         """
         Creates a new file at the specified path and writes content to it.
@@ -63,6 +355,8 @@ class ToolExecutor:
             
             with open(expanded_path, 'w', encoding='utf-8') as f:
                 f.write(content)
+            if self.command_cache:
+                self.command_cache.invalidate_path(expanded_path)
             
             elapsed_time = time.time() - start_time
             return {
@@ -79,110 +373,40 @@ class ToolExecutor:
             }
 
 
+# Tools handled by the agent loop itself rather than by ToolExecutor.
+registry.declare(
+    "generate_linux_command",
+    "Generates a potentially unsafe or complex command that requires user approval.",
+    {
+        "type": "object",
+        "properties": {
+            "task_description": {
+                "type": "string",
+                "description": "A description of the task for which to generate a command.",
+            }
+        },
+        "required": ["task_description"],
+    },
+)
+registry.declare(
+    "answer_question",
+    "Provides a conversational answer or a final summary when the user's goal is complete.",
+    {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "The final summary to provide to the user.",
+            }
+        },
+        "required": ["query"],
+    },
+)
+
+
 def get_tools():
     """
-    Returns the list of tool definitions for the AI, including the new explain_plan tool.
+    Returns the tool definitions for the AI. The list is built once by the tool
+    registry and shared, so callers must not modify it.
     """
-    return [
-        {
-            "type": "function",
-            "function": {
-                "name": "explain_plan",
-                "description": "Outlines the step-by-step plan for the user before executing any actions. This should be the first tool called for any multi-step task.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "plan": {
-                            "type": "string",
-                            "description": "A clear, user-friendly explanation of the steps the AI will take to achieve the user's goal.",
-                        },
-                    },
-                    "required": ["plan"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "create_file",
-                "description": "Creates or overwrites a file with specified content. Use this for creating any new file, especially for code, HTML, or multi-line text. This is the only safe and reliable way to create files.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "file_path": {
-                            "type": "string",
-                            "description": "The relative or absolute path for the new file (e.g., 'src/index.js' or '~/Documents/project/main.py').",
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "The complete content to be written to the file. This can be multi-line.",
-                        },
-                    },
-                    "required": ["file_path", "content"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "get_full_system_report",
-                "description": "Provides a comprehensive overview of the system, including OS, kernel, disk space, and uptime. Use this for general queries about the system's status.",
-                "parameters": {"type": "object", "properties": {}},
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "run_safe_command",
-                "description": "Executes a specific, pre-approved Linux command for targeted operations. Do NOT use this to create files; use the 'create_file' tool instead.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "command_name": {
-                            "type": "string",
-                            "description": "The name of the safe command to execute (e.g., 'ls', 'cat', 'wc').",
-                        },
-                        "args_string": {
-                            "type": "string",
-                            "description": "A string containing all the arguments for the command (e.g., '-l /home/user').",
-                        },
-                    },
-                    "required": ["command_name"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "generate_linux_command",
-                "description": "Generates a potentially unsafe or complex command that requires user approval.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "task_description": {
-                            "type": "string",
-                            "description": "A description of the task for which to generate a command.",
-                        }
-                    },
-                    "required": ["task_description"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "answer_question",
-                "description": "Provides a conversational answer or a final summary when the user's goal is complete.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "The final summary to provide to the user.",
-                        }
-                    },
-                    "required": ["query"],
-                },
-            },
-        },
-    ]
\ No newline at end of file
+    return registry.schemas()
@@ -0,0 +1,421 @@
+# core/tracing.py
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Histogram buckets (seconds) for LLM and tool latencies.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Samples kept per series for the percentiles shown by /stats.
+SAMPLE_LIMIT = 10000
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _summary(values):
+    values = list(values)
+    return {
+        "count": len(values),
+        "avg": sum(values) / len(values) if values else 0.0,
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "max": max(values) if values else 0.0,
+    }
+
+
+class Metrics:
+    """
+    Minimal counter / histogram registry rendered in the Prometheus text
+    exposition format, for a node_exporter textfile or the /metrics endpoint.
+    """
+
+    def __init__(self, prefix="oconsole"):
+        self.prefix = prefix
+        self._help = {}
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._histograms = {}                # (name, labels) -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.setdefault(key, [[0] * len(LATENCY_BUCKETS), 0.0, 0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        described = set()
+
+        def header(name):
+            if name in described:
+                return
+            described.add(name)
+            kind, help_text = self._help.get(name, ("untyped", name))
+            lines.append(f"# HELP {self.prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{self.prefix}_{name}{self._labels(labels)} {value:g}")
+        for (name, labels), (buckets, total, count) in histograms:
+            header(name)
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f"{self.prefix}_{name}_bucket{self._labels(labels, [('le', f'{bound:g}')])} {bucket_count}")
+            lines.append(f"{self.prefix}_{name}_bucket{self._labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.prefix}_{name}_sum{self._labels(labels)} {total:.6f}")
+            lines.append(f"{self.prefix}_{name}_count{self._labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes the metrics atomically, so a collector never reads a partial file."""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serves the metrics at http://host:port/metrics from a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Only needed when METRICS_PORT is set
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                data = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True, name="oconsole-metrics").start()
+        return server
+
+
+class Tracer:
+    """
+    Records spans for the agent loop (task > step > LLM request / tool call) and
+    events such as history pruning. Every finished span is appended as one JSON
+    line to `trace_file`, aggregated into Prometheus metrics, and summarized for
+    /stats. One tracer can be shared by several TaskManagers (e.g. batch workers).
+    """
+
+    def __init__(self, trace_file=None, metrics_file=None):
+        self.trace_file = trace_file
+        self.metrics_file = metrics_file
+        self.metrics = Metrics()
+        self._describe_metrics()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+        self.started_at = time.time()
+        self.tasks = 0
+        self.steps = 0
+        self.llm_latencies = deque(maxlen=SAMPLE_LIMIT)
+        self.llm_ttfbs = deque(maxlen=SAMPLE_LIMIT)
+        self.llm_cache_hits = 0
+        self.tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.tool_times = defaultdict(lambda: deque(maxlen=SAMPLE_LIMIT))
+        self.tool_failures = defaultdict(int)
+        self.tool_output_bytes = defaultdict(int)
+        self.pruning = {"events": 0, "messages": 0, "tokens": 0, "compacted": 0}
+        self.result_encoding = {"results": 0, "tokens": 0, "tokens_saved": 0}
+        self.prompt_prefix = {"reused_bytes": 0, "total_bytes": 0}
+        # Per model (model tiers): requests answered by the server, their seconds and tokens.
+        self.models = defaultdict(lambda: {"requests": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+        self.speculation = {"accepted": 0, "rejected": 0}
+        self.fast_path = {"goals": 0, "hits": 0, "fallbacks": 0, "requests_skipped": 0, "rules": defaultdict(int)}
+
+    def _describe_metrics(self):
+        describe = self.metrics.describe
+        describe("tasks_total", "counter", "Agent tasks run, by final status.")
+        describe("steps_total", "counter", "Agent loop steps.")
+        describe("llm_requests_total", "counter", "LLM requests, by agent state, model and cache result.")
+        describe("speculative_proposals_total", "counter", "Small-model proposals in speculative mode, by outcome.")
+        describe("fast_path_goals_total", "counter", "Goals checked by the fast-path intent router, by matched rule ('none' for misses).")
+        describe("fast_path_llm_requests_skipped_total", "counter", "LLM requests the fast path made unnecessary.")
+        describe("llm_request_seconds", "histogram", "LLM request latency.")
+        describe("llm_ttfb_seconds", "histogram", "LLM time to first byte.")
+        describe("llm_tokens_total", "counter", "Tokens reported by the API usage field.")
+        describe("llm_prompt_bytes_total", "counter", "Serialized prompt bytes (messages and tools) sent.")
+        describe("llm_prompt_prefix_reused_bytes_total", "counter", "Prompt bytes that were an unchanged prefix of the previous request.")
+        describe("tool_calls_total", "counter", "Tool calls, by tool and outcome.")
+        describe("tool_seconds", "histogram", "Tool (subprocess) run time.")
+        describe("tool_output_bytes_total", "counter", "Bytes of tool output produced.")
+        describe("tool_result_tokens_saved_total", "counter", "Tokens saved by the compact tool-result encoding against JSON.")
+        describe("history_pruned_messages_total", "counter", "Messages dropped from the history to fit the token budget.")
+        describe("history_pruned_tokens_total", "counter", "Tokens freed by dropping or compacting history messages.")
+        describe("history_compacted_results_total", "counter", "Tool results replaced by their compacted form.")
+
+    # --- Span plumbing ---
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _emit(self, record):
+        if not self.trace_file:
+            return
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            try:
+                with open(self.trace_file, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                self.trace_file = None  # Tracing must never break the agent
+
+    def _record(self, name, start, duration, attributes, status="ok"):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        self._emit({
+            "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex,
+            "span_id": next(self._ids),
+            "parent_id": parent["span_id"] if parent else None,
+            "name": name,
+            "start": round(start, 6),
+            "duration": round(duration, 6),
+            "status": status,
+            "attributes": attributes,
+        })
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Times a block as a span; spans opened inside it become its children.
+        Yields the attribute dict so the block can add to it.
+        """
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        span = {
+            "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex,
+            "span_id": next(self._ids),
+            "parent_id": parent["span_id"] if parent else None,
+            "name": name,
+            "start": round(time.time(), 6),
+        }
+        start = time.perf_counter()
+        stack.append(span)
+        status = "ok"
+        try:
+            yield attributes
+        except (KeyboardInterrupt, GeneratorExit):
+            status = "cancelled"
+            raise
+        except BaseException as e:
+            status = "cancelled" if type(e).__name__ == "CancelledError" else "error"
+            attributes.setdefault("error", str(e))
+            raise
+        finally:
+            stack.pop()
+            span["duration"] = round(time.perf_counter() - start, 6)
+            span["status"] = status
+            span["attributes"] = attributes
+            self._emit(span)
+            self._span_finished(name, attributes, status)
+
+    def _span_finished(self, name, attributes, status):
+        if name == "task":
+            with self._lock:
+                self.tasks += 1
+            self.metrics.inc("tasks_total", status=attributes.get("status", status))
+            if self.metrics_file:
+                try:
+                    self.metrics.write(self.metrics_file)
+                except OSError:
+                    pass
+        elif name == "step":
+            with self._lock:
+                self.steps += 1
+            self.metrics.inc("steps_total")
+
+    # --- Agent loop records ---
+
+    def llm_request(self, timing, usage, cache_hit, state=None, prefix=None, model=None):
+        """Records one LLM request from the client's last_timing / last_usage and its prompt prefix reuse."""
+        timing = timing or {}
+        duration = timing.get("total") or 0.0
+        attributes = {"state": state, "model": model, "cache_hit": cache_hit, "ttfb": timing.get("ttfb"),
+                      "connect": timing.get("connect"), "reused_connection": timing.get("reused_connection"),
+                      "endpoint": timing.get("endpoint")}
+        usage = usage or {}
+        for key in self.tokens:
+            if isinstance(usage.get(key), int):
+                attributes[key] = usage[key]
+        if prefix and not prefix.get("first_request"):
+            attributes["prefix_reused_bytes"] = prefix["reused_bytes"]
+            attributes["prefix_ratio"] = round(prefix["ratio"], 4)
+            self.metrics.inc("llm_prompt_bytes_total", prefix["total_bytes"])
+            self.metrics.inc("llm_prompt_prefix_reused_bytes_total", prefix["reused_bytes"])
+            with self._lock:
+                self.prompt_prefix["reused_bytes"] += prefix["reused_bytes"]
+                self.prompt_prefix["total_bytes"] += prefix["total_bytes"]
+        self._record("llm_request", time.time() - duration, duration, attributes)
+
+        self.metrics.inc("llm_requests_total", state=state or "", model=model or "", cache="hit" if cache_hit else "miss")
+        with self._lock:
+            if cache_hit:
+                self.llm_cache_hits += 1
+            elif timing:
+                self.llm_latencies.append(duration)
+                if timing.get("ttfb") is not None:
+                    self.llm_ttfbs.append(timing["ttfb"])
+                if model:
+                    totals = self.models[model]
+                    totals["requests"] += 1
+                    totals["seconds"] += duration
+                    for key in ("prompt_tokens", "completion_tokens"):
+                        totals[key] += attributes.get(key, 0)
+            for key in self.tokens:
+                if key in attributes:
+                    self.tokens[key] += attributes[key]
+        if timing and not cache_hit:
+            self.metrics.observe("llm_request_seconds", duration)
+            if timing.get("ttfb") is not None:
+                self.metrics.observe("llm_ttfb_seconds", timing["ttfb"])
+        for key, kind in (("prompt_tokens", "prompt"), ("completion_tokens", "completion")):
+            if key in attributes:
+                self.metrics.inc("llm_tokens_total", attributes[key], type=kind)
+
+    def tool_call(self, name, result, error=None, result_tokens=None, tokens_saved=None):
+        """
+        Records one tool call from its result dict (or the error that prevented it).
+        `result_tokens` is the size of the result as written to the history and
+        `tokens_saved` what its encoding saved compared with JSON.
+        """
+        result = result or {}
+        elapsed = result.get("elapsed_time") or 0.0
+        output_bytes = result.get("output_bytes")
+        if output_bytes is None:
+            output_bytes = len((result.get("output") or "").encode("utf-8"))
+        success = bool(result.get("success")) and error is None
+        attributes = {"tool": name, "success": success, "elapsed_time": elapsed, "output_bytes": output_bytes}
+        for key in ("truncated", "timed_out", "killed", "returncode"):
+            if key in result:
+                attributes[key] = result[key]
+        if error or result.get("error"):
+            attributes["error"] = str(error or result.get("error"))[:500]
+        if result_tokens is not None:
+            attributes["result_tokens"] = result_tokens
+        if tokens_saved is not None:
+            attributes["tokens_saved"] = tokens_saved
+        self._record("tool_call", time.time() - elapsed, elapsed, attributes, status="ok" if success else "error")
+
+        self.metrics.inc("tool_calls_total", tool=name, outcome="success" if success else "failure")
+        self.metrics.observe("tool_seconds", elapsed, tool=name)
+        self.metrics.inc("tool_output_bytes_total", output_bytes, tool=name)
+        if tokens_saved is not None:
+            self.metrics.inc("tool_result_tokens_saved_total", tokens_saved, tool=name)
+        with self._lock:
+            if result_tokens is not None:
+                self.result_encoding["results"] += 1
+                self.result_encoding["tokens"] += result_tokens
+                self.result_encoding["tokens_saved"] += tokens_saved or 0
+            self.tool_times[name].append(elapsed)
+            self.tool_output_bytes[name] += output_bytes
+            if not success:
+                self.tool_failures[name] += 1
+
+    def speculation_result(self, accepted, reason=None):
+        """Records whether the small model's proposal was used (speculative mode), or why it was not."""
+        self._record("speculation", time.time(), 0.0, {"accepted": accepted, "reason": reason})
+        self.metrics.inc("speculative_proposals_total", outcome="accepted" if accepted else "rejected")
+        with self._lock:
+            self.speculation["accepted" if accepted else "rejected"] += 1
+
+    def fast_path_result(self, goal, rule=None, requests_skipped=0, fallback=False):
+        """
+        Records how the intent router handled a goal: the matching rule (None for a
+        miss), the LLM requests that were skipped, and whether the rule's tool failed
+        so the goal went to the agent after all. Misses are traced with their goal so
+        the rule set can be tuned from the trace file.
+        """
+        self._record("fast_path", time.time(), 0.0, {"goal": goal[:200], "rule": rule, "requests_skipped": requests_skipped,
+                                                      "fallback": fallback})
+        self.metrics.inc("fast_path_goals_total", rule=rule or "none")
+        self.metrics.inc("fast_path_llm_requests_skipped_total", requests_skipped)
+        with self._lock:
+            self.fast_path["goals"] += 1
+            if rule:
+                self.fast_path["hits"] += 1
+                self.fast_path["rules"][rule] += 1
+            if fallback:
+                self.fast_path["fallbacks"] += 1
+            self.fast_path["requests_skipped"] += requests_skipped
+
+    def history_pruned(self, messages, tokens, compacted=0):
+        """Records that the history dropped `messages` messages and compacted `compacted` tool results, freeing `tokens` tokens."""
+        self._record("history_pruned", time.time(), 0.0, {"messages": messages, "tokens": tokens, "compacted": compacted})
+        self.metrics.inc("history_pruned_messages_total", messages)
+        self.metrics.inc("history_pruned_tokens_total", tokens)
+        self.metrics.inc("history_compacted_results_total", compacted)
+        with self._lock:
+            self.pruning["events"] += 1
+            self.pruning["messages"] += messages
+            self.pruning["tokens"] += tokens
+            self.pruning["compacted"] += compacted
+
+    def summary(self):
+        """Session totals for /stats."""
+        with self._lock:
+            return {
+                "uptime": time.time() - self.started_at,
+                "tasks": self.tasks,
+                "steps": self.steps,
+                "llm_latency": _summary(self.llm_latencies),
+                "llm_ttfb": _summary(self.llm_ttfbs),
+                "llm_cache_hits": self.llm_cache_hits,
+                "tokens": dict(self.tokens),
+                "tools": {
+                    name: dict(_summary(times), failures=self.tool_failures[name], output_bytes=self.tool_output_bytes[name])
+                    for name, times in self.tool_times.items()
+                },
+                "pruning": dict(self.pruning),
+                "prompt_prefix": dict(self.prompt_prefix),
+                "result_encoding": dict(self.result_encoding),
+                "models": {model: dict(totals) for model, totals in self.models.items()},
+                "speculation": dict(self.speculation),
+                "fast_path": dict(self.fast_path, rules=dict(self.fast_path["rules"])),
+            }
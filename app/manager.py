@@ -1,67 +1,190 @@
 # app/manager.py
-from core.generic_client import GenericClient
+import time
+_STARTUP_T0 = time.perf_counter()
+
 from core.command_executor import CommandExecutor
 from core.tools import get_tools, ToolExecutor
-from core.memory import AgentMemory
+from core.tool_registry import registry, load_plugins
+from core.history import ConversationHistory
+from core.response_cache import ResponseCache
+from core.tokenizer import LazyTokenizer
+from core.startup import StartupTimer, preload_modules, import_time_report
+from core.tracing import Tracer
+from core.prompt_prefix import PrefixTracker
+from core.endpoints import EndpointPool, LLMError
+from core.intent_router import IntentRouter
+from core.plan_batch import PlanError, build_plan
+from core.result_encoding import encode_result
 import config
+import argparse
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
 import os
-import tiktoken
 
 from rich.console import Console
-from rich.panel import Panel
-from rich.markdown import Markdown
-from rich.text import Text
-from rich.table import Table
-from rich.align import Align
-from rich.rule import Rule
 
-from prompt_toolkit import prompt
-from prompt_toolkit.history import FileHistory
+# Modules imported at first use rather than at startup: the prompt, the session
+# store (sqlite3), the rich renderables and the HTTP stack. Fast start imports
+# them on a background thread, in order of first use, while the banner prints
+# and the user types.
+DEFERRED_MODULES = [
+    "prompt_toolkit", "prompt_toolkit.history", "core.session_store",
+    "rich.panel", "rich.table", "rich.text", "rich.rule", "rich.live", "rich.spinner",
+    "core.generic_client", "rich.markdown",
+]
+
+def _format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
 
 class TaskManager:
-    def __init__(self):
-        self.console = Console()
-        self.command_executor = CommandExecutor()
+    def __init__(self, fast_start=None, console=None, tracer=None):
+        self.fast_start = config.FAST_START if fast_start is None else fast_start
+        self.startup_timer = StartupTimer(_STARTUP_T0)
+        self.startup_timer.mark("imports")
+        self.console = console or Console()
+        self.command_executor = CommandExecutor(console=self.console)
+        for module_name, error in load_plugins(config.TOOL_PLUGINS):
+            self.console.print(f"[bold yellow]Could not load tool plugin '{module_name}': {error}[/bold yellow]")
         self.tool_executor = ToolExecutor(self.command_executor)
-        self.memory = AgentMemory()
-        self.client = GenericClient()
+        self._store = None
+        self._session_id = None  # Created with the first stored row, so empty sessions are not recorded
+        self._task_id = None
+        self.response_cache = ResponseCache(
+            max_entries=config.RESPONSE_CACHE_MEMORY_ENTRIES,
+            ttl=config.RESPONSE_CACHE_TTL,
+            disk_dir=config.RESPONSE_CACHE_DIR or None,
+            disk_max_bytes=config.RESPONSE_CACHE_DISK_MAX_MB * 1024 * 1024
+        )
+        self._client = None
+        # Shared by the sync and async clients, so routing and circuit breaker state outlive a task.
+        self.endpoint_pool = EndpointPool.from_config()
+        self.intent_router = IntentRouter(config.FAST_PATH_RULES)
+        self.tool_pool = ThreadPoolExecutor(max_workers=config.AGENT_TOOL_WORKERS)
         self.last_answer = ""
         self.last_command_info = None
-        self.history = FileHistory(config.HISTORY_FILE)
+        self.tool_call_log = []
+        self._task_status = None
+        self._task_error = None
+        self._reset_usage()
+        # Spans and metrics for the agent loop; shared when several managers run together.
+        self.tracer = tracer or Tracer(trace_file=config.TRACE_FILE or None, metrics_file=config.METRICS_FILE or None)
+        self._history = None
         
-        # --- NEW: Persistent conversation history ---
-        self.conversation_history = []
-        try:
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
-        except Exception:
-            self.tokenizer = None
-        
-        self.memory.clear()
+        # In fast-start mode the tokenizer and the HTTP stack load in the background.
+        self.tokenizer = LazyTokenizer("cl100k_base", background=self.fast_start)
+        if self.fast_start:
+            preload_modules(DEFERRED_MODULES)
 
-    def _prune_history(self):
-        """Keeps the conversation history within the token limit."""
-        if not self.tokenizer or not config.AGENT_MEMORY_MAX_TOKENS:
-            return
+        # --- Persistent conversation history with cached token counts ---
+        self.conversation_history = ConversationHistory(
+            self.tokenizer, config.AGENT_MEMORY_MAX_TOKENS,
+            on_prune=self.tracer.history_pruned,
+            # Stable-prefix mode edits the history only when it is over the limit, in large chunks.
+            compact_tool_tokens=None if config.AGENT_STABLE_PREFIX else config.HISTORY_COMPACT_TOOL_TOKENS,
+            compact_keep_lines=config.HISTORY_COMPACT_KEEP_LINES,
+            prune_target=config.HISTORY_STABLE_PRUNE_TARGET if config.AGENT_STABLE_PREFIX else 1.0
+        )
+        self.prefix_tracker = PrefixTracker()
+        self.last_prefix = None
+        self._stable_system_message = {"role": "system", "content": config.AGENT_SYSTEM_PROMPT}
 
-        token_count = 0
-        for message in self.conversation_history:
-            token_count += len(self.tokenizer.encode(str(message.get("content", ""))))
+        self.startup_timer.mark("TaskManager init")
 
-        # Remove oldest messages (after the first user message) until token count is acceptable
-        while token_count > config.AGENT_MEMORY_MAX_TOKENS:
-            if len(self.conversation_history) > 2: # Always keep at least one user/assistant exchange
-                removed_message = self.conversation_history.pop(1) # Remove the second oldest message
-                token_count -= len(self.tokenizer.encode(str(removed_message.get("content", ""))))
-            else:
-                break # Stop if we can't prune further
+    @property
+    def client(self):
+        """The HTTP client, created (and `requests` imported) on first use."""
+        if self._client is None:
+            from core.generic_client import GenericClient
+            self._client = GenericClient(response_cache=self.response_cache, pool=self.endpoint_pool)
+        return self._client
+
+    @property
+    def store(self):
+        """The session store, opened (and `sqlite3` imported) on first use."""
+        if self._store is None:
+            from core.session_store import SessionStore
+            self._store = SessionStore(
+                config.SESSION_DB,
+                max_sessions=config.SESSION_MAX_SESSIONS,
+                max_age_days=config.SESSION_MAX_AGE_DAYS,
+                output_max_bytes=config.SESSION_OUTPUT_MAX_BYTES
+            )
+        return self._store
+
+    @property
+    def history(self):
+        """The prompt's input history, created (and `prompt_toolkit` imported) on first use."""
+        if self._history is None:
+            from prompt_toolkit.history import FileHistory
+            self._history = FileHistory(config.HISTORY_FILE)
+        return self._history
+
+    @property
+    def session_id(self):
+        if self._session_id is None:
+            self._session_id = self.store.start_session(config.MODEL)
+        return self._session_id
 
     def _add_to_history(self, message):
-        """Adds a message to the history and prunes if necessary."""
-        self.conversation_history.append(message)
-        self._prune_history()
+        """Adds a message to the history (and the session store) and prunes if necessary. Returns its token count."""
+        tokens = self.conversation_history.append(message)
+        self.store.append_message(self.session_id, message, tokens, self._task_id)
+        return tokens
+
+    def new_session(self):
+        """Clears the conversation; the next task starts a new stored session."""
+        self.conversation_history.clear()
+        self._session_id = None
+
+    def resume_session(self, session_id=None):
+        """
+        Continues a stored session (the latest one by default): the end of its history
+        that fits in AGENT_MEMORY_MAX_TOKENS is loaded back. Returns the number of
+        messages restored, or None when there is no such session.
+        """
+        session_id = session_id or self.store.last_session_id()
+        if session_id is None:
+            return None
+        messages = self.store.load_messages(session_id, config.AGENT_MEMORY_MAX_TOKENS)
+        if not messages and not self.store.session_tasks(session_id):
+            return None
+        self.conversation_history.clear()
+        for message in messages:
+            self.conversation_history.append(message)
+        self._session_id = session_id
+        return len(messages)
+
+    def _start_task(self, user_goal):
+        self._task_id = self.store.start_task(self.session_id, user_goal)
+        return (time.time(), self.llm_requests, self.llm_time, dict(self.usage_totals))
+
+    def _finish_task(self, started):
+        """Stores the task's outcome, with the LLM usage since `started` (from _start_task)."""
+        start_time, llm_requests, llm_time, usage = started
+        self.store.finish_task(
+            self._task_id, self._task_status,
+            final_answer=self.last_answer if self._task_status == "answered" else None,
+            elapsed_time=round(time.time() - start_time, 3),
+            llm_requests=self.llm_requests - llm_requests,
+            llm_time=round(self.llm_time - llm_time, 3),
+            usage={key: self.usage_totals.get(key, 0) - usage.get(key, 0) for key in self.usage_totals}
+        )
+        self._task_id = None
+
+    def _endpoint_label(self):
+        endpoints = config.LLM_ENDPOINTS
+        return endpoints[0] if len(endpoints) == 1 else f"{endpoints[0]} (+{len(endpoints) - 1} more)"
 
     def print_welcome(self):
+        from rich.align import Align
+        from rich.panel import Panel
+        from rich.table import Table
+        from rich.text import Text
+        if self.fast_start:
+            self.console.print(f"[bold magenta]oconsole[/bold magenta] [dim]| {config.MODEL} @ {self._endpoint_label()} | /help for commands[/dim]")
+            return
+
         logo = Text("oconsole", style="bold magenta")
         tagline = Text("Your Programmatic AI Command Assistant", style="cyan")
         
@@ -69,7 +192,7 @@ class TaskManager:
         info_grid.add_column(style="green")
         info_grid.add_column()
         info_grid.add_row("✓ Model:", config.MODEL)
-        info_grid.add_row("✓ Endpoint:", config.HOST)
+        info_grid.add_row("✓ Endpoint:", self._endpoint_label())
         info_grid.add_row("✓ Agent Mode:", "Programmatic (Conversational)")
         
         main_panel_content = Table.grid(expand=True)
@@ -89,18 +212,72 @@ class TaskManager:
         self.console.print(welcome_panel)
 
     def _get_explanation(self, command, output):
-        explainer_client = GenericClient()
         prompt_messages = [
             {"role": "system", "content": config.EXPLAINER_SYSTEM_PROMPT},
             {"role": "user", "content": f"Command: {command}\nOutput:\n{output}"}
         ]
         
-        with self.console.status("[bold green]AI is generating an explanation...", spinner="dots"):
-            response = explainer_client.get_tool_response(messages=prompt_messages, tools=None)
+        try:
+            with self.console.status("[bold green]AI is generating an explanation...", spinner="dots"):
+                response = self.client.get_tool_response(messages=prompt_messages, tools=None,
+                                                         use_cache=config.RESPONSE_CACHE_SITES.get("explain", False),
+                                                         model=self._model_for("explain"))
+        except LLMError as e:
+            return f"Could not generate explanation: {e}"
+        self._print_request_timing()
         
         return response.get('content', 'Could not generate explanation.')
 
+    @staticmethod
+    def _model_for(purpose):
+        return config.MODEL_TIERS.get(purpose) or config.MODEL
+
+    def _reset_usage(self):
+        self.usage_totals = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.llm_time = 0.0
+        self.llm_requests = 0
+
+    def _after_request(self, client=None, state=None):
+        """Accounts and traces the token usage and latency of the last agent request, then shows its timing."""
+        client = client or self.client
+        self.tracer.llm_request(client.last_timing, client.last_usage, client.last_cache_hit, state=state, prefix=self.last_prefix,
+                                model=client.last_model)
+        self.llm_requests += 1
+        if client.last_timing:
+            self.llm_time += client.last_timing['total']
+        for key, value in (client.last_usage or {}).items():
+            if key in self.usage_totals and isinstance(value, int):
+                self.usage_totals[key] += value
+        self._print_request_timing(client)
+        prefix = self.last_prefix
+        if config.HTTP_SHOW_TIMINGS and prefix and not prefix['first_request']:
+            self.console.print(f"[dim]Prompt prefix: {prefix['ratio']:.0%} unchanged from the previous request "
+                               f"({prefix['reused_items']}/{prefix['total_items']} items, {prefix['reused_bytes']}/{prefix['total_bytes']} bytes)[/dim]")
+
+    def _print_request_timing(self, client=None):
+        """Shows the connect / time-to-first-byte / total breakdown of the last LLM request."""
+        client = client or self.client
+        if not config.HTTP_SHOW_TIMINGS:
+            return
+        if client.last_cache_hit:
+            self.console.print("[dim]LLM request: answered from the response cache[/dim]")
+            return
+        timing = client.last_timing
+        if not timing:
+            return
+        if timing['reused_connection'] is None:
+            connection = "connect n/a"
+        elif timing['reused_connection']:
+            connection = "reused connection"
+        else:
+            connection = f"connect {timing['connect']:.3f}s"
+        endpoint = f" | {timing['endpoint']}" if len(self.endpoint_pool) > 1 and timing.get('endpoint') else ""
+        self.console.print(f"[dim]LLM request: {connection} | TTFB {timing['ttfb']:.2f}s | total {timing['total']:.2f}s{endpoint}[/dim]")
+
     def handle_meta_commands(self, user_input):
+        from rich.panel import Panel
+        from rich.table import Table
+        from rich.text import Text
         parts = user_input.split()
         command = parts[0].lower()
 
@@ -108,7 +285,7 @@ class TaskManager:
             return "exit"
         
         elif command in ['/new', '/clear-memory']:
-            self.conversation_history = [] # Clear the persistent history
+            self.new_session()
             self.console.print(Panel("[bold green]✔ New session started. Conversational memory has been cleared.[/bold green]", border_style="green", width=70))
             return "handled"
 
@@ -132,7 +309,14 @@ class TaskManager:
   [cyan]/endpoint[/cyan]             - Show the current API endpoint.
   [cyan]/system[/cyan]               - Display the agent's system prompt.
   [cyan]/tools[/cyan]                - List all available tools for the agent.
-  [cyan]/memory[/cyan]               - Display the raw memory log for the last task.
+  [cyan]/memory[/cyan]               - Show the tasks and tool calls stored for this session.
+  [cyan]/stats[/cyan]                - Summarize this session's latencies, token spend and tool usage.
+  [cyan]/endpoints[/cyan]            - Show the LLM endpoints with their circuit state and latency.
+  [cyan]/cache [clear][/cyan]         - Show the command result cache statistics, or empty the cache.
+  [cyan]/sessions[/cyan]             - List recent stored sessions.
+  [cyan]/resume [id][/cyan]          - Continue a stored session (the latest one by default).
+  [cyan]/runs <command> [n][/cyan]   - Show the last n stored runs of a command, e.g. /runs df 5.
+  [cyan]/search <text>[/cyan]        - Search the goals and answers of past tasks.
 
 [bold]Utility Commands:[/bold]
   [cyan]/last[/cyan]                 - Re-run the last prompt.
@@ -150,11 +334,12 @@ class TaskManager:
             return "handled"
             
         elif command == '/model':
-            self.console.print(Panel(config.MODEL, title="[cyan]Current Model[/cyan]", border_style="cyan"))
+            tiers = "\n".join(f"{purpose}: {self._model_for(purpose)}" for purpose in config.MODEL_TIERS)
+            self.console.print(Panel(f"{config.MODEL}\n\n[dim]{tiers}[/dim]", title="[cyan]Current Model[/cyan]", border_style="cyan"))
             return "handled"
 
         elif command == '/endpoint':
-            self.console.print(Panel(config.HOST, title="[cyan]Current Endpoint[/cyan]", border_style="cyan"))
+            self.console.print(Panel("\n".join(config.LLM_ENDPOINTS), title="[cyan]Current Endpoint[/cyan]", border_style="cyan"))
             return "handled"
 
         elif command == '/params':
@@ -162,14 +347,126 @@ class TaskManager:
             grid.add_column(style="green", justify="right")
             grid.add_column()
             grid.add_row("Model:", config.MODEL)
-            grid.add_row("Endpoint:", config.HOST)
+            tiered = {purpose: model for purpose, model in config.MODEL_TIERS.items() if model != config.MODEL}
+            if tiered:
+                grid.add_row("Model Tiers:", ", ".join(f"{purpose}={model}" for purpose, model in tiered.items()))
+            grid.add_row("Speculative:", "On" if config.AGENT_SPECULATIVE else "Off")
+            grid.add_row("Fast Path:", f"On ({len(config.FAST_PATH_RULES)} rules)" if config.FAST_PATH else "Off")
+            grid.add_row("Endpoint:", self._endpoint_label())
             grid.add_row("Max Agent Steps:", str(config.AGENT_MAX_STEPS))
+            cache_stats = self.response_cache.stats()
+            grid.add_row("Response Cache:", f"{cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['memory_entries']} in memory)")
+            command_cache = self.tool_executor.command_cache
+            if command_cache:
+                stats = command_cache.stats()
+                grid.add_row("Command Cache:", f"{stats['hits']} hits / {stats['misses']} misses ({stats['entries']} entries)")
+            else:
+                grid.add_row("Command Cache:", "Off")
+            grid.add_row("Command Timeout:", f"{config.COMMAND_TIMEOUT}s" if config.COMMAND_TIMEOUT else "None")
+            grid.add_row("Streaming:", "On" if config.AGENT_STREAMING else "Off")
+            grid.add_row("Engine:", "asyncio" if config.AGENT_ASYNC else "sync")
+            grid.add_row("Endpoints:", f"{len(self.endpoint_pool)} ({config.LLM_ROUTING} routing)")
             self.console.print(Panel(grid, title="[cyan]Configuration Parameters[/cyan]", border_style="cyan"))
             return "handled"
 
+        elif command == '/stats':
+            self.print_stats()
+            return "handled"
+
+        elif command == '/cache':
+            command_cache = self.tool_executor.command_cache
+            if not command_cache:
+                self.console.print("[yellow]The command result cache is disabled (COMMAND_CACHE).[/yellow]")
+                return "handled"
+            if len(parts) > 1 and parts[1].lower() == 'clear':
+                dropped = command_cache.clear()
+                self.console.print(f"[green]Command cache cleared ({dropped} entries).[/green]")
+                return "handled"
+            stats = command_cache.stats()
+            lookups = stats['hits'] + stats['misses']
+            grid = Table.grid(padding=(0, 2))
+            grid.add_column(style="green", justify="right")
+            grid.add_column()
+            grid.add_row("Hits:", f"{stats['hits']}" + (f" ({stats['hits'] / lookups:.0%} of {lookups} lookups)" if lookups else ""))
+            grid.add_row("Misses:", str(stats['misses']))
+            grid.add_row("Invalidations:", str(stats['invalidations']))
+            grid.add_row("Entries:", f"{stats['entries']} / {command_cache.max_entries}")
+            grid.add_row("Time Saved:", f"{stats['time_saved']:.2f}s of command runtime")
+            cached = sorted(name for name, options in config.SAFE_COMMANDS.items() if (options or {}).get('cache_ttl'))
+            grid.add_row("Cacheable:", ", ".join(cached))
+            self.console.print(Panel(grid, title="[cyan]Command Result Cache[/cyan]", border_style="cyan"))
+            return "handled"
+
+        elif command == '/endpoints':
+            table = Table(title=f"[cyan]LLM Endpoints ({config.LLM_ROUTING} routing)[/cyan]", border_style="cyan", header_style="bold magenta")
+            table.add_column("Endpoint")
+            table.add_column("Circuit")
+            table.add_column("In Flight", justify="right")
+            table.add_column("Avg Latency", justify="right")
+            table.add_column("Requests", justify="right")
+            table.add_column("Failures", justify="right")
+            for endpoint in self.endpoint_pool.status():
+                style = {"closed": "green", "half-open": "yellow"}.get(endpoint['state'], "red")
+                latency = f"{endpoint['latency']:.2f}s" if endpoint['latency'] is not None else "-"
+                table.add_row(endpoint['url'], f"[{style}]{endpoint['state']}[/{style}]", str(endpoint['outstanding']),
+                              latency, str(endpoint['requests']), str(endpoint['failures']))
+            self.console.print(table)
+            return "handled"
+
  
         elif command == '/memory':
-            self.console.print(Panel(self.memory.read(), title="[cyan]Agent Memory Log[/cyan]", border_style="cyan", expand=False))
+            self.print_session_log()
+            return "handled"
+
+        elif command == '/sessions':
+            table = Table(title="[cyan]Recent Sessions[/cyan]", border_style="cyan", header_style="bold magenta")
+            table.add_column("ID", justify="right")
+            table.add_column("Started")
+            table.add_column("Tasks", justify="right")
+            table.add_column("First Goal")
+            for session in self.store.sessions():
+                marker = " *" if session['id'] == self._session_id else ""
+                table.add_row(f"{session['id']}{marker}", _format_time(session['started_at']), str(session['tasks']), session['first_goal'] or "")
+            self.console.print(table)
+            return "handled"
+
+        elif command == '/resume':
+            if len(parts) > 1 and not parts[1].isdigit():
+                self.console.print("[bold red]Usage: /resume [session id][/bold red]")
+                return "handled"
+            restored = self.resume_session(int(parts[1]) if len(parts) > 1 else None)
+            if restored is None:
+                self.console.print("[bold yellow]No stored session to resume.[/bold yellow]")
+            else:
+                self.console.print(Panel(f"[bold green]✔ Resumed session {self._session_id} ({restored} messages restored).[/bold green]", border_style="green", width=70))
+            return "handled"
+
+        elif command == '/runs':
+            if len(parts) < 2 or (len(parts) > 2 and not parts[2].isdigit()):
+                self.console.print("[bold red]Usage: /runs <command> [n][/bold red]")
+                return "handled"
+            runs = self.store.recent_runs(parts[1], int(parts[2]) if len(parts) > 2 else 5)
+            if not runs:
+                self.console.print(f"[bold yellow]No stored runs of '{parts[1]}'.[/bold yellow]")
+            for run in runs:
+                arguments = json.loads(run['arguments'] or "{}")
+                title = f"{run['command']} {arguments.get('args_string', '')}".strip()
+                status = "ok" if run['success'] else "failed"
+                self.console.print(Panel(Text(run['output'] or run['error'] or ""), border_style="cyan" if run['success'] else "red",
+                                         title=f"[cyan]{title}[/cyan] [dim]{_format_time(run['created_at'])} | {status} | {run['elapsed_time'] or 0:.2f}s[/dim]"))
+            return "handled"
+
+        elif command == '/search':
+            if len(parts) < 2:
+                self.console.print("[bold red]Usage: /search <text>[/bold red]")
+                return "handled"
+            tasks = self.store.search_answers(" ".join(parts[1:]))
+            if not tasks:
+                self.console.print("[bold yellow]No matching tasks.[/bold yellow]")
+            for task in tasks:
+                answer = task['final_answer'] or f"({task['status']})"
+                self.console.print(Panel(Text(answer if len(answer) <= 600 else answer[:600] + " ..."), border_style="cyan",
+                                         title=f"[cyan]{task['goal'][:80]}[/cyan] [dim]session {task['session_id']} | {_format_time(task['started_at'])}[/dim]"))
             return "handled"
 
         elif command == '/tools':
@@ -235,100 +532,763 @@ class TaskManager:
 
 
     def process_task(self, user_goal):
-        self._add_to_history({"role": "user", "content": user_goal})
-        self.run_agentic_mode()
+        from rich.panel import Panel
+        self._task_status = "incomplete"
+        self._task_error = None
+        started = self._start_task(user_goal)
+        with self.tracer.span("task", goal=user_goal[:200]) as task:
+            self._add_to_history({"role": "user", "content": user_goal})
+            try:
+                if self._try_fast_path(user_goal):
+                    pass
+                elif config.AGENT_ASYNC:
+                    asyncio.run(self._run_agentic_session_async())
+                else:
+                    self.run_agentic_mode()
+            except KeyboardInterrupt:
+                # Ctrl-C while a command runs only cancels that command (see CommandExecutor);
+                # anywhere else it cancels the task but keeps the session.
+                self._task_status = "cancelled"
+                self.command_executor.cancel_all()
+                self._answer_pending_tool_calls("Cancelled by the user.")
+                self.console.print("\n[bold yellow]✖ Task cancelled. The session is still active.[/bold yellow]")
+            except LLMError as e:
+                self._task_status = "error"
+                self._task_error = str(e)
+                self.console.print(Panel(f"[bold red]LLM request failed: {e}[/bold red]", border_style="red"))
+            finally:
+                task["status"] = self._task_status
+                self._finish_task(started)
 
-    def run_agentic_mode(self):
-        current_state = "PLANNING"
+    def _try_fast_path(self, user_goal):
+        """
+        Runs a goal matched by the intent router: the rule's tool call, then at most one
+        LLM request to answer from its output. Returns False when no rule matches or
+        the tool failed, so the goal goes through the agent loop (which then sees the
+        failed attempt in the history).
+        """
+        if not config.FAST_PATH:
+            return False
+        route = self.intent_router.match(user_goal)
+        if route is None:
+            self.tracer.fast_path_result(user_goal)
+            return False
 
-        for i in range(config.AGENT_MAX_STEPS):
-            token_count = sum(len(self.tokenizer.encode(str(m.get("content", "")))) for m in self.conversation_history) if self.tokenizer else 0
-            self.console.print(Rule(f"[bold blue]Step {i+1}/{config.AGENT_MAX_STEPS} | State: {current_state} | History: {token_count} Tokens[/bold blue]", style="blue"))
+        self.console.print(f"[dim]Fast path: '{route.rule}' rule, no planning needed[/dim]")
+        tool_call = {"id": f"fast_{int(time.time() * 1000)}", "type": "function",
+                     "function": {"name": route.tool, "arguments": json.dumps(route.arguments)}}
+        self._add_to_history({"role": "assistant", "content": "", "tool_calls": [tool_call]})
+        outcomes = self._run_tool_calls([tool_call])
+        self._apply_tool_outcomes([tool_call], outcomes, "EXECUTING")
+        if isinstance(outcomes[0], Exception) or not outcomes[0][1].get('success'):
+            self.tracer.fast_path_result(user_goal, route.rule, fallback=True)
+            return False
 
-            system_prompt = config.STATE_PROMPTS[current_state]
-            messages_for_api = [{"role": "system", "content": system_prompt}] + self.conversation_history
-            
+        # The agent loop needs a plan, a step for the tool and one for the answer.
+        requests_skipped = 3
+        if route.summarize:
+            messages = [{"role": "system", "content": config.FAST_PATH_ANSWER_PROMPT}] + self.conversation_history.messages()
             with self.console.status("[bold green]Agent is processing...", spinner="dots"):
-                response_message = self.client.get_tool_response(messages=messages_for_api, tools=get_tools())
-            
-            self._add_to_history(response_message)
+                response_message = self.client.get_tool_response(messages=messages, tools=None, model=self._model_for("explain"))
+            self._after_request(state="FAST_PATH")
+            requests_skipped -= 1
+            final_answer = response_message.get('content') or "The command finished without a summary."
+            # Only the text: tool calls asked for here would be left without tool replies.
+            self._add_to_history({"role": "assistant", "content": final_answer})
+        else:
+            final_answer = f"```\n{(outcomes[0][1].get('output') or '').strip()}\n```"
+        self.tracer.fast_path_result(user_goal, route.rule, requests_skipped)
+        self.display_final_answer(final_answer)
+        return True
 
-            if response_message.get('content'):
-                self.console.print("[bold green]✔ Agent Replied Directly[/bold green]")
-                self.display_final_answer(response_message['content'])
-                return
+    def run_goal(self, user_goal):
+        """
+        Runs one goal headlessly, starting from an empty conversation, and returns
+        a JSON-serializable summary: final answer, tool calls, timings and token usage.
+        """
+        self.new_session()
+        self.last_answer = ""
+        self.tool_call_log = []
+        self._reset_usage()
+        start_time = time.time()
+        error = None
+        try:
+            self.process_task(user_goal)
+            status, error = self._task_status, self._task_error
+        except Exception as e:
+            status, error = "error", str(e)
+        result = {
+            "goal": user_goal,
+            "status": status,
+            "final_answer": self.last_answer,
+            "tool_calls": self.tool_call_log,
+            "llm_requests": self.llm_requests,
+            "llm_time": round(self.llm_time, 3),
+            "elapsed_time": round(time.time() - start_time, 3),
+            "usage": dict(self.usage_totals)
+        }
+        if error:
+            result["error"] = error
+        return result
+
+    def _answer_pending_tool_calls(self, error):
+        """Answers the last assistant message's tool calls that have no result yet, so the history stays valid."""
+        answered = set()
+        for message in reversed(self.conversation_history):
+            if message.get('role') == 'tool':
+                answered.add(message.get('tool_call_id'))
+                continue
+            if message.get('role') == 'assistant':
+                for tool_call in message.get('tool_calls') or []:
+                    if tool_call['id'] not in answered:
+                        self._add_to_history({"role": "tool", "tool_call_id": tool_call['id'], "content": json.dumps({"success": False, "error": error})})
+            break
+
+    async def run_goal_async(self, user_goal):
+        """
+        Runs one goal on the async engine. Every TaskManager keeps its own history,
+        so several sessions can share one event loop, e.g. with asyncio.gather().
+        """
+        self._task_status = "incomplete"
+        self._task_error = None
+        started = self._start_task(user_goal)
+        with self.tracer.span("task", goal=user_goal[:200]) as task:
+            self._add_to_history({"role": "user", "content": user_goal})
+            try:
+                await self._run_agentic_session_async()
+            except LLMError as e:
+                self._task_status = "error"
+                self._task_error = str(e)
+                raise
+            finally:
+                task["status"] = self._task_status
+                self._finish_task(started)
+
+    async def _run_agentic_session_async(self):
+        # Imported here so httpx is only needed when the async engine is used.
+        from core.async_client import AsyncGenericClient
+        async with AsyncGenericClient(response_cache=self.response_cache, pool=self.endpoint_pool) as client:
+            await self.run_agentic_mode_async(client)
+
+    def _use_response_cache(self, current_state):
+        return config.RESPONSE_CACHE_SITES.get(current_state.lower(), False)
+
+    def _begin_step(self, step, current_state):
+        """Prints the step banner and builds the messages to send for this step."""
+        from rich.rule import Rule
+        token_count = self.conversation_history.token_count
+        self.console.print(Rule(f"[bold blue]Step {step+1}/{config.AGENT_MAX_STEPS} | State: {current_state} | History: {token_count} Tokens[/bold blue]", style="blue"))
+
+        state_prompt = config.STATE_PROMPTS[current_state]
+        if config.AGENT_PLAN_BATCH and current_state == "PLANNING":
+            state_prompt += config.PLAN_BATCH_PROMPT
+        state_message = {"role": "system", "content": state_prompt}
+        if config.AGENT_STABLE_PREFIX:
+            # Fixed system prompt first and the state instructions last, so everything
+            # before the newest messages is byte-identical to the previous request.
+            messages = [self._stable_system_message] + self.conversation_history.messages() + [state_message]
+        else:
+            messages = [state_message] + self.conversation_history.messages()
+        self.last_prefix = self.prefix_tracker.observe(messages, get_tools())
+        return messages
+
+    def _accept_response(self, response_message):
+        """
+        Records the assistant message. Returns the tool calls to run next, or None
+        when the agent has finished.
+        """
+        self._add_to_history(response_message)
+
+        tool_calls = response_message.get('tool_calls')
 
-            tool_calls = response_message.get('tool_calls')
+        # A reply that also carries tool calls is not final: the calls still need answering.
+        if response_message.get('content') and not tool_calls:
+            self.console.print("[bold green]✔ Agent Replied Directly[/bold green]")
+            self.display_final_answer(response_message['content'])
+            return None
 
-            if not tool_calls:
-                self.console.print("[bold yellow]Agent finished without providing an answer or action.[/bold yellow]")
-                return
+        if not tool_calls:
+            self.console.print("[bold yellow]Agent finished without providing an answer or action.[/bold yellow]")
+            return None
 
-            tool_call = tool_calls[0]
+        return tool_calls
+
+    def _speculation_enabled(self, current_state):
+        return (config.AGENT_SPECULATIVE and current_state == "EXECUTING"
+                and self._model_for("propose") != self._model_for("execute"))
+
+    def _check_proposal(self, message):
+        """Returns why the small model's reply cannot be used as is, or None when it can."""
+        tool_calls = message.get('tool_calls')
+        if not tool_calls:
+            return "no tool call"
+        for tool_call in tool_calls:
             function_name = tool_call['function']['name']
-            tool_call_id = tool_call['id']
-            
+            if function_name != "run_safe_command":
+                return f"proposed {function_name}"
             try:
-                arguments = json.loads(tool_call['function']['arguments'])
+                arguments = json.loads(tool_call['function']['arguments'] or "{}")
+            except json.JSONDecodeError:
+                return "arguments are not valid JSON"
+            error = self.tool_executor.check_call(function_name, arguments)
+            if error:
+                return error
+        return None
 
-                # Display logic
-                if function_name == "explain_plan":
-                    plan_text = arguments.get('plan', 'No plan provided.')
-                    self.console.print(Panel(Text(plan_text, style="italic yellow"), title="[bold blue]🤔 Agent's Plan[/bold blue]", border_style="blue"))
-                else:
-                    action_table = Table.grid(padding=(0, 1))
-                    action_table.add_column(style="dim"); action_table.add_column()
-                    action_table.add_row("Tool:", f"[bold cyan]{function_name}[/bold cyan]")
-                    action_table.add_row("Arguments:", f"[cyan]{json.dumps(arguments, indent=2)}[/cyan]")
-                    self.console.print(Panel(action_table, title="[bold dim]Agent Action[/bold dim]", border_style="dim"))
-
-                if function_name == 'run_safe_command':
-                    self.console.print(Panel(f"$ {arguments.get('command_name', '')} {arguments.get('args_string', '')}".strip(), border_style="green", title="[green]Executing Command[/green]", title_align="left"))
-
-                result_output = self.execute_tool(function_name, arguments)
-
-                if function_name not in ['explain_plan', 'answer_question']:
-                    if result_output.get('success'):
-                        self.command_executor.print_successful_output(result_output['output'], result_output['elapsed_time'])
-                        if function_name == 'run_safe_command' and result_output.get('output'):
-                             self.last_command_info = {'command': f"{arguments.get('command_name', '')} {arguments.get('args_string', '')}".strip(), 'output': result_output['output']}
+    def _speculation_outcome(self, message, client=None, state=None):
+        """Accounts the proposal request and returns the message if it passed the checks, otherwise None."""
+        self._after_request(client, state)
+        reason = self._check_proposal(message)
+        self.tracer.speculation_result(reason is None, reason)
+        if reason is None:
+            self.console.print(f"[dim]Speculative: used the proposal of {self._model_for('propose')}[/dim]")
+            return message
+        self.console.print(f"[dim]Speculative: proposal rejected ({reason}); asking {self._model_for('execute')}[/dim]")
+        return None
+
+    def _speculate(self, messages_for_api, current_state, use_cache=False):
+        """
+        Speculative mode: asks the small "propose" model for the next step and returns
+        its reply if it is a valid run_safe_command call, otherwise None.
+        """
+        if not self._speculation_enabled(current_state):
+            return None
+        try:
+            with self.console.status("[bold green]Agent is processing (speculative)...", spinner="dots"):
+                message = self.client.get_tool_response(messages=messages_for_api, tools=get_tools(), use_cache=use_cache,
+                                                        model=self._model_for("propose"))
+        except LLMError as e:
+            self.tracer.speculation_result(False, str(e))
+            return None
+        return self._speculation_outcome(message, state=current_state)
+
+    async def _speculate_async(self, client, messages_for_api, current_state, use_cache=False):
+        """asyncio counterpart of _speculate."""
+        if not self._speculation_enabled(current_state):
+            return None
+        try:
+            with self.console.status("[bold green]Agent is processing (speculative)...", spinner="dots"):
+                message = await client.get_tool_response(messages=messages_for_api, tools=get_tools(), use_cache=use_cache,
+                                                         model=self._model_for("propose"))
+        except LLMError as e:
+            self.tracer.speculation_result(False, str(e))
+            return None
+        return self._speculation_outcome(message, client, current_state)
+
+    def _request_agent_response(self, messages_for_api, use_cache=False, model=None):
+        """
+        Gets the next assistant message. Returns the message plus futures for the
+        tool calls that were already started while the response was still streaming.
+        """
+        from rich.live import Live
+        from rich.spinner import Spinner
+        from rich.text import Text
+        if not config.AGENT_STREAMING:
+            with self.console.status("[bold green]Agent is processing...", spinner="dots"):
+                response_message = self.client.get_tool_response(messages=messages_for_api, tools=get_tools(), use_cache=use_cache, model=model)
+            return response_message, {}
+
+        response_message = None
+        started = {}
+        started_calls = []
+        in_order = True
+        streamed_text = ""
+        try:
+            with Live(Spinner("dots", text=Text("Agent is processing...", style="bold green")), console=self.console, transient=True) as live:
+                for event, data in self.client.get_streaming_tool_response(messages_for_api, get_tools(), use_cache=use_cache, model=model):
+                    if event == "content":
+                        streamed_text += data
+                        live.update(Text(streamed_text, style="bright_green"))
+                    elif event == "tool_call" and in_order:
+                        # Start parallel-safe calls the moment their arguments are complete,
+                        # while the rest of the completion is still being generated. Once a
+                        # call has to run in order, everything after it waits for it.
+                        arguments = self._parallel_safe_arguments(data)
+                        if arguments is None:
+                            in_order = False
                         else:
-                             self.last_command_info = None
-                    else:
-                        self.console.print(Panel(Text(result_output.get('error', 'An unknown error occurred.'), style="red"), title="[red]✖ Command Failed[/red]", border_style="red"))
-                        self.last_command_info = None
-                
-                tool_response_content = json.dumps(result_output)
-                self._add_to_history({"role": "tool", "tool_call_id": tool_call_id, "content": tool_response_content})
-                
-                if current_state == "PLANNING" and function_name == "explain_plan":
-                    current_state = "EXECUTING"
-                elif function_name == "answer_question":
-                    self.console.print("[bold green]✔ Agent has finished the task.[/bold green]")
-                    self.display_final_answer(arguments.get('query', "Task completed."))
-                    return
-                
-                self.console.print()
+                            started[data['id']] = self.tool_pool.submit(self.execute_tool, data['function']['name'], arguments)
+                            started_calls.append(data)
+                    elif event == "message":
+                        response_message = data
+        except BaseException as e:
+            if started:
+                self._settle_started_calls(started_calls, started, cancel_commands=isinstance(e, KeyboardInterrupt))
+            raise
+        return response_message, started
+
+    def _settle_started_calls(self, tool_calls, futures, cancel_commands=False):
+        """
+        The response stream failed after some tool calls were already started. Calls
+        still queued are cancelled, the running ones are waited for (or killed with
+        `cancel_commands`), and all of them are written to the history under an
+        assistant message of their own, so no result is lost and every call is answered.
+        """
+        for tool_call in tool_calls:
+            futures[tool_call['id']].cancel()
+        if cancel_commands:
+            self.command_executor.cancel_all()
+        self._add_to_history({"role": "assistant", "content": "", "tool_calls": tool_calls})
+        outcomes = []
+        for tool_call in tool_calls:
+            future = futures[tool_call['id']]
+            arguments = json.loads(tool_call['function']['arguments'] or "{}")
+            if future.cancelled():
+                outcomes.append((arguments, {"success": False, "error": "Not run: the response that requested it failed."}))
+                continue
+            try:
+                outcomes.append((arguments, future.result()))
+            except Exception as e:
+                outcomes.append(e)
+        self._apply_tool_outcomes(tool_calls, outcomes, "EXECUTING")
+
+    def _parallel_safe_arguments(self, tool_call):
+        """
+        Returns the parsed arguments if the call is read-only and may run concurrently
+        with its neighbours, otherwise None.
+        """
+        function_name = tool_call['function']['name']
+        spec = registry.get(function_name)
+        if function_name not in config.PARALLEL_TOOLS and not (spec and spec.parallel_safe):
+            return None
+        try:
+            arguments = json.loads(tool_call['function']['arguments'] or "{}")
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(arguments, dict):
+            return None
+        if function_name == 'run_safe_command' and arguments.get('command_name') in config.SEQUENTIAL_COMMANDS:
+            return None
+        return arguments
+
+    def _display_tool_call(self, function_name, arguments):
+        from rich.panel import Panel
+        from rich.table import Table
+        from rich.text import Text
+        if function_name == "explain_plan":
+            plan_text = arguments.get('plan', 'No plan provided.')
+            self.console.print(Panel(Text(plan_text, style="italic yellow"), title="[bold blue]🤔 Agent's Plan[/bold blue]", border_style="blue"))
+        else:
+            action_table = Table.grid(padding=(0, 1))
+            action_table.add_column(style="dim"); action_table.add_column()
+            action_table.add_row("Tool:", f"[bold cyan]{function_name}[/bold cyan]")
+            action_table.add_row("Arguments:", f"[cyan]{json.dumps(arguments, indent=2)}[/cyan]")
+            self.console.print(Panel(action_table, title="[bold dim]Agent Action[/bold dim]", border_style="dim"))
+
+        if function_name == 'run_safe_command':
+            self.console.print(Panel(f"$ {arguments.get('command_name', '')} {arguments.get('args_string', '')}".strip(), border_style="green", title="[green]Executing Command[/green]", title_align="left"))
+
+    def _display_tool_result(self, function_name, arguments, result_output):
+        from rich.panel import Panel
+        from rich.text import Text
+        if function_name not in ['explain_plan', 'answer_question']:
+            if result_output.get('success'):
+                self.command_executor.print_successful_output(result_output['output'], result_output['elapsed_time'])
+                if function_name == 'run_safe_command' and result_output.get('output'):
+                     self.last_command_info = {'command': f"{arguments.get('command_name', '')} {arguments.get('args_string', '')}".strip(), 'output': result_output['output']}
+                else:
+                     self.last_command_info = None
+            else:
+                self.console.print(Panel(Text(result_output.get('error', 'An unknown error occurred.'), style="red"), title="[red]✖ Command Failed[/red]", border_style="red"))
+                self.last_command_info = None
+
+    def _run_tool_call(self, tool_call, future=None):
+        """
+        Displays and executes a single tool call, or waits for it if it was already
+        started on the worker pool. Returns (arguments, result_output), or the
+        processing error.
+        """
+        try:
+            function_name = tool_call['function']['name']
+            arguments = json.loads(tool_call['function']['arguments'] or "{}")
+            self._display_tool_call(function_name, arguments)
+            if future is not None:
+                with self.console.status(f"[bold green]Waiting for {function_name}...", spinner="dots"):
+                    result_output = future.result()
+            else:
+                with self.command_executor.live_output():
+                    result_output = self.execute_tool(function_name, arguments)
+            self._display_tool_result(function_name, arguments, result_output)
+            return arguments, result_output
+        except (json.JSONDecodeError, TypeError) as e:
+            return e
+
+    def _run_tool_calls(self, tool_calls, started=None):
+        """
+        Executes every tool call of one assistant message and returns their outcomes
+        in order. Runs of consecutive read-only calls are executed concurrently on the
+        worker pool; the other calls run one at a time, in order. Output is always
+        displayed in call order.
+        """
+        futures = dict(started or {})
+        outcomes = []
+        for index, tool_call in enumerate(tool_calls):
+            if tool_call['id'] not in futures:
+                for following in tool_calls[index:]:
+                    arguments = self._parallel_safe_arguments(following)
+                    if arguments is None:
+                        break
+                    if following['id'] not in futures:
+                        futures[following['id']] = self.tool_pool.submit(self.execute_tool, following['function']['name'], arguments)
+            outcomes.append(self._run_tool_call(tool_call, futures.get(tool_call['id'])))
+        return outcomes
+
+    async def _run_tool_call_async(self, tool_call, task=None):
+        """asyncio counterpart of _run_tool_call."""
+        try:
+            function_name = tool_call['function']['name']
+            arguments = json.loads(tool_call['function']['arguments'] or "{}")
+            self._display_tool_call(function_name, arguments)
+            if task is not None:
+                result_output = await task
+            else:
+                result_output = await self.execute_tool_async(function_name, arguments)
+            self._display_tool_result(function_name, arguments, result_output)
+            return arguments, result_output
+        except (json.JSONDecodeError, TypeError) as e:
+            return e
 
-            except (json.JSONDecodeError, TypeError) as e:
-                error_msg = f"Error processing tool call: {e}"
+    async def _run_tool_calls_async(self, tool_calls):
+        """asyncio counterpart of _run_tool_calls, bounded by a semaphore instead of a pool."""
+        semaphore = asyncio.Semaphore(config.AGENT_TOOL_WORKERS)
+
+        async def run_limited(function_name, arguments):
+            async with semaphore:
+                return await self.execute_tool_async(function_name, arguments)
+
+        tasks = {}
+        outcomes = []
+        try:
+            for index, tool_call in enumerate(tool_calls):
+                if tool_call['id'] not in tasks:
+                    for following in tool_calls[index:]:
+                        arguments = self._parallel_safe_arguments(following)
+                        if arguments is None:
+                            break
+                        if following['id'] not in tasks:
+                            tasks[following['id']] = asyncio.ensure_future(run_limited(following['function']['name'], arguments))
+                outcomes.append(await self._run_tool_call_async(tool_call, tasks.get(tool_call['id'])))
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return outcomes
+
+    def _add_tool_result(self, function_name, tool_call_id, arguments, result_output):
+        """
+        Writes a tool result to the history, as a compact plain-text envelope unless
+        TOOL_RESULT_FORMAT is "json", and records the tokens saved against JSON.
+        """
+        json_message = {"role": "tool", "tool_call_id": tool_call_id, "content": json.dumps(result_output)}
+        if config.TOOL_RESULT_FORMAT != "compact":
+            tokens = self._add_to_history(json_message)
+            self.tracer.tool_call(function_name, result_output, result_tokens=tokens, tokens_saved=0)
+            return
+
+        message = {"role": "tool", "tool_call_id": tool_call_id, "content": encode_result(function_name, arguments, result_output)}
+        tokens = self._add_to_history(message)
+        json_tokens = self.conversation_history.count_tokens(json_message)
+        self.tracer.tool_call(function_name, result_output, result_tokens=tokens, tokens_saved=json_tokens - tokens)
+        if json_tokens > tokens:
+            self.console.print(f"[dim]Tool result: {tokens} tokens ({json_tokens - tokens} saved against JSON)[/dim]")
+
+    def _apply_tool_outcomes(self, tool_calls, outcomes, current_state):
+        """
+        Records one tool message per call, in call order. Returns the next agent
+        state, or None when the task is finished.
+        """
+        final_answer = None
+        plan_steps = None
+        for tool_call, outcome in zip(tool_calls, outcomes):
+            function_name = tool_call['function']['name']
+            tool_call_id = tool_call['id']
+
+            if isinstance(outcome, Exception):
+                error_msg = f"Error processing tool call: {outcome}"
+                self.tool_call_log.append({"name": function_name, "arguments": tool_call['function'].get('arguments'),
+                                           "success": False, "error": error_msg})
+                self.tracer.tool_call(function_name, None, error=error_msg)
+                self.store.record_tool_call(self.session_id, self._task_id, function_name, None, error=error_msg)
                 self.console.print(f"[bold red]{error_msg}[/bold red]")
                 self._add_to_history({"role": "tool", "tool_call_id": tool_call_id, "content": json.dumps({"success": False, "error": error_msg})})
+                continue
+
+            arguments, result_output = outcome
+            self.tool_call_log.append({"name": function_name, "arguments": arguments,
+                                       "success": result_output.get('success'),
+                                       "elapsed_time": result_output.get('elapsed_time')})
+            self.store.record_tool_call(self.session_id, self._task_id, function_name, arguments, result_output)
+            self._add_tool_result(function_name, tool_call_id, arguments, result_output)
+
+            if current_state == "PLANNING" and function_name == "explain_plan":
+                current_state = "EXECUTING"
+                if config.AGENT_PLAN_BATCH and arguments.get('steps'):
+                    plan_steps = arguments['steps']
+            elif function_name == "answer_question" and final_answer is None:
+                final_answer = arguments.get('query', "Task completed.")
+
+        if plan_steps is not None and final_answer is None:
+            current_state = self._run_plan_batch(plan_steps)
+
+        if final_answer is not None:
+            self.console.print("[bold green]✔ Agent has finished the task.[/bold green]")
+            self.display_final_answer(final_answer)
+            return None
+
+        self.console.print()
+        return current_state
+
+    def _step_parallel_safe(self, function_name, arguments):
+        tool_call = {"function": {"name": function_name, "arguments": json.dumps(arguments)}}
+        return self._parallel_safe_arguments(tool_call) is not None
+
+    def _run_plan_batch(self, raw_steps):
+        """
+        Plan-batch mode: validates the steps of the approved plan and runs them wave by
+        wave, the independent steps of a wave concurrently, without asking the model in
+        between. Steps that depend on a failed step are skipped. Returns the next state:
+        REVIEWING, or EXECUTING (step by step) when the steps are not a valid plan.
+        """
+        try:
+            waves = build_plan(raw_steps, self.tool_executor.check_call, self._step_parallel_safe, config.AGENT_PLAN_MAX_STEPS)
+        except PlanError as e:
+            self.console.print(f"[bold yellow]Plan steps cannot be batched ({e}); executing step by step.[/bold yellow]")
+            return "EXECUTING"
+
+        steps = [step for wave in waves for step in wave]
+        self.console.print(f"[dim]Plan batch: {len(steps)} steps in {len(waves)} waves[/dim]")
+        # One assistant turn carries every step, so the history stays a valid call/result sequence.
+        self._add_to_history({"role": "assistant", "content": "", "tool_calls": [step.tool_call for step in steps]})
+        failed = set()
+        skipped_total = 0
+        start_time = time.perf_counter()
+        with self.tracer.span("plan_batch", steps=len(steps), waves=len(waves)) as span:
+            for wave in waves:
+                skipped = {}
+                for step in wave:
+                    blocked = [dependency for dependency in step.depends_on if dependency in failed]
+                    if blocked:
+                        skipped[step.id] = f"Skipped: depends on step '{blocked[0]}', which did not succeed."
+                        self.console.print(f"[dim]Skipping '{step.id}' ({step.tool}): step '{blocked[0]}' did not succeed[/dim]")
+                skipped_total += len(skipped)
+                runnable = [step for step in wave if step.id not in skipped]
+                ran = dict(zip((step.id for step in runnable), self._run_tool_calls([step.tool_call for step in runnable])))
+                # Results go to the history in tool_calls order; skipped steps are recorded like failed ones.
+                outcomes = [ran[step.id] if step.id in ran else (step.arguments, {"success": False, "error": skipped[step.id]})
+                            for step in wave]
+                self._apply_tool_outcomes([step.tool_call for step in wave], outcomes, "EXECUTING")
+                for step, outcome in zip(wave, outcomes):
+                    if isinstance(outcome, Exception) or not outcome[1].get('success'):
+                        failed.add(step.id)
+            span["failed"] = len(failed) - skipped_total
+            span["skipped"] = skipped_total
+        self.console.print(f"[dim]Plan batch: {len(steps) - len(failed)}/{len(steps)} steps succeeded in "
+                           f"{time.perf_counter() - start_time:.1f}s ({len(steps)} model round-trips avoided)[/dim]")
+        return "REVIEWING"
+
+    def run_agentic_mode(self):
+        from rich.panel import Panel
+        current_state = "PLANNING"
+
+        for i in range(config.AGENT_MAX_STEPS):
+            with self.tracer.span("step", step=i + 1, state=current_state):
+                messages_for_api = self._begin_step(i, current_state)
+                use_cache = self._use_response_cache(current_state)
+
+                response_message, started = self._speculate(messages_for_api, current_state, use_cache), {}
+                if response_message is None:
+                    response_message, started = self._request_agent_response(messages_for_api, use_cache,
+                                                                              self._model_for(config.STATE_PURPOSES[current_state]))
+                    self._after_request(state=current_state)
+
+                tool_calls = self._accept_response(response_message)
+                if tool_calls is None:
+                    return
+
+                outcomes = self._run_tool_calls(tool_calls, started)
+                current_state = self._apply_tool_outcomes(tool_calls, outcomes, current_state)
+                if current_state is None:
+                    return
+
+        self.console.print(Panel("[bold yellow]Agent reached maximum steps and could not complete the task.[/bold yellow]", border_style="yellow"))
+
+    async def run_agentic_mode_async(self, client):
+        """
+        asyncio counterpart of run_agentic_mode. Cancelling the task (Ctrl-C) stops the
+        current step cleanly: running commands are killed and the pending tool calls are
+        answered with a cancellation result so the history stays valid.
+        """
+        from rich.panel import Panel
+        current_state = "PLANNING"
+
+        for i in range(config.AGENT_MAX_STEPS):
+            with self.tracer.span("step", step=i + 1, state=current_state):
+                messages_for_api = self._begin_step(i, current_state)
+                use_cache = self._use_response_cache(current_state)
+
+                response_message = await self._speculate_async(client, messages_for_api, current_state, use_cache)
+                if response_message is None:
+                    with self.console.status("[bold green]Agent is processing...", spinner="dots"):
+                        response_message = await client.get_tool_response(messages=messages_for_api, tools=get_tools(), use_cache=use_cache,
+                                                                          model=self._model_for(config.STATE_PURPOSES[current_state]))
+                    self._after_request(client, current_state)
+
+                tool_calls = self._accept_response(response_message)
+                if tool_calls is None:
+                    return
+
+                try:
+                    outcomes = await self._run_tool_calls_async(tool_calls)
+                except asyncio.CancelledError:
+                    self._answer_pending_tool_calls("Cancelled by the user.")
+                    raise
+                current_state = self._apply_tool_outcomes(tool_calls, outcomes, current_state)
+                if current_state is None:
+                    return
 
         self.console.print(Panel("[bold yellow]Agent reached maximum steps and could not complete the task.[/bold yellow]", border_style="yellow"))
 
     def execute_tool(self, function_name, arguments):
-        if hasattr(self.tool_executor, function_name):
-            return getattr(self.tool_executor, function_name)(**arguments)
-        return {"success": False, "error": f"Tool '{function_name}' is not valid."}
+        return self.tool_executor.execute(function_name, arguments)
+
+    async def execute_tool_async(self, function_name, arguments):
+        return await self.tool_executor.execute_async(function_name, arguments)
 
     def display_final_answer(self, final_answer=""):
+        from rich.panel import Panel
+        from rich.markdown import Markdown  # Pulls in markdown-it; only needed for answers
         self.last_answer = final_answer
+        self._task_status = "answered"
         self.console.print(Panel(Markdown(final_answer, style="bright_green"),
             title="[bold magenta]Final Answer[/bold magenta]", border_style="magenta", padding=(1, 2)))
 
+    def print_session_log(self):
+        """Shows the tasks and tool calls stored for the current session."""
+        from rich.table import Table
+        if self._session_id is None:
+            self.console.print("[bold yellow]Nothing has been stored for this session yet.[/bold yellow]")
+            return
+        table = Table(title=f"[cyan]Session {self._session_id}[/cyan]", border_style="cyan", header_style="bold magenta")
+        table.add_column("Time")
+        table.add_column("Entry")
+        table.add_column("Result")
+        rows = [(task['started_at'], f"[bold]Task:[/bold] {task['goal']}", task['status'] or "running")
+                for task in self.store.session_tasks(self._session_id)]
+        for call in self.store.session_tool_calls(self._session_id):
+            arguments = json.loads(call['arguments'] or "{}")
+            label = f"{call['command']} {arguments.get('args_string', '')}".strip() if call['command'] else call['name']
+            result = "ok" if call['success'] else f"failed: {(call['error'] or '')[:60]}"
+            rows.append((call['created_at'], f"  {label}", f"{result} ({call['elapsed_time'] or 0:.2f}s)"))
+        for created_at, entry, result in sorted(rows, key=lambda row: row[0]):
+            table.add_row(_format_time(created_at), entry, result)
+        self.console.print(table)
+
+    def _add_tiering_rows(self, grid, stats):
+        """
+        Per-model requests and the estimated savings of model tiers and speculative
+        mode: every request a smaller model answered in place of MODEL is valued at
+        MODEL's average latency this session; rejected proposals replaced nothing.
+        """
+        models = stats['models']
+        if not models or set(models) == {config.MODEL}:
+            return
+        for model, totals in sorted(models.items()):
+            average = totals['seconds'] / totals['requests'] if totals['requests'] else 0.0
+            grid.add_row(f"Model {model}:", f"{totals['requests']} requests | avg {average:.2f}s | "
+                                            f"{totals['prompt_tokens']} prompt + {totals['completion_tokens']} completion tokens")
+        speculation = stats['speculation']
+        if speculation['accepted'] or speculation['rejected']:
+            grid.add_row("Speculation:", f"{speculation['accepted']} proposals used, {speculation['rejected']} sent on to {self._model_for('execute')}")
+        primary = models.get(config.MODEL)
+        if not primary or not primary['requests']:
+            return
+        smaller = [totals for model, totals in models.items() if model != config.MODEL]
+        small_requests = sum(totals['requests'] for totals in smaller)
+        replaced = max(0, small_requests - speculation['rejected'])
+        saved = replaced * primary['seconds'] / primary['requests'] - sum(totals['seconds'] for totals in smaller)
+        small_tokens = sum(totals['prompt_tokens'] + totals['completion_tokens'] for totals in smaller)
+        moved_tokens = small_tokens * replaced // small_requests if small_requests else 0
+        grid.add_row("Tiering Savings:", f"~{saved:.1f}s of LLM time; {moved_tokens} tokens handled by smaller models instead of {config.MODEL}")
+
+    def print_stats(self):
+        """Shows the session summary collected by the tracer."""
+        from rich.panel import Panel
+        from rich.table import Table
+        stats = self.tracer.summary()
+        grid = Table.grid(padding=(0, 2))
+        grid.add_column(style="green", justify="right")
+        grid.add_column()
+        grid.add_row("Tasks / Steps:", f"{stats['tasks']} / {stats['steps']}")
+        latency, ttfb = stats['llm_latency'], stats['llm_ttfb']
+        grid.add_row("LLM Requests:", f"{latency['count']} sent, {stats['llm_cache_hits']} from cache")
+        if latency['count']:
+            grid.add_row("LLM Latency:", f"avg {latency['avg']:.2f}s | p50 {latency['p50']:.2f}s | p95 {latency['p95']:.2f}s | max {latency['max']:.2f}s")
+        if ttfb['count']:
+            grid.add_row("LLM TTFB:", f"avg {ttfb['avg']:.2f}s | p95 {ttfb['p95']:.2f}s")
+        tokens = stats['tokens']
+        grid.add_row("Tokens:", f"{tokens['prompt_tokens']} prompt + {tokens['completion_tokens']} completion = {tokens['total_tokens']}")
+        prefix = stats['prompt_prefix']
+        if prefix['total_bytes']:
+            grid.add_row("Prompt Prefix:", f"{prefix['reused_bytes'] / prefix['total_bytes']:.0%} of prompt bytes unchanged between requests")
+        self._add_tiering_rows(grid, stats)
+        fast_path = stats['fast_path']
+        if fast_path['goals']:
+            saved = fast_path['requests_skipped'] * latency['avg']
+            rules = ", ".join(f"{rule} {count}" for rule, count in sorted(fast_path['rules'].items(), key=lambda item: -item[1]))
+            grid.add_row("Fast Path:", f"{fast_path['hits']}/{fast_path['goals']} goals ({fast_path['hits'] / fast_path['goals']:.0%}), "
+                                       f"{fast_path['fallbacks']} fell back | {fast_path['requests_skipped']} LLM requests skipped (~{saved:.1f}s)"
+                                       + (f" | {rules}" if rules else ""))
+        encoding = stats['result_encoding']
+        if encoding['results']:
+            grid.add_row("Tool Results:", f"{encoding['results']} results, {encoding['tokens']} tokens "
+                                          f"({encoding['tokens_saved']} saved by the {config.TOOL_RESULT_FORMAT} encoding)")
+        pruning = stats['pruning']
+        grid.add_row("History Pruning:", f"{pruning['events']} events: {pruning['compacted']} tool results compacted, "
+                                         f"{pruning['messages']} messages dropped, {pruning['tokens']} tokens freed")
+        if self.tracer.trace_file:
+            grid.add_row("Trace File:", self.tracer.trace_file)
+        self.console.print(Panel(grid, title="[cyan]Session Stats[/cyan]", border_style="cyan"))
+
+        if stats['tools']:
+            table = Table(title="[cyan]Tool Calls[/cyan]", border_style="cyan", header_style="bold magenta")
+            table.add_column("Tool")
+            table.add_column("Calls", justify="right")
+            table.add_column("Failed", justify="right")
+            table.add_column("Avg", justify="right")
+            table.add_column("p95", justify="right")
+            table.add_column("Output", justify="right")
+            for name, tool in sorted(stats['tools'].items()):
+                table.add_row(name, str(tool['count']), str(tool['failures']), f"{tool['avg']:.2f}s",
+                              f"{tool['p95']:.2f}s", f"{tool['output_bytes'] / 1024:.1f} KiB")
+            self.console.print(table)
+
+    def print_startup_report(self, import_report=False):
+        """Prints how long each startup phase took and, optionally, the slowest imports."""
+        from rich.table import Table
+        table = Table(title="[cyan]Startup Report[/cyan]", border_style="cyan", header_style="bold magenta")
+        table.add_column("Phase")
+        table.add_column("Duration", justify="right")
+        table.add_column("Elapsed", justify="right")
+        for name, duration, elapsed in self.startup_timer.phases():
+            table.add_row(name, f"{duration * 1000:.1f} ms", f"{elapsed * 1000:.1f} ms")
+        self.console.print(table)
+
+        if import_report:
+            imports = import_time_report("manager", cwd=os.path.dirname(os.path.abspath(__file__)))
+            table = Table(title="[cyan]Slowest Imports (-X importtime)[/cyan]", border_style="cyan", header_style="bold magenta")
+            table.add_column("Module")
+            table.add_column("Self", justify="right")
+            table.add_column("Cumulative", justify="right")
+            for name, self_us, cumulative_us in imports:
+                table.add_row(name, f"{self_us / 1000:.1f} ms", f"{cumulative_us / 1000:.1f} ms")
+            self.console.print(table)
+
     def start(self):
+        from prompt_toolkit import prompt
+        if config.METRICS_PORT:
+            self.tracer.metrics.serve(config.METRICS_PORT)
         self.print_welcome()
+        self.startup_timer.mark("welcome")
         while True:
             try:
                 user_input = prompt("› ", history=self.history).strip()
@@ -352,7 +1312,68 @@ class TaskManager:
             except (KeyboardInterrupt, EOFError):
                 self.console.print("\n[bold red]Exiting...[/bold red]")
                 break
+        self.close()
+
+    def close(self):
+        if self._client:
+            self._client.close()
+        self.tool_pool.shutdown(wait=False)
+        if self._store is not None:
+            self._store.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="oconsole - programmatic AI command assistant")
+    parser.add_argument("--fast", action="store_true", help="Show the prompt first and load heavy modules in the background.")
+    parser.add_argument("--startup-report", action="store_true", help="Print startup phase timings and the slowest imports, then exit.")
+    parser.add_argument("--batch", metavar="FILE", help="Run the goals in FILE ('-' for stdin), one per line or as JSONL, without the REPL.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of goals to run concurrently in batch mode.")
+    parser.add_argument("--output", metavar="FILE", help="Write batch results as JSONL to FILE instead of stdout.")
+    parser.add_argument("--resume", nargs="?", type=int, const=0, metavar="ID", help="Continue a stored session (the latest one without ID).")
+    return parser.parse_args()
+
+def run_batch(args):
+    """Runs a batch of goals headlessly. Progress goes to stderr; results are JSONL."""
+    from core.batch import BatchRunner, read_goals
+    status_console = Console(stderr=True)
+    goals = read_goals(args.batch)
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    # All workers report into one tracer, so the trace and metrics cover the whole batch.
+    tracer = Tracer(trace_file=config.TRACE_FILE or None, metrics_file=config.METRICS_FILE or None)
+    if config.METRICS_PORT:
+        tracer.metrics.serve(config.METRICS_PORT)
+    runner = BatchRunner(
+        # Each worker gets its own quiet manager: isolated history, no terminal output.
+        lambda: TaskManager(fast_start=False, console=Console(quiet=True), tracer=tracer),
+        workers=args.workers,
+        output=output
+    )
+    try:
+        status_console.print(f"[cyan]Running {len(goals)} goals with {runner.workers} worker(s)...[/cyan]")
+        summary = runner.run(goals)
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(summary['statuses'].items()))
+        status_console.print(f"[green]Finished {summary['completed']}/{summary['goals']} goals in {summary['elapsed_time']:.1f}s ({statuses or 'none'})[/green]")
+    except KeyboardInterrupt:
+        status_console.print("[bold red]Batch cancelled.[/bold red]")
+        return 130
+    finally:
+        if output:
+            output.close()
+    return 0
 
 if __name__ == "__main__":
-    manager = TaskManager()
-    manager.start()
\ No newline at end of file
+    args = parse_args()
+    if args.batch:
+        raise SystemExit(run_batch(args))
+    manager = TaskManager(fast_start=True if args.fast else None)
+    if args.startup_report:
+        manager.print_welcome()
+        manager.startup_timer.mark("welcome")
+        manager.print_startup_report(import_report=True)
+    else:
+        if args.resume is not None:
+            restored = manager.resume_session(args.resume or None)
+            if restored is None:
+                manager.console.print("[bold yellow]No stored session to resume; starting a new one.[/bold yellow]")
+            else:
+                manager.console.print(f"[green]Resumed session {manager.session_id} ({restored} messages restored).[/green]")
+        manager.start()
\ No newline at end of file
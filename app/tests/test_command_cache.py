@@ -0,0 +1,102 @@
+# tests/test_command_cache.py
+import os
+
+import pytest
+
+from core import command_cache as command_cache_module
+from core.command_cache import CommandCache
+
+RESULT = {"success": True, "output": "a.txt\n", "elapsed_time": 1.5}
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "logs").mkdir()
+    (tmp_path / "logs" / "app.log").write_text("start\n")
+    return tmp_path
+
+
+def store(cache, stages, cwd, ttl=60, result=RESULT):
+    key = cache.make_key(stages, cwd)
+    cache.put(key, result, ttl, cache.fingerprint(cache.watched_paths(stages, cwd)))
+    return key
+
+
+def test_hit_returns_a_marked_copy(tree):
+    cache = CommandCache()
+    key = store(cache, [["/bin/ls", "logs"]], str(tree))
+    cached = cache.get(key)
+    assert cached["output"] == RESULT["output"] and cached["elapsed_time"] == 0 and "cached" in cached
+    cached["output"] = "changed"
+    assert cache.get(key)["output"] == RESULT["output"]
+    assert cache.stats()["hits"] == 2 and cache.stats()["time_saved"] == 3.0
+
+
+def test_key_includes_argv_and_cwd(tree):
+    cache = CommandCache()
+    store(cache, [["/bin/ls", "logs"]], str(tree))
+    assert cache.get(cache.make_key([["/bin/ls", "-l", "logs"]], str(tree))) is None
+    assert cache.get(cache.make_key([["/bin/ls", "logs"]], str(tree / "logs"))) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_watched_paths(tree):
+    cwd = str(tree)
+    assert CommandCache.watched_paths([["/bin/du", "-sh", "logs"], ["/bin/sort", "-h"]], cwd) == [str(tree / "logs")]
+    assert CommandCache.watched_paths([["/bin/df", "-h"]], cwd) == [cwd]
+    assert CommandCache.watched_paths([["/bin/cat", "missing.txt"]], cwd) == [cwd]
+
+
+def test_failed_or_uncacheable_results_are_not_stored(tree):
+    cache = CommandCache()
+    for ttl, result in [(0, RESULT), (60, {"success": False, "error": "x"}),
+                        (60, dict(RESULT, timed_out=True)), (60, dict(RESULT, killed=True))]:
+        assert cache.get(store(cache, [["/bin/ls"]], str(tree), ttl, result)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entries_are_dropped(tree, monkeypatch):
+    cache = CommandCache()
+    key = store(cache, [["/bin/ls"]], str(tree), ttl=10)
+    now = command_cache_module.time.monotonic()
+    monkeypatch.setattr(command_cache_module.time, "monotonic", lambda: now + 11)
+    assert cache.get(key) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_mtime_change_invalidates(tree):
+    cache = CommandCache()
+    log = tree / "logs" / "app.log"
+    key = store(cache, [["/bin/cat", "logs/app.log"]], str(tree))
+    stat = os.stat(log)
+    log.write_text("start\nmore\n")
+    os.utime(log, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.get(key) is None
+
+
+def test_removed_path_invalidates(tree):
+    cache = CommandCache()
+    key = store(cache, [["/bin/cat", "logs/app.log"]], str(tree))
+    (tree / "logs" / "app.log").unlink()
+    assert cache.get(key) is None
+
+
+def test_write_under_a_watched_directory_invalidates(tree):
+    cache = CommandCache()
+    du = store(cache, [["/usr/bin/du", "-s", str(tree)]], str(tree))
+    cat = store(cache, [["/bin/cat", "logs/app.log"]], str(tree / ".."))
+    other = store(cache, [["/bin/ls", "/dev"]], "/dev")
+    assert cache.invalidate_path(str(tree / "logs" / "new.txt")) == 1
+    assert cache.get(du) is None
+    assert cache.get(cat) is not None
+    # A sibling whose name only shares a prefix is not affected.
+    assert cache.invalidate_path(str(tree) + "-other/file") == 0
+    assert cache.get(other) is not None
+
+
+def test_lru_eviction_and_clear(tree):
+    cache = CommandCache(max_entries=2)
+    keys = [store(cache, [["/bin/echo", str(index)]], str(tree)) for index in range(3)]
+    assert cache.get(keys[0]) is None
+    assert cache.stats()["entries"] == 2
+    assert cache.clear() == 2 and cache.stats()["entries"] == 0
@@ -0,0 +1,153 @@
+# tests/test_endpoints.py
+import pytest
+
+from core import endpoints as endpoints_module
+from core.endpoints import EndpointPool, LLMUnavailableError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(endpoints_module.time, "monotonic", clock)
+    return clock
+
+
+def make_pool(count=2, **kwargs):
+    kwargs.setdefault("breaker_threshold", 2)
+    kwargs.setdefault("breaker_cooldown", 30.0)
+    return EndpointPool([f"http://llm{index}/v1/" for index in range(count)], **kwargs)
+
+
+def fail(pool, endpoint, times=1):
+    for _ in range(times):
+        assert pool.acquire(exclude=[other for other in pool.endpoints if other is not endpoint]) is endpoint
+        pool.release(endpoint, False, probe=endpoint.probing)
+
+
+def test_requires_an_endpoint():
+    with pytest.raises(ValueError):
+        EndpointPool([])
+
+
+def test_urls_are_normalized():
+    assert make_pool(1).endpoints[0].url == "http://llm0/v1"
+
+
+def test_least_outstanding_spreads_requests():
+    pool = make_pool()
+    first, second = pool.acquire(), pool.acquire()
+    assert first is not second
+    pool.release(first, True, elapsed=0.1)
+    assert pool.acquire() is first
+
+
+def test_failover_skips_endpoints_already_tried():
+    pool = make_pool()
+    first = pool.acquire()
+    pool.release(first, False)
+    assert pool.acquire(exclude=[first]) is not first
+
+
+def test_excluded_endpoint_is_used_when_nothing_else_is_available(clock):
+    pool = make_pool()
+    first, second = pool.endpoints
+    fail(pool, second, times=2)
+    assert pool.acquire(exclude=[first]) is first
+
+
+def test_breaker_opens_after_threshold_and_recovers(clock):
+    pool = make_pool(count=1)
+    endpoint = pool.endpoints[0]
+    fail(pool, endpoint)
+    assert endpoint.state == "closed"
+    fail(pool, endpoint)
+    assert endpoint.state == "open"
+
+    with pytest.raises(LLMUnavailableError) as raised:
+        pool.acquire()
+    assert raised.value.retry_after == pytest.approx(30.0)
+
+    clock.now += 30
+    probe = pool.acquire()
+    assert probe is endpoint and endpoint.state == "half-open"
+    # Only one trial request at a time.
+    with pytest.raises(LLMUnavailableError):
+        pool.acquire()
+    pool.release(probe, True, elapsed=0.2, probe=True)
+    assert endpoint.state == "closed" and endpoint.failures == 0
+
+
+def test_stale_request_does_not_end_the_trial(clock):
+    pool = make_pool(count=1, breaker_threshold=1)
+    endpoint = pool.endpoints[0]
+    stale = pool.acquire()
+    fail(pool, endpoint)
+    clock.now += 30
+    assert pool.acquire() is endpoint and endpoint.probing
+    # A request sent before the breaker opened finishes during the trial.
+    pool.release(stale, False)
+    assert endpoint.probing
+    with pytest.raises(LLMUnavailableError):
+        pool.acquire()
+
+
+def test_failed_trial_reopens_the_breaker(clock):
+    pool = make_pool(count=1)
+    endpoint = pool.endpoints[0]
+    fail(pool, endpoint, times=2)
+    clock.now += 30
+    pool.release(pool.acquire(), False, probe=True)
+    assert endpoint.state == "open"
+    clock.now += 29
+    with pytest.raises(LLMUnavailableError):
+        pool.acquire()
+
+
+def test_abandoned_request_does_not_count(clock):
+    pool = make_pool(count=1)
+    endpoint = pool.acquire()
+    pool.release(endpoint, None)
+    assert endpoint.outstanding == 0 and endpoint.failures == 0 and endpoint.total_failures == 0
+
+
+def test_health_checks_open_and_close_the_breaker(clock):
+    pool = make_pool()
+    endpoint = pool.endpoints[0]
+    pool.record_health(endpoint, False)
+    assert endpoint.state == "closed"
+    pool.record_health(endpoint, False)
+    assert endpoint.state == "open"
+    assert all(pool.acquire() is not endpoint for _ in range(3))
+    pool.record_health(endpoint, True)
+    assert endpoint.state == "closed"
+
+
+def test_latency_strategy_prefers_the_faster_endpoint():
+    pool = make_pool(strategy="latency")
+    slow, fast = pool.endpoints
+    for endpoint, elapsed in ((slow, 2.0), (fast, 0.5)):
+        pool.release(pool.acquire(exclude=[other for other in pool.endpoints if other is not endpoint]), True, elapsed)
+    # Expected wait: 0.5 x (in flight + 1) on the fast one against 2.0 on the idle slow one.
+    assert [pool.acquire() for _ in range(3)] == [fast, fast, fast]
+    assert pool.acquire() is slow  # Equal wait, fewer requests in flight
+
+
+def test_backoff_is_bounded():
+    pool = make_pool(backoff_base=0.5, backoff_max=4.0)
+    assert all(0 <= pool.backoff(attempt) <= min(4.0, 0.5 * 2 ** attempt) for attempt in range(8) for _ in range(20))
+
+
+def test_status_snapshot():
+    pool = make_pool()
+    pool.acquire()
+    status = pool.status()
+    assert [entry["url"] for entry in status] == ["http://llm0/v1", "http://llm1/v1"]
+    assert sum(entry["outstanding"] for entry in status) == 1
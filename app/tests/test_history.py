@@ -0,0 +1,104 @@
+# tests/test_history.py
+import json
+
+from core.history import MESSAGE_OVERHEAD_TOKENS, ConversationHistory
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word."""
+
+    def encode(self, text):
+        return text.split()
+
+
+def tool_turn(call_id, output, name="run_safe_command"):
+    call = {"id": call_id, "type": "function", "function": {"name": name, "arguments": "{}"}}
+    return [
+        {"role": "assistant", "content": "", "tool_calls": [call]},
+        {"role": "tool", "tool_call_id": call_id, "content": output},
+    ]
+
+
+def make_history(**kwargs):
+    return ConversationHistory(tokenizer=WordTokenizer(), **kwargs)
+
+
+def test_token_count_is_the_sum_of_appended_messages():
+    history = make_history()
+    counts = [history.append({"role": "user", "content": "one two three"})]
+    for message in tool_turn("c1", "a b"):
+        counts.append(history.append(message))
+    assert counts[0] == MESSAGE_OVERHEAD_TOKENS + 3
+    assert history.token_count == sum(counts)
+    history.pop()
+    assert history.token_count == sum(counts[:-1])
+    history.clear()
+    assert history.token_count == 0 and len(history) == 0
+
+
+def test_tool_call_arguments_are_counted():
+    history = make_history()
+    message = tool_turn("call_1", "")[0]
+    assert history.count_tokens(message) == MESSAGE_OVERHEAD_TOKENS + 2  # name + arguments
+
+
+def test_large_tool_results_are_compacted_once_their_turn_closes():
+    history = make_history(compact_tool_tokens=20, compact_keep_lines=4)
+    output = "\n".join(f"line {i}" for i in range(50))
+    history.append({"role": "user", "content": "goal"})
+    for message in tool_turn("c1", json.dumps({"success": True, "output": output})):
+        history.append(message)
+    # Still the current turn: left alone.
+    assert json.loads(history[-1]["content"])["output"] == output
+
+    history.append({"role": "assistant", "content": "done"})
+    compacted = json.loads(history[2]["content"])
+    assert compacted["success"] is True and compacted["compacted"] is True
+    assert "46 of 50 lines omitted" in compacted["output"]
+    assert history.token_count == sum(history.count_tokens(message) for message in history)
+
+
+def test_compacts_the_plain_text_envelope():
+    history = make_history(compact_keep_lines=4)
+    envelope = "\n".join(["status: ok | 0.20s", "output (du, 30 rows, columns separated by |):", "size|path"] +
+                         [f"{i}K|/var/{i}" for i in range(30)])
+    compacted = history._compact_content(envelope).splitlines()
+    assert compacted[:2] == ["status: ok | 0.20s", "output (du, 30 rows, columns separated by |):"]
+    assert compacted[2] == "size|path"
+    assert any("lines omitted" in line for line in compacted)
+    assert compacted[-1] == "[compacted]"
+
+
+def test_over_the_limit_drops_oldest_turns_but_keeps_goal_and_plan():
+    pruned = []
+    history = make_history(max_tokens=60, on_prune=lambda *args: pruned.append(args))
+    history.append({"role": "user", "content": "goal"})
+    for message in tool_turn("plan", "the plan", name="explain_plan"):
+        history.append(message)
+    for index in range(5):
+        for message in tool_turn(f"c{index}", " ".join(["word"] * 8)):
+            history.append(message)
+    assert history.token_count <= 60
+    assert history[0]["content"] == "goal"
+    assert history[1]["tool_calls"][0]["id"] == "plan"
+    assert history[-1]["tool_call_id"] == "c4"
+    assert pruned
+    # No tool result is left without the assistant message that called it.
+    called = {call["id"] for message in history for call in message.get("tool_calls") or []}
+    assert all(message["tool_call_id"] in called for message in history if message["role"] == "tool")
+
+
+def test_turn_tracking_survives_pruning():
+    history = make_history(max_tokens=40, compact_tool_tokens=1000)
+    history.append({"role": "user", "content": "goal"})
+    for index in range(6):
+        for message in tool_turn(f"c{index}", " ".join(["word"] * 6)):
+            history.append(message)
+    assert history._turns()[-1][0] == history._turn_start
+
+
+def test_without_a_tokenizer_nothing_is_pruned():
+    history = ConversationHistory(max_tokens=1)
+    for index in range(10):
+        history.append({"role": "user", "content": f"message {index}"})
+    assert len(history) == 10 and history.token_count == 0
@@ -0,0 +1,61 @@
+# tests/test_intent_router.py
+import pytest
+
+import config
+from core.intent_router import IntentRouter, normalize_goal
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(config.FAST_PATH_RULES)
+
+
+@pytest.mark.parametrize("goal, normalized", [
+    ("What's my uptime?", "uptime"),
+    ("Show disk usage.", "disk usage"),
+    ("Please show me the disk usage...", "disk usage"),
+    ("cat /etc/hosts.", "cat /etc/hosts"),
+    ("What is a load average?", "a load average"),
+])
+def test_normalize_goal(goal, normalized):
+    assert normalize_goal(goal) == normalized
+
+
+@pytest.mark.parametrize("goal, rule", [
+    ("Show disk usage.", "disk_usage"),
+    ("How much disk space is free?", "disk_usage"),
+    ("What's my uptime?", "uptime"),
+    ("What is the load average?", "uptime"),
+    ("show memory usage!", "memory"),
+    ("date and time", "date"),
+    ("Which ports are open?", None),
+    ("open ports", "ports"),
+])
+def test_matches_command_like_goals(router, goal, rule):
+    route = router.match(goal)
+    assert (route.rule if route else None) == rule
+
+
+@pytest.mark.parametrize("goal", [
+    "What is a load average?",
+    "Explain what load average means",
+    "time",
+    "How much time?",
+    "Show disk usage of /var and delete old logs",
+    "???",
+    "",
+])
+def test_leaves_other_goals_to_the_agent(router, goal):
+    assert router.match(goal) is None
+
+
+def test_route_arguments_are_a_copy(router):
+    route = router.match("disk usage")
+    assert route.tool == "run_safe_command"
+    route.arguments["args_string"] = "-i"
+    assert router.match("disk usage").arguments == {"command_name": "df", "args_string": "-h"}
+
+
+def test_summarize_defaults_to_true():
+    router = IntentRouter([{"name": "x", "pattern": "x", "tool": "t", "arguments": {}}])
+    assert router.match("x").summarize is True
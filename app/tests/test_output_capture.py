@@ -0,0 +1,45 @@
+# tests/test_output_capture.py
+import io
+
+from core.output_capture import OutputCapture
+
+
+def capture_of(data, head=3, tail=2, max_line_chars=20, chunk=7):
+    capture = OutputCapture(head, tail, max_line_chars)
+    for start in range(0, len(data), chunk):
+        capture.feed(data[start:start + chunk])
+    capture.finish()
+    return capture
+
+
+def test_lines_split_across_chunks():
+    capture = capture_of(b"one\ntwo\r\nthree")
+    assert capture.text() == "one\ntwo\nthree"
+    assert capture.total_lines == 3 and not capture.truncated
+
+
+def test_head_and_tail_window():
+    capture = capture_of(b"".join(b"%d\n" % i for i in range(10)))
+    assert capture.head == ["0", "1", "2"] and list(capture.tail) == ["8", "9"]
+    assert capture.omitted_lines == 5 and capture.truncated
+    assert "5 lines omitted" in capture.text()
+
+
+def test_long_line_is_cut_while_it_is_read():
+    capture = capture_of(b"x" * 100000 + b"\nshort\n", chunk=4096)
+    assert len(capture._partial) == 0
+    assert capture.head[0] == "x" * 20 + " [... line truncated, 100001 bytes in total]"
+    assert capture.head[1] == "short"
+    assert capture.truncated and capture.total_bytes == 100007
+
+
+def test_consume_reads_a_stream_in_chunks():
+    capture = OutputCapture(10, 10, 5)
+    capture.consume(io.BufferedReader(io.BytesIO(b"abcdefgh\nij")))
+    assert capture.head == ["abcde [... line truncated, 9 bytes in total]", "ij"]
+    assert capture.stats() == {"output_lines": 2, "output_bytes": 11, "truncated": True}
+
+
+def test_unbounded_capture_keeps_everything():
+    capture = capture_of(b"y" * 5000 + b"\n", head=float("inf"), tail=0, max_line_chars=float("inf"))
+    assert capture.head == ["y" * 5000] and not capture.truncated
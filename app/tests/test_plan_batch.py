@@ -0,0 +1,91 @@
+# tests/test_plan_batch.py
+import pytest
+
+from core.plan_batch import PlanError, build_plan
+
+READ_ONLY = {"ls", "cat", "df", "du"}
+
+
+def check_call(tool, arguments):
+    if tool not in ("run_safe_command", "create_file"):
+        return f"Tool '{tool}' is not valid."
+    if tool == "run_safe_command" and arguments.get("command_name") not in READ_ONLY | {"mkdir"}:
+        return f"Command '{arguments.get('command_name')}' is not in the list of approved safe commands."
+    return None
+
+
+def parallel_safe(tool, arguments):
+    return tool == "run_safe_command" and arguments.get("command_name") in READ_ONLY
+
+
+def command(step_id, name, depends_on=None):
+    step = {"id": step_id, "tool": "run_safe_command", "arguments": {"command_name": name}}
+    if depends_on is not None:
+        step["depends_on"] = depends_on
+    return step
+
+
+def wave_ids(waves):
+    return [[step.id for step in wave] for wave in waves]
+
+
+def test_independent_steps_share_a_wave():
+    waves = build_plan([command("a", "ls"), command("b", "df"), command("c", "du", ["a", "b"])], check_call, parallel_safe)
+    assert wave_ids(waves) == [["a", "b"], ["c"]]
+    assert waves[0][0].tool_call["id"] == "plan_a"
+
+
+def test_state_changing_steps_are_barriers():
+    steps = [
+        command("a", "ls"),
+        {"id": "b", "tool": "create_file", "arguments": {"file_path": "x", "content": ""}},
+        command("c", "cat"),
+        command("d", "df"),
+    ]
+    assert wave_ids(build_plan(steps, check_call, parallel_safe)) == [["a"], ["b"], ["c", "d"]]
+
+
+def test_barrier_ordering_is_not_a_declared_dependency():
+    steps = [
+        command("grep", "cat"),
+        {"id": "write", "tool": "create_file", "arguments": {"file_path": "x", "content": ""}},
+        command("df", "df"),
+        command("du", "du", ["grep"]),
+    ]
+    waves = build_plan(steps, check_call, parallel_safe)
+    assert wave_ids(waves) == [["grep"], ["write"], ["df", "du"]]
+    by_id = {step.id: step for wave in waves for step in wave}
+    assert by_id["write"].depends_on == [] and by_id["write"].after == ["grep"]
+    assert by_id["df"].depends_on == [] and by_id["df"].after == ["write"]
+    assert by_id["du"].depends_on == ["grep"]
+
+
+def test_string_arguments_and_dependencies_are_accepted():
+    steps = [
+        {"tool": "run_safe_command", "arguments": '{"command_name": "ls"}'},
+        {"tool": "run_safe_command", "arguments": {"command_name": "cat"}, "depends_on": "step1"},
+    ]
+    waves = build_plan(steps, check_call, parallel_safe)
+    assert wave_ids(waves) == [["step1"], ["step2"]]
+    assert waves[0][0].arguments == {"command_name": "ls"}
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([], "non-empty"),
+    ([command("a", "rm")], "approved safe commands"),
+    ([{"id": "a", "tool": "answer_question", "arguments": {"query": "hi"}}], "no usable tool"),
+    ([command("a", "ls"), command("a", "df")], "duplicate step id"),
+    ([command("a", "ls", ["missing"])], "unknown step"),
+    ([command("a", "ls", ["a"])], "unknown step"),
+    ([command("a", "ls", ["b"]), command("b", "df", ["a"])], "cycle"),
+    ([{"id": "a", "tool": "run_safe_command", "arguments": "{not json"}], "not valid JSON"),
+    (["ls"], "not an object"),
+])
+def test_invalid_plans_are_rejected(steps, message):
+    with pytest.raises(PlanError, match=message):
+        build_plan(steps, check_call, parallel_safe)
+
+
+def test_max_steps():
+    with pytest.raises(PlanError, match="at most 2"):
+        build_plan([command(str(i), "ls") for i in range(3)], check_call, parallel_safe, max_steps=2)
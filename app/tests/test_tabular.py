@@ -0,0 +1,72 @@
+# tests/test_tabular.py
+from core.tabular import parse_table
+
+DF = """Filesystem      Size  Used Avail Use% Mounted on
+/dev/sda1        50G   20G   28G  42% /
+tmpfs           3.9G     0  3.9G   0% /dev/shm
+"""
+
+PS = """USER         PID %CPU %MEM    VSZ   RSS TTY      STAT START   TIME COMMAND
+root           1  0.0  0.1 167760 11812 ?        Ss   Jan01   0:09 /sbin/init splash
+www-data     812  1.5  2.0 220000 40000 ?        S    Jan01   1:02 nginx: worker process
+"""
+
+FREE = """               total        used        free      shared  buff/cache   available
+Mem:            15Gi       3.2Gi       9.1Gi       312Mi       3.1Gi        11Gi
+Swap:          2.0Gi          0B       2.0Gi
+"""
+
+NETSTAT = """Active Internet connections (only servers)
+Proto Recv-Q Send-Q Local Address           Foreign Address         State
+tcp        0      0 0.0.0.0:22              0.0.0.0:*               LISTEN
+udp        0      0 0.0.0.0:68              0.0.0.0:*
+"""
+
+
+def test_df_keeps_multiword_headers():
+    table = parse_table(DF)
+    assert table.kind == "df"
+    assert table.headers[-1] == "Mounted on"
+    assert table.records()[1]["Mounted on"] == "/dev/shm"
+
+
+def test_ps_last_column_keeps_spaces():
+    table = parse_table(PS)
+    assert table.kind == "ps"
+    assert [row[-1] for row in table.rows] == ["/sbin/init splash", "nginx: worker process"]
+
+
+def test_free_labelled_rows_are_padded():
+    table = parse_table(FREE)
+    assert table.kind == "free"
+    assert table.headers[0] == ""
+    assert table.rows[1] == ["Swap:", "2.0Gi", "0B", "2.0Gi", "", "", ""]
+
+
+def test_netstat_skips_the_title_and_fills_the_state():
+    table = parse_table(NETSTAT)
+    assert table.kind == "netstat"
+    assert table.records()[1]["State"] == ""
+    assert table.records()[0]["Local Address"] == "0.0.0.0:22"
+
+
+def test_omitted_marker_becomes_a_note():
+    lines = DF.strip().splitlines()
+    table = parse_table("\n".join(lines[:2] + ["[... 40 lines omitted ...]"] + lines[2:]))
+    assert len(table) == 2
+    assert table.notes == [(1, "[... 40 lines omitted ...]")]
+    assert table.to_compact()["notes"] == [[1, "[... 40 lines omitted ...]"]]
+
+
+def test_to_compact():
+    compact = parse_table(DF).to_compact()
+    assert compact["kind"] == "df"
+    assert compact["columns"][0] == "Filesystem"
+    assert compact["rows"][0][0] == "/dev/sda1"
+    assert "notes" not in compact
+
+
+def test_plain_text_is_not_a_table():
+    assert parse_table("Reading package lists done\nok") is None
+    assert parse_table("single line") is None
+    assert parse_table("") is None
@@ -0,0 +1,46 @@
+# tests/test_tools.py
+import pytest
+from rich.console import Console
+
+from core.command_executor import CommandExecutor
+from core.tools import ToolExecutor
+
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = ToolExecutor(CommandExecutor(console=Console(quiet=True)))
+    if not executor.binaries.get("sort") or not executor.binaries.get("uniq"):
+        pytest.skip("sort and uniq are not installed")
+    return executor
+
+
+@pytest.mark.parametrize("command_name, args_string", [
+    ("sort", "-o out.txt in.txt"),
+    ("sort", "-oout.txt in.txt"),
+    ("sort", "-ro out.txt in.txt"),
+    ("sort", "in.txt --output=out.txt"),
+    ("sort", "--out out.txt in.txt"),
+    ("sort", "--compress-program=gzip in.txt"),
+    ("cat", "in.txt | sort -o out.txt"),
+    ("uniq", "in.txt out.txt"),
+    ("uniq", "-c -f 1 in.txt out.txt"),
+    ("uniq", "-- -in.txt -out.txt"),
+])
+def test_write_forms_of_filters_are_rejected(executor, command_name, args_string):
+    stages, _, error = executor._build_pipeline(command_name, args_string)
+    assert stages is None and "may not write files" in error
+
+
+@pytest.mark.parametrize("command_name, args_string", [
+    ("sort", "-rn in.txt"),
+    ("sort", "-t o -k 2 in.txt"),
+    ("sort", "-to in.txt"),
+    ("sort", "-T /tmp -S 10M in.txt other.txt"),
+    ("uniq", "-c in.txt"),
+    ("uniq", "-f 1 in.txt"),
+    ("uniq", "-w5 -"),
+    ("cat", "in.txt | sort | uniq -c"),
+])
+def test_read_only_forms_of_filters_are_allowed(executor, command_name, args_string):
+    stages, _, error = executor._build_pipeline(command_name, args_string)
+    assert error is None and stages